@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from all_types_and_consts import (
+    MAX_SHOP_FOOD_SLOTS,
+    MAX_SHOP_LINKED_SLOTS,
+    MAX_SHOP_SLOTS,
+    MAX_TEAM_SIZE,
+    PET_COST,
+    ROLL_COST,
+    Food,
+    Species,
+    foods_for_pet,
+    foods_that_apply_globally,
+)
+
+# The action masks are computed with broadcasting from a few small arrays of the player's state (see
+# Player.get_action_mask_state()). Every function here takes arrays with any number of leading (batch) dims. So a player's
+# masks are computed the same way as the masks of many players (see stack_action_mask_values())
+
+NONE_SPECIES = Species.NONE.value
+
+# food value -> can it be bought for the whole team / for a pet
+is_global_food = np.array([food in foods_that_apply_globally for food in Food])
+is_food_for_pet = np.array([food in foods_for_pet for food in Food])
+
+NOT_SAME_SLOT = ~np.eye(MAX_TEAM_SIZE, dtype=bool)
+
+
+@dataclass
+class ActionMaskState:
+    # the missing slots are NONE pets (and have the first food type). The num_*_slots say which slots exist
+    team_species: np.ndarray  # (..., MAX_TEAM_SIZE) Species values
+    team_levels: np.ndarray  # (..., MAX_TEAM_SIZE)
+    shop_species: np.ndarray  # (..., MAX_SHOP_SLOTS)
+    num_shop_slots: np.ndarray  # (...)
+    linked_shop_species: np.ndarray  # (..., MAX_SHOP_LINKED_SLOTS, 2)
+    num_linked_shop_slots: np.ndarray  # (...)
+    food_types: np.ndarray  # (..., MAX_SHOP_FOOD_SLOTS) Food values
+    food_costs: np.ndarray  # (..., MAX_SHOP_FOOD_SLOTS)
+    num_food_slots: np.ndarray  # (...)
+    gold: np.ndarray  # (...)
+
+
+def stack_action_mask_values(values: list[tuple]) -> ActionMaskState:
+    # the Player.get_action_mask_values() of N players -> one state whose arrays are (N, ...)
+    return ActionMaskState(*(np.array(field_values) for field_values in zip(*values)))
+
+
+def get_level(experience: int) -> int:
+    # same as Pet.get_level() (without the tiger's level). experience 0-2 is level 1, 3-5 is level 2, 6 is level 3
+    return 1 + (experience >= 3) + (experience >= 6)
+
+
+def get_existing_slots(num_slots: np.ndarray, max_slots: int) -> np.ndarray:
+    # (..., max_slots). True for the slots that exist
+    return np.arange(max_slots) < np.asarray(num_slots)[..., None]
+
+
+def get_buyable_pet_mask(
+    shop_species: np.ndarray, team_species: np.ndarray
+) -> np.ndarray:
+    # shop_species is (..., num_shop_pets). team_species is (..., MAX_TEAM_SIZE). So the mask is (..., num_shop_pets, MAX_TEAM_SIZE)
+    # you can only buy if you are combining or placing the pet into an empty position. And you cannot buy a none pet
+    shop_species = shop_species[..., None]
+    team_species = team_species[..., None, :]
+    return (shop_species != NONE_SPECIES) & (
+        (team_species == NONE_SPECIES) | (team_species == shop_species)
+    )
+
+
+def reorder_team_mask(team_species: np.ndarray) -> np.ndarray:
+    # you cannot move an empty pet, or move a pet to the same spot
+    return (team_species != NONE_SPECIES)[..., :, None] & NOT_SAME_SLOT
+
+
+def combine_pets_mask(team_species: np.ndarray, team_levels: np.ndarray) -> np.ndarray:
+    # you can only combine pets of the same species. You cannot combine an empty pet, a level 3 pet, or a pet with itself
+    can_combine = (team_species != NONE_SPECIES) & (team_levels != 3)
+    return (
+        (team_species[..., :, None] == team_species[..., None, :])
+        & can_combine[..., :, None]
+        & can_combine[..., None, :]
+        & NOT_SAME_SLOT
+    )
+
+
+def buy_pet_mask(
+    team_species: np.ndarray, shop_species: np.ndarray, gold: np.ndarray
+) -> np.ndarray:
+    # (..., MAX_SHOP_SLOTS, MAX_TEAM_SIZE)
+    has_gold = np.asarray(gold >= PET_COST)[..., None, None]
+    return get_buyable_pet_mask(shop_species, team_species) & has_gold
+
+
+def buy_linked_pet_mask(
+    team_species: np.ndarray, linked_shop_species: np.ndarray, gold: np.ndarray
+) -> np.ndarray:
+    # (..., MAX_SHOP_LINKED_SLOTS, 2, MAX_TEAM_SIZE)
+    has_gold = np.asarray(gold >= PET_COST)[..., None, None, None]
+    return (
+        get_buyable_pet_mask(linked_shop_species, team_species[..., None, :]) & has_gold
+    )
+
+
+def get_affordable_food_slots(
+    food_costs: np.ndarray, num_food_slots: np.ndarray, gold: np.ndarray
+) -> np.ndarray:
+    return get_existing_slots(num_food_slots, MAX_SHOP_FOOD_SLOTS) & (
+        food_costs <= np.asarray(gold)[..., None]
+    )
+
+
+def buy_food_mask(
+    food_types: np.ndarray,
+    food_costs: np.ndarray,
+    num_food_slots: np.ndarray,
+    gold: np.ndarray,
+) -> np.ndarray:
+    # (..., MAX_SHOP_FOOD_SLOTS)
+    return (
+        get_affordable_food_slots(food_costs, num_food_slots, gold)
+        & is_global_food[food_types]
+    )
+
+
+def buy_food_for_pet_mask(
+    team_species: np.ndarray,
+    food_types: np.ndarray,
+    food_costs: np.ndarray,
+    num_food_slots: np.ndarray,
+    gold: np.ndarray,
+) -> np.ndarray:
+    # (..., MAX_SHOP_FOOD_SLOTS, MAX_TEAM_SIZE). the food can only be given to a non-empty pet
+    can_buy_food = (
+        get_affordable_food_slots(food_costs, num_food_slots, gold)
+        & is_food_for_pet[food_types]
+    )
+    return can_buy_food[..., :, None] & (team_species != NONE_SPECIES)[..., None, :]
+
+
+def toggle_freeze_food_slot_mask(num_food_slots: np.ndarray) -> np.ndarray:
+    return get_existing_slots(num_food_slots, MAX_SHOP_FOOD_SLOTS)
+
+
+def sell_pet_mask(team_species: np.ndarray) -> np.ndarray:
+    # you cannot sell an empty pet
+    return team_species != NONE_SPECIES
+
+
+def roll_shop_mask(gold: np.ndarray) -> np.ndarray:
+    return np.asarray(gold >= ROLL_COST)[..., None]
+
+
+def toggle_freeze_slot_mask(num_shop_slots: np.ndarray) -> np.ndarray:
+    # ensure the slots we freeze/unfreeze are available
+    return get_existing_slots(num_shop_slots, MAX_SHOP_SLOTS)
+
+
+def freeze_pet_at_linked_slot_mask(num_linked_shop_slots: np.ndarray) -> np.ndarray:
+    existing_slots = get_existing_slots(num_linked_shop_slots, MAX_SHOP_LINKED_SLOTS)
+    return np.repeat(existing_slots[..., None], 2, axis=-1)
+
+
+def end_turn_mask(gold: np.ndarray) -> np.ndarray:
+    # to help the model, you can only end turn if you have no gold
+    return np.asarray(gold <= 0)[..., None]
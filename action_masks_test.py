@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+
+from action_masks import combine_pets_mask
+from all_types_and_consts import PlayerState
+from environment.action_space import (
+    actions_dict,
+    get_action_masks,
+    get_batched_action_masks,
+)
+from opponent_db2 import OpponentDBInMemory
+from player import Player
+
+
+def play_random_action(player: Player):
+    # (the actions with one option, like roll_shop, don't take params)
+    action, params = random.choice(
+        [
+            (action, tuple(params) if mask.size > 1 else ())
+            for action in actions_dict.values()
+            for mask in [action.get_mask(player)]
+            for params in np.argwhere(mask).tolist()
+        ]
+    )
+    action.perform_action(player, params)
+
+
+def test_batched_action_masks_match_each_players_masks():
+    random.seed(0)
+    players = [
+        Player.init_starting_player(OpponentDBInMemory(), None) for _ in range(8)
+    ]
+    for _ in range(300):
+        batched_masks = get_batched_action_masks(players)
+        for player_idx, player in enumerate(players):
+            for action_name, mask in get_action_masks(player).items():
+                assert np.array_equal(batched_masks[action_name][player_idx], mask)
+            # the batched masks use the cached values. So check them against the player's current values
+            assert player.get_action_mask_values() == (
+                player.compute_action_mask_values()
+            )
+
+        # only some players act. So the others' values come from their caches
+        for player_idx, player in enumerate(players):
+            if random.random() < 0.5:
+                continue
+            play_random_action(player)
+            if player.turn_number >= 8:
+                players[player_idx] = Player.init_starting_player(
+                    OpponentDBInMemory(), None
+                )
+
+
+def test_action_mask_state_of_one_player():
+    random.seed(1)
+    player = Player.init_starting_player(OpponentDBInMemory(), None)
+    for _ in range(100):
+        # the mask functions also work without the batch dim
+        state = player.get_action_mask_state()
+        assert state.team_species.shape == (5,)
+        assert np.array_equal(
+            combine_pets_mask(state.team_species, state.team_levels),
+            player.combine_pets_action_mask(),
+        )
+        play_random_action(player)
+
+
+def test_batched_action_masks_only_read_the_changed_players():
+    random.seed(2)
+    players = [
+        Player.init_starting_player(OpponentDBInMemory(), None) for _ in range(4)
+    ]
+    get_batched_action_masks(players)
+    cached_values = [player.cached_action_mask_values for player in players]
+
+    players[1].shop.gold = 0
+    players[1].mark_dirty(PlayerState.GOLD)
+    batched_masks = get_batched_action_masks(players)
+    assert not batched_masks["roll_shop"][1].any()
+    for player_idx, player in enumerate(players):
+        is_reread = player_idx == 1
+        assert (player.cached_action_mask_values is not cached_values[player_idx]) == (
+            is_reread
+        )
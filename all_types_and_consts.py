@@ -1,7 +1,7 @@
 from collections import defaultdict
 from dataclasses import dataclass
 from typing import Any, Literal
-from enum import Enum, auto
+from enum import Enum, Flag, auto
 
 IS_TRIGGERS_ENABLED = True
 
@@ -258,6 +258,17 @@ class ActionReturn(Enum):
 ActionResult = dict[ActionReturn, Any]
 
 
+class PlayerState(Flag):
+    # the parts of the player that the action masks are computed from (see Player.get_action_mask())
+    NONE = 0
+    TEAM = auto()
+    SHOP_SLOTS = auto()
+    LINKED_SLOTS = auto()
+    FOOD_SLOTS = auto()
+    GOLD = auto()
+    ALL = TEAM | SHOP_SLOTS | LINKED_SLOTS | FOOD_SLOTS | GOLD
+
+
 class Effect(Enum):
     NONE = 0
     BEE = auto()
@@ -313,3 +324,16 @@ can_trigger_in_shop_or_battle = [
     Trigger.ON_FRIEND_FAINTS,
     Trigger.ON_FRIEND_HURT,
 ]
+
+
+def get_trigger_mask(triggers: list[Trigger]) -> int:
+    mask = 0
+    for trigger in triggers:
+        mask |= 1 << trigger.value
+    return mask
+
+
+# the same sets as bitsets, so checking if a trigger is in one is O(1) (and doesn't hash the enum).
+# Check with: (MASK >> trigger._value_) & 1
+in_battle_triggers_mask = get_trigger_mask(in_battle_triggers)
+can_trigger_in_shop_or_battle_mask = get_trigger_mask(can_trigger_in_shop_or_battle)
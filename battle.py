@@ -6,17 +6,33 @@ from all_types_and_consts import (
     Species,
     Trigger,
 )
+import battle_trace
+from battle_trace import BattleTraceKind
+from battle_closed_form import battle_closed_form, can_battle_in_closed_form
+from battle_events import BattleEvent, BattleEventKind, battle_event_queue
 from pet import Pet
 from pet_data import get_base_pet
-from pet_trigger_utils import get_nearest_friends_behind
+from pet_list import get_pets_with_trigger
+from pet_trigger_utils import get_nearest_friends_behind, get_pet_idx
 from team import Team
 
 
 def battle(my_team: Team, team2: Team) -> BattleResult:
-    pets1 = (
-        my_team.clone().get_pets_for_battle()
-    )  # we need to clone the pets so the original team doesn't get modified
-    pets2 = team2.clone().get_pets_for_battle()
+    trace = battle_trace.active_trace
+    # traced battles don't take the fast path, so every attack is recorded
+    if trace is None and can_battle_in_closed_form((my_team, team2)):
+        return battle_closed_form(my_team, team2)
+    return _battle_loop(my_team, team2)
+
+
+def _battle_loop(my_team: Team, team2: Team) -> BattleResult:
+    # the reference engine: plays every attack and trigger. The fast paths (and their tests) are checked against this
+    trace = battle_trace.active_trace
+    # these are copies of the pets, so the original teams don't get modified
+    pets1 = my_team.get_pets_for_battle()
+    pets2 = team2.get_pets_for_battle()
+    if trace is not None:
+        trace.record(BattleTraceKind.BATTLE_START, Species.NONE, len(pets1), len(pets2))
     trigger_on_battle_start(pets1, pets2)
 
     while len(pets1) > 0 and len(pets2) > 0:
@@ -42,11 +58,14 @@ def battle(my_team: Team, team2: Team) -> BattleResult:
             )
 
     if len(pets1) == 0 and len(pets2) == 0:
-        return BattleResult.TIE
+        result = BattleResult.TIE
     elif len(pets1) > 0:
-        return BattleResult.WON_BATTLE
+        result = BattleResult.WON_BATTLE
     else:
-        return BattleResult.LOST_BATTLE
+        result = BattleResult.LOST_BATTLE
+    if trace is not None:
+        trace.record(BattleTraceKind.BATTLE_END, Species.NONE, result._value_, 0)
+    return result
 
 
 def trigger_on_battle_start(pets1: list[Pet], pets2: list[Pet]):
@@ -71,12 +90,10 @@ def trigger_on_battle_start(pets1: list[Pet], pets2: list[Pet]):
     # now trigger the on_battle_start triggers
     for _, pet, is_team1 in order:
         if is_team1:
-            if pet in pets1 and len(pets2) > 0:  # ensure they are still alive
-                # print(pet, "pets1", pets1)
+            if pet.is_alive and len(pets2) > 0:  # ensure they are still alive
                 pet.trigger(Trigger.ON_BATTLE_START, my_pets=pets1, enemy_pets=pets2)
         else:
-            if pet in pets2 and len(pets1) > 0:
-                # print(pet, "pets2", pets2)
+            if pet.is_alive and len(pets1) > 0:
                 pet.trigger(Trigger.ON_BATTLE_START, my_pets=pets2, enemy_pets=pets1)
 
 
@@ -107,6 +124,14 @@ def attack_team(
     # now apply the damage
 
     frontmost_pet = receiving_team[-1]
+    trace = battle_trace.active_trace
+    if trace is not None:
+        trace.record(
+            BattleTraceKind.ATTACK,
+            attacker_pet.species,
+            damage,
+            frontmost_pet.species._value_,
+        )
     second_pet = None
     if len(receiving_team) > 1:
         second_pet = receiving_team[-2]
@@ -122,7 +147,7 @@ def attack_team(
     if (
         attacker_pet.effect == Effect.CHILLI
         and second_pet
-        and second_pet in receiving_team  # they are still alive in the team
+        and second_pet.is_alive  # they are still alive in the team
     ):
         # attack the second pet if the chilli effect is active
         receive_damage(
@@ -151,8 +176,8 @@ def receive_damage(
     opposing_team: list[Pet],
     is_in_battle: bool,
 ):
-    if receiving_pet not in receiving_team:
-        # this function was called (with older pets) but by now, the pet is dead. so don't do anything
+    if not receiving_pet.is_alive:
+        # this function was called (with older pets) but by now, the pet is dead (or about to faint). so don't do anything
         return
 
     if receiving_pet.effect == Effect.MELON:
@@ -161,76 +186,209 @@ def receive_damage(
     elif receiving_pet.effect == Effect.GARLIC:
         damage = max(damage - 2, 1)  # yes. Garlic does a minimum of 1 damage
     receiving_pet.health -= damage
+    trace = battle_trace.active_trace
+    if trace is not None:
+        trace.record(
+            BattleTraceKind.HURT, receiving_pet.species, damage, receiving_pet.health
+        )
 
     if damage == 0:
         return  # early return to avoid computing on hurt effects
 
-    receiving_pet.trigger(
-        Trigger.ON_HURT,
-        my_pets=receiving_team,
-        enemy_pets=opposing_team,
-        is_in_battle=is_in_battle,
-    )
-    for team_pet in receiving_team:
-        if team_pet is not receiving_pet:
-            team_pet.trigger(
-                Trigger.ON_FRIEND_HURT,
+    # most pets don't react to being hurt. So only queue the event if someone is listening
+    if Trigger.ON_HURT in receiving_pet._triggers or has_friend_with_trigger(
+        receiving_pet, receiving_team, Trigger.ON_FRIEND_HURT
+    ):
+        battle_event_queue.push(
+            BattleEvent(
+                BattleEventKind.HURT,
+                receiving_pet,
                 my_pets=receiving_team,
                 enemy_pets=opposing_team,
                 is_in_battle=is_in_battle,
             )
+        )
     if receiving_pet.health <= 0 or attacking_pet.effect == Effect.PEANUT:
         # TODO: not sure what should trigger first. the mushroom or the on faint affect?
         # https://www.reddit.com/r/superautopets/comments/12xtp8d/mushroom_faint_ability_ordering_different_for/?rdt=51575
         # I'll make the mushroom trigger last after all on faint effects are done (since it's what the sapai repo does)
-        make_pet_faint(
-            receiving_pet,
-            my_pets=receiving_team,
-            enemy_pets=opposing_team,
-            is_in_battle=is_in_battle,
-        )
-        attacking_pet.trigger(
-            Trigger.ON_KNOCK_OUT, my_pets=opposing_team, enemy_pets=receiving_team
+        # the pet stays in the team until its faint event is handled (so its on hurt triggers still run). But it can't be hurt again
+        receiving_pet.is_alive = False
+        battle_event_queue.push(
+            BattleEvent(
+                BattleEventKind.FAINT,
+                receiving_pet,
+                my_pets=receiving_team,
+                enemy_pets=opposing_team,
+                is_in_battle=is_in_battle,
+            )
         )
+        if Trigger.ON_KNOCK_OUT in attacking_pet._triggers:
+            battle_event_queue.push(
+                BattleEvent(
+                    BattleEventKind.KNOCK_OUT,
+                    attacking_pet,
+                    my_pets=opposing_team,
+                    enemy_pets=receiving_team,
+                    is_in_battle=is_in_battle,
+                )
+            )
+    battle_event_queue.run(battle_event_handlers)
 
 
 def make_pet_faint(
     pet: Pet, my_pets: list[Pet], enemy_pets: list[Pet] | None, is_in_battle: bool
 ):
-    # print("fainted", pet)
-    idx_in_team = my_pets.index(pet)
+    if not pet.is_alive:
+        return  # the pet is already fainting
+    pet.is_alive = False
+    battle_event_queue.push(
+        BattleEvent(
+            BattleEventKind.FAINT,
+            pet,
+            my_pets=my_pets,
+            enemy_pets=enemy_pets,
+            is_in_battle=is_in_battle,
+        )
+    )
+    battle_event_queue.run(battle_event_handlers)
+
+
+def try_spawn_at_pos(pet_to_spawn: Pet, idx: int, pets: list[Pet], is_in_battle: bool):
+    # pets that are about to faint are still in the list, but they don't take up room
+    if sum(pet.is_alive for pet in pets) >= MAX_TEAM_SIZE:
+        return
+    if is_in_battle:
+        # if it's in battle, the list is not a fixed size
+        pets.insert(idx, pet_to_spawn)
+        update_team_idxs(pets, idx)
+    else:
+        # if it's not in battle, the list is a fixed size.
+        # one way is to just set the pet at the index. HOWEVER, we should try to "push" nearby pets into empty slots (to make room for the spawn)
+        # e.g. when a ram is spawned, we should try to make room for the spawns
+        # This is the right set of events. Because the alternative is that only one ram is spawned when there's room for two. It makes no sense since the player could've just shifted it before pilled the sheep to spawn the rams
+
+        shift_team_to_allow_spawn(pets, idx)
+        pets[idx] = pet_to_spawn
+        pet_to_spawn.team_idx = idx
+    trace = battle_trace.active_trace
+    if trace is not None:
+        trace.record(BattleTraceKind.SPAWN, pet_to_spawn.species, idx, 0)
+    battle_event_queue.push(
+        BattleEvent(
+            BattleEventKind.FRIEND_SUMMONED,
+            pet_to_spawn,
+            my_pets=pets,
+            enemy_pets=None,
+            is_in_battle=is_in_battle,
+        )
+    )
+    battle_event_queue.run(battle_event_handlers)
+
+
+def handle_knock_out(event: BattleEvent):
+    event.pet.trigger(
+        Trigger.ON_KNOCK_OUT, my_pets=event.my_pets, enemy_pets=event.enemy_pets
+    )
+
+
+def handle_friend_summoned(event: BattleEvent):
+    for friend in get_friends_with_trigger(
+        event.pet, event.my_pets, Trigger.ON_FRIEND_SUMMONED
+    ):
+        friend.trigger(
+            Trigger.ON_FRIEND_SUMMONED,
+            summoned_friend=event.pet,
+            my_pets=event.my_pets,
+            is_in_battle=event.is_in_battle,
+        )
+
+
+def get_friends_with_trigger(pet: Pet, my_pets: list[Pet], trigger: Trigger):
+    # the friends that should be notified about an event. Pets that are about to faint don't react to their friends
+    if not get_pets_with_trigger(my_pets, trigger):
+        return  # most of the time nobody is listening
+    # walk the live list by index (like a for loop over my_pets). So friends that are spawned while we're notifying
+    # (e.g. by a friend's trigger) are notified too, and a friend pushed back by a spawn can be notified twice
+    idx = 0
+    while idx < len(my_pets):
+        friend = my_pets[idx]
+        idx += 1
+        if friend is not pet and friend.is_alive and trigger in friend._triggers:
+            yield friend
+
+
+def has_friend_with_trigger(pet: Pet, my_pets: list[Pet], trigger: Trigger) -> bool:
+    for friend in get_pets_with_trigger(my_pets, trigger):
+        if friend is not pet:
+            return True
+    return False
+
+
+def handle_hurt(event: BattleEvent):
+    hurt_pet = event.pet
+    hurt_pet.trigger(
+        Trigger.ON_HURT,
+        my_pets=event.my_pets,
+        enemy_pets=event.enemy_pets,
+        is_in_battle=event.is_in_battle,
+    )
+    for friend in get_friends_with_trigger(
+        hurt_pet, event.my_pets, Trigger.ON_FRIEND_HURT
+    ):
+        friend.trigger(
+            Trigger.ON_FRIEND_HURT,
+            my_pets=event.my_pets,
+            enemy_pets=event.enemy_pets,
+            is_in_battle=event.is_in_battle,
+        )
+
+
+def handle_faint(event: BattleEvent):
+    pet = event.pet
+    my_pets = event.my_pets
+    is_in_battle = event.is_in_battle
+    idx_in_team = get_pet_idx(pet, my_pets)
+    trace = battle_trace.active_trace
+    if trace is not None:
+        trace.record(BattleTraceKind.FAINT, pet.species, idx_in_team, 0)
     if is_in_battle:
         my_pets.pop(idx_in_team)  # remove the pet first to make room for other pets
+        update_team_idxs(my_pets, idx_in_team)
     else:
         # e.g. when using a pill, we just set it to NONE (so the spot on the team becomes empty)
         my_pets[idx_in_team] = get_base_pet(Species.NONE)
+        my_pets[idx_in_team].team_idx = idx_in_team
     pet.trigger(
         Trigger.ON_FAINT,
         faint_pet_idx=idx_in_team,
         my_pets=my_pets,
-        enemy_pets=enemy_pets,
+        enemy_pets=event.enemy_pets,
         is_in_battle=is_in_battle,
     )
-    for team_pet in my_pets:
-        if team_pet is not pet:
-            team_pet.trigger(
-                Trigger.ON_FRIEND_FAINTS,
-                fainted_pet=pet,
-                faint_pet_idx=idx_in_team,
-                my_pets=my_pets,
-                is_in_battle=is_in_battle,
-            )
-
-    # now trigger the ON_FRIEND_AHEAD_FAINTS trigger
-    if (
-        idx_in_team > 0 and idx_in_team - 1 < len(my_pets)
-    ):  # I think we need to evaluate idx_in_team - 1 < len(my_pets) because the on_friend_faints above may have altered the team
-        my_pets[idx_in_team - 1].trigger(
-            Trigger.ON_FRIEND_AHEAD_FAINTS,
+    for friend in get_friends_with_trigger(pet, my_pets, Trigger.ON_FRIEND_FAINTS):
+        friend.trigger(
+            Trigger.ON_FRIEND_FAINTS,
+            fainted_pet=pet,
+            faint_pet_idx=idx_in_team,
             my_pets=my_pets,
             is_in_battle=is_in_battle,
         )
 
+    # now trigger the ON_FRIEND_AHEAD_FAINTS trigger
+    friend_behind_idx = idx_in_team - 1
+    # I think we need to evaluate idx_in_team - 1 < len(my_pets) because the on_friend_faints above may have altered the team
+    if friend_behind_idx < len(my_pets):
+        # skip the friends that are about to faint (like they were already removed)
+        while friend_behind_idx >= 0 and not my_pets[friend_behind_idx].is_alive:
+            friend_behind_idx -= 1
+        if friend_behind_idx >= 0:
+            my_pets[friend_behind_idx].trigger(
+                Trigger.ON_FRIEND_AHEAD_FAINTS,
+                my_pets=my_pets,
+                is_in_battle=is_in_battle,
+            )
+
     if pet.effect == Effect.MUSHROOM:
         new_pet = get_base_pet(pet.species).set_stats(
             attack=1,
@@ -242,28 +400,19 @@ def make_pet_faint(
         try_spawn_at_pos(new_pet, idx_in_team, my_pets, is_in_battle)
 
 
-def try_spawn_at_pos(pet_to_spawn: Pet, idx: int, pets: list[Pet], is_in_battle: bool):
-    if len(pets) >= MAX_TEAM_SIZE:
-        return
-    if is_in_battle:
-        # if it's in battle, the list is not a fixed size
-        pets.insert(idx, pet_to_spawn)
-    else:
-        # if it's not in battle, the list is a fixed size.
-        # one way is to just set the pet at the index. HOWEVER, we should try to "push" nearby pets into empty slots (to make room for the spawn)
-        # e.g. when a ram is spawned, we should try to make room for the spawns
-        # This is the right set of events. Because the alternative is that only one ram is spawned when there's room for two. It makes no sense since the player could've just shifted it before pilled the sheep to spawn the rams
+# indexed by BattleEventKind
+battle_event_handlers = [
+    handle_hurt,
+    handle_faint,
+    handle_knock_out,
+    handle_friend_summoned,
+]
 
-        shift_team_to_allow_spawn(pets, idx)
-        pets[idx] = pet_to_spawn
-    for pet in pets:
-        if pet is not pet_to_spawn:
-            pet.trigger(
-                Trigger.ON_FRIEND_SUMMONED,
-                summoned_friend=pet_to_spawn,
-                my_pets=pets,
-                is_in_battle=is_in_battle,
-            )
+
+def update_team_idxs(pets: list[Pet], start_idx: int):
+    # pets after start_idx shifted (after a pop or insert). The indexes are only hints, but keeping them right is cheap
+    for idx in range(start_idx, len(pets)):
+        pets[idx].team_idx = idx
 
 
 def shift_team_to_allow_spawn(pets: list[Pet], spawn_idx: int):
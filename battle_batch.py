@@ -0,0 +1,251 @@
+import numpy as np
+
+from all_types_and_consts import (
+    MAX_ATTACK,
+    MAX_HEALTH,
+    MAX_TEAM_SIZE,
+    BattleResult,
+    Effect,
+    Species,
+)
+from battle import battle
+from battle_soa import get_in_battle_triggers
+from duel_table import get_duel_table
+from team import Team
+
+# This simulates many independent battles at once. Each side of every battle is a row of a (N, MAX_TEAM_SIZE) tensor,
+# and the pets keep their team slot for the whole battle (fainted pets are just masked out by `alive`). Like the
+# list-based engine, the frontmost pet is the alive pet with the highest slot index.
+# Only teams whose pets have no in-battle triggers can be vectorized. Every other row is simulated with battle.battle().
+
+NO_EFFECT = Effect.NONE.value
+MEAT_BONE = Effect.MEAT_BONE.value
+STEAK = Effect.STEAK.value
+MELON = Effect.MELON.value
+GARLIC = Effect.GARLIC.value
+CHILLI = Effect.CHILLI.value
+PEANUT = Effect.PEANUT.value
+
+# the effects handled by attack_team() and receive_damage(). the bee and mushroom spawn pets, so they aren't supported
+batchable_effects = {
+    Effect.NONE,
+    Effect.MEAT_BONE,
+    Effect.STEAK,
+    Effect.MELON,
+    Effect.GARLIC,
+    Effect.CHILLI,
+    Effect.PEANUT,
+}
+# the effects that the duel table handles (see fight_duels())
+duel_effects = np.array([NO_EFFECT, MEAT_BONE, GARLIC], dtype=np.int32)
+
+
+class BatchSide:
+    __slots__ = ("attack", "health", "effect", "alive")
+
+    def __init__(self, num_battles: int):
+        self.attack = np.zeros((num_battles, MAX_TEAM_SIZE), dtype=np.int32)
+        self.health = np.zeros((num_battles, MAX_TEAM_SIZE), dtype=np.int32)
+        self.effect = np.zeros((num_battles, MAX_TEAM_SIZE), dtype=np.int32)
+        self.alive = np.zeros((num_battles, MAX_TEAM_SIZE), dtype=bool)
+
+    def load_team(self, row: int, team: Team):
+        for idx, pet in enumerate(team.pets):
+            if pet.species == Species.NONE:
+                continue
+            # same as Pet.apply_temp_buffs() (which clamps the stats even if there is no boost)
+            self.attack[row, idx] = min(MAX_ATTACK, pet.attack + pet.attack_boost)
+            self.health[row, idx] = min(MAX_HEALTH, pet.health + pet.health_boost)
+            self.effect[row, idx] = pet.effect.value
+            self.alive[row, idx] = True
+
+
+def can_battle_in_batch(team: Team) -> bool:
+    for pet in team.pets:
+        if pet.species == Species.NONE:
+            continue
+        if pet.effect not in batchable_effects or len(get_in_battle_triggers(pet)) > 0:
+            return False
+    return True
+
+
+def get_frontmost_idx(alive: np.ndarray) -> np.ndarray:
+    # returns the highest alive slot of each row (or -1 if the row has no alive pets)
+    reversed_idx = np.argmax(alive[:, ::-1], axis=1)
+    return np.where(alive.any(axis=1), MAX_TEAM_SIZE - 1 - reversed_idx, -1)
+
+
+def receive_damage(
+    rows: np.ndarray,
+    receiver_idx: np.ndarray,
+    damage: np.ndarray,
+    attacker_has_peanut: np.ndarray,
+    receiving_side: BatchSide,
+) -> np.ndarray:
+    """
+    Returns which rows changed (so we can tell when a battle is stuck)
+    """
+    effect = receiving_side.effect[rows, receiver_idx]
+    has_melon = effect == MELON
+    damage = np.where(has_melon, np.maximum(damage - 20, 0), damage)
+    receiving_side.effect[rows[has_melon], receiver_idx[has_melon]] = NO_EFFECT
+    damage = np.where(effect == GARLIC, np.maximum(damage - 2, 1), damage)
+
+    health = receiving_side.health[rows, receiver_idx] - damage
+    receiving_side.health[rows, receiver_idx] = health
+    faints = (damage != 0) & ((health <= 0) | attacker_has_peanut)
+    receiving_side.alive[rows[faints], receiver_idx[faints]] = False
+    return (damage != 0) | has_melon
+
+
+def attack_team(
+    rows: np.ndarray,
+    attacker_idx: np.ndarray,
+    attacking_side: BatchSide,
+    receiving_side: BatchSide,
+) -> np.ndarray:
+    """
+    Returns which rows changed (so we can tell when a battle is stuck)
+    """
+    damage = attacking_side.attack[rows, attacker_idx]
+    attacker_effect = attacking_side.effect[rows, attacker_idx]
+    damage = np.where(attacker_effect == MEAT_BONE, damage + 3, damage)
+    has_steak = attacker_effect == STEAK
+    damage = np.where(has_steak, np.maximum(damage + 20, MAX_ATTACK), damage)
+    # steak is only used once
+    attacking_side.effect[rows[has_steak], attacker_idx[has_steak]] = NO_EFFECT
+
+    receiving_alive = receiving_side.alive[rows]
+    frontmost_idx = get_frontmost_idx(receiving_alive)
+    receiving_alive[np.arange(len(rows)), frontmost_idx] = False
+    second_idx = get_frontmost_idx(receiving_alive)
+
+    changed = receive_damage(
+        rows, frontmost_idx, damage, attacker_effect == PEANUT, receiving_side
+    )
+    changed |= has_steak
+
+    # the second pet is always alive after the first hit, since nothing can spawn or trigger in these battles
+    has_chilli = (attacker_effect == CHILLI) & (second_idx >= 0)
+    chilli_rows = rows[has_chilli]
+    receive_damage(
+        chilli_rows,
+        second_idx[has_chilli],
+        np.full(len(chilli_rows), 5, dtype=np.int32),
+        np.zeros(len(chilli_rows), dtype=bool),
+        receiving_side,
+    )
+    return changed | has_chilli
+
+
+def get_duel_damage(
+    attacker_effect: np.ndarray, attack: np.ndarray, receiver_effect: np.ndarray
+) -> np.ndarray:
+    damage = np.where(attacker_effect == MEAT_BONE, attack + 3, attack)
+    return np.where(receiver_effect == GARLIC, np.maximum(damage - 2, 1), damage)
+
+
+def fight_duels(
+    rows: np.ndarray,
+    pet1_idx: np.ndarray,
+    pet2_idx: np.ndarray,
+    side1: BatchSide,
+    side2: BatchSide,
+) -> np.ndarray:
+    """
+    Plays out every round until one of the front pets faints, by looking up the result in the duel table.
+    Returns which rows changed (so we can tell when a battle is stuck)
+    """
+    effect1 = side1.effect[rows, pet1_idx]
+    effect2 = side2.effect[rows, pet2_idx]
+    damage1 = get_duel_damage(effect1, side1.attack[rows, pet1_idx], effect2)
+    damage2 = get_duel_damage(effect2, side2.attack[rows, pet2_idx], effect1)
+    health_left = get_duel_table()[
+        damage1, side1.health[rows, pet1_idx], damage2, side2.health[rows, pet2_idx]
+    ]
+    side1.health[rows, pet1_idx] = health_left[:, 0]
+    side2.health[rows, pet2_idx] = health_left[:, 1]
+    side1.alive[rows, pet1_idx] = health_left[:, 0] > 0
+    side2.alive[rows, pet2_idx] = health_left[:, 1] > 0
+    return (damage1 != 0) | (damage2 != 0)
+
+
+def battle_batch(teams_a: list[Team], teams_b: list[Team]) -> list[BattleResult]:
+    """
+    Returns the same results as [battle(team_a, team_b) for team_a, team_b in zip(teams_a, teams_b)]
+    """
+    assert len(teams_a) == len(teams_b)
+    num_battles = len(teams_a)
+    results: list[BattleResult | None] = [None] * num_battles
+
+    side1 = BatchSide(num_battles)
+    side2 = BatchSide(num_battles)
+    is_batched = np.zeros(num_battles, dtype=bool)
+    for row, (team_a, team_b) in enumerate(zip(teams_a, teams_b)):
+        if can_battle_in_batch(team_a) and can_battle_in_batch(team_b):
+            side1.load_team(row, team_a)
+            side2.load_team(row, team_b)
+            is_batched[row] = True
+        else:
+            results[row] = battle(team_a, team_b)
+
+    active_rows = np.flatnonzero(
+        is_batched & side1.alive.any(axis=1) & side2.alive.any(axis=1)
+    )
+    while len(active_rows) > 0:
+        # get both attackers first, since attacker2 still attacks if it faints from attacker1's hit
+        attacker1_idx = get_frontmost_idx(side1.alive[active_rows])
+        attacker2_idx = get_frontmost_idx(side2.alive[active_rows])
+        changed = np.zeros(len(active_rows), dtype=bool)
+
+        # if the front pets' effects only change the damage, the whole duel can be looked up in the duel table
+        effect1 = side1.effect[active_rows, attacker1_idx]
+        effect2 = side2.effect[active_rows, attacker2_idx]
+        is_duel = (
+            np.isin(effect1, duel_effects)
+            & np.isin(effect2, duel_effects)
+            & (side1.health[active_rows, attacker1_idx] > 0)
+            & (side2.health[active_rows, attacker2_idx] > 0)
+        )
+        changed[is_duel] = fight_duels(
+            active_rows[is_duel],
+            attacker1_idx[is_duel],
+            attacker2_idx[is_duel],
+            side1,
+            side2,
+        )
+
+        # otherwise, play out one round
+        is_round = ~is_duel
+        round_rows = active_rows[is_round]
+        changed[is_round] = attack_team(
+            round_rows, attacker1_idx[is_round], side1, side2
+        )
+        # only attack if there's still a team to attack!
+        side1_has_pets = side1.alive[active_rows].any(axis=1)
+        is_round &= side1_has_pets
+        changed[is_round] |= attack_team(
+            active_rows[is_round],
+            attacker2_idx[is_round],
+            side2,
+            side1,
+        )
+
+        # a round where nothing happens (e.g. both frontmost pets have 0 attack) would repeat forever, so call it a tie
+        is_still_fighting = (
+            changed
+            & side1.alive[active_rows].any(axis=1)
+            & side2.alive[active_rows].any(axis=1)
+        )
+        active_rows = active_rows[is_still_fighting]
+
+    side1_has_pets = side1.alive.any(axis=1)
+    side2_has_pets = side2.alive.any(axis=1)
+    for row in np.flatnonzero(is_batched):
+        if side1_has_pets[row] and not side2_has_pets[row]:
+            results[row] = BattleResult.WON_BATTLE
+        elif side2_has_pets[row] and not side1_has_pets[row]:
+            results[row] = BattleResult.LOST_BATTLE
+        else:
+            results[row] = BattleResult.TIE
+    return results
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from all_types_and_consts import MAX_TEAM_SIZE, BattleResult, Effect, Species, Trigger
+from battle import _battle_loop
+from battle_batch import battle_batch, can_battle_in_batch
+from pet_data import get_base_pet
+from pet_triggers import on_faint_cricket
+from team import Team
+
+# battle_batch() uses the duel table. don't save it to the real cache dir
+pytestmark = pytest.mark.usefixtures("tmp_duel_table_dir")
+
+effects = [Effect.NONE] * 4 + [
+    Effect.MEAT_BONE,
+    Effect.STEAK,
+    Effect.MELON,
+    Effect.GARLIC,
+    Effect.CHILLI,
+    Effect.PEANUT,
+]
+
+
+def random_team(rng: random.Random) -> Team:
+    pets = []
+    for _ in range(MAX_TEAM_SIZE):
+        if rng.random() < 0.2:
+            pets.append(get_base_pet(Species.NONE))
+            continue
+        pet = get_base_pet(rng.choice([Species.PIG, Species.SNAIL, Species.FISH]))
+        pet.set_stats(attack=rng.randint(1, 30), health=rng.randint(1, 30))
+        pet.set_effect(rng.choice(effects))
+        pets.append(pet)
+    return Team(pets)
+
+
+def test_battle_batch_matches_the_battle_loop():
+    # (not battle(), which takes the closed form for these teams)
+    rng = random.Random(0)
+    teams_a = [random_team(rng) for _ in range(500)]
+    teams_b = [random_team(rng) for _ in range(500)]
+    assert battle_batch(teams_a, teams_b) == [
+        _battle_loop(team_a, team_b) for team_a, team_b in zip(teams_a, teams_b)
+    ]
+
+
+def test_battle_batch_falls_back_for_triggers():
+    cricket = get_base_pet(Species.CRICKET).set_stats(attack=1, health=1)
+    cricket.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    team1 = Team([get_base_pet(Species.NONE)] * (MAX_TEAM_SIZE - 1) + [cricket])
+    team2 = Team(
+        [get_base_pet(Species.NONE)] * (MAX_TEAM_SIZE - 1)
+        + [get_base_pet(Species.PIG).set_stats(attack=1, health=1)]
+    )
+    assert not can_battle_in_batch(team1)
+    # the zombie cricket wins the battle
+    assert battle_batch([team1, team2], [team2, team2]) == [
+        BattleResult.WON_BATTLE,
+        BattleResult.TIE,
+    ]
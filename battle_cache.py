@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from typing import Callable
+
+from all_types_and_consts import BattleResult, Species
+from battle_determinism import is_battle_deterministic
+from battle_soa import battle_soa, get_in_battle_triggers
+from pet_data import species_to_pet_map
+import pet_triggers
+from team import Team
+from utils import compress_team
+
+BattleFn = Callable[[Team, Team], BattleResult]
+
+
+def has_base_triggers(team: Team) -> bool:
+    # compress_team() doesn't encode triggers. So only teams whose pets have their species' in-battle triggers can be cached
+    # (e.g. a parrot that copied a pet's triggers would have the same encoding as a regular parrot)
+    for pet in team.pets:
+        if pet.species == Species.NONE:
+            continue
+        base_pet = species_to_pet_map[pet.species]
+        if pet._triggers is not base_pet._triggers and get_in_battle_triggers(
+            pet
+        ) != get_in_battle_triggers(base_pet):
+            return False
+    return True
+
+
+class BattleCache:
+    """
+    A bounded LRU cache of battle results. Only deterministic matchups are cached (see battle_determinism.py)
+
+    Note: battle() clones the teams (which doesn't copy the pets' metadata), so the metadata doesn't need to be in the key.
+    The cache clears itself when set_pet_triggers() (re)registers the triggers. But call clear() if you change the base
+    pets' triggers by hand
+    """
+
+    def __init__(self, max_size: int = 100_000, battle_fn: BattleFn = battle_soa):
+        self.max_size = max_size
+        self.battle_fn = battle_fn
+        self.results: OrderedDict[tuple[bytes, bytes], BattleResult] = OrderedDict()
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+        self.pet_triggers_version = pet_triggers.pet_triggers_version
+
+    def battle(self, team1: Team, team2: Team) -> BattleResult:
+        if self.pet_triggers_version != pet_triggers.pet_triggers_version:
+            # the results were cached with the old triggers
+            self.clear()
+            self.pet_triggers_version = pet_triggers.pet_triggers_version
+
+        if not (has_base_triggers(team1) and has_base_triggers(team2)):
+            self.num_misses += 1
+            return self.battle_fn(team1, team2)
+
+        key = (compress_team(team1), compress_team(team2))
+        result = self.results.get(key)
+        if result is not None:
+            self.num_hits += 1
+            self.results.move_to_end(key)
+            return result
+
+        self.num_misses += 1
+        result = self.battle_fn(team1, team2)
+        if is_battle_deterministic(team1, team2):
+            self.results[key] = result
+            if len(self.results) > self.max_size:
+                self.results.popitem(last=False)  # evict the least recently used result
+                self.num_evictions += 1
+        return result
+
+    def clear(self):
+        self.results.clear()
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            "hits": self.num_hits,
+            "misses": self.num_misses,
+            "evictions": self.num_evictions,
+            "size": len(self.results),
+        }
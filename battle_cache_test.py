@@ -0,0 +1,40 @@
+from all_types_and_consts import MAX_TEAM_SIZE, BattleResult, Species, Trigger
+from battle_cache import BattleCache
+from pet_data import get_base_pet
+from pet_triggers import on_battle_start_mosquito
+from team import Team
+
+
+def team_of(*pets) -> Team:
+    return Team(
+        [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE - len(pets))]
+        + list(pets)
+    )
+
+
+def test_battle_cache_hits_and_evicts():
+    cache = BattleCache(max_size=1)
+    weak_team = team_of(get_base_pet(Species.PIG).set_stats(attack=1, health=1))
+    strong_team = team_of(get_base_pet(Species.PIG).set_stats(attack=5, health=5))
+
+    assert cache.battle(strong_team, weak_team) == BattleResult.WON_BATTLE
+    # equal teams share the same key, even if they're different objects
+    assert cache.battle(strong_team.clone(), weak_team) == BattleResult.WON_BATTLE
+    assert (cache.num_hits, cache.num_misses) == (1, 1)
+
+    assert cache.battle(weak_team, strong_team) == BattleResult.LOST_BATTLE
+    assert cache.num_evictions == 1
+    assert cache.battle(strong_team, weak_team) == BattleResult.WON_BATTLE
+    assert (cache.num_hits, cache.num_misses) == (1, 3)
+
+
+def test_battle_cache_skips_random_matchups():
+    cache = BattleCache()
+    mosquito = get_base_pet(Species.MOSQUITO)
+    mosquito.set_trigger(Trigger.ON_BATTLE_START, on_battle_start_mosquito)
+    team1 = team_of(mosquito)
+    team2 = team_of(get_base_pet(Species.PIG))
+    cache.battle(team1, team2)
+    cache.battle(team1, team2)
+    assert cache.num_hits == 0
+    assert len(cache.results) == 0
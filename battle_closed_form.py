@@ -0,0 +1,149 @@
+import math
+
+from all_types_and_consts import (
+    MAX_ATTACK,
+    MAX_HEALTH,
+    BattleResult,
+    Effect,
+    Species,
+    in_battle_triggers_mask,
+)
+from pet import Pet
+from team import Team
+
+# When no pet has an in-battle trigger (and no pet can spawn another pet), a battle is just the two front pets hitting each
+# other until one of them faints. Each hit does the same damage, so we can compute how many hits each front pet survives
+# instead of stepping through them one by one (and we don't need to clone the teams either).
+
+# the effects that only change the damage of a hit. the bee and mushroom spawn pets. And the chilli hits the pet behind
+# the front pet (so the front pets' duels wouldn't be independent)
+closed_form_effects = {
+    Effect.NONE,
+    Effect.MEAT_BONE,
+    Effect.STEAK,
+    Effect.MELON,
+    Effect.GARLIC,
+    Effect.PEANUT,
+}
+
+# pets are stored as [attack, health, effect] (front pet last, like in battle())
+ATTACK, HEALTH, EFFECT = 0, 1, 2
+
+
+def can_battle_in_closed_form(teams: tuple[Team, Team]) -> bool:
+    for team in teams:
+        for pet in team.pets:
+            if pet.species == Species.NONE:
+                continue
+            if pet.effect not in closed_form_effects:
+                return False
+            for trigger in pet._triggers:
+                if in_battle_triggers_mask >> trigger._value_ & 1:
+                    return False
+    return True
+
+
+def get_closed_form_pet(pet: Pet) -> list:
+    # same as Pet.apply_temp_buffs() (which clamps the stats even if there is no boost)
+    return [
+        min(MAX_ATTACK, pet.attack + pet.attack_boost),
+        min(MAX_HEALTH, pet.health + pet.health_boost),
+        pet.effect,
+    ]
+
+
+def get_closed_form_pets(team: Team) -> list[list]:
+    return [
+        get_closed_form_pet(pet) for pet in team.pets if pet.species != Species.NONE
+    ]
+
+
+def get_damage(attacker: list, receiver: list) -> int:
+    # the same damage as attack_team() and receive_damage() in battle.py
+    damage = attacker[ATTACK]
+    if attacker[EFFECT] == Effect.MEAT_BONE:
+        damage += 3
+    elif attacker[EFFECT] == Effect.STEAK:
+        damage = max(damage + 20, MAX_ATTACK)
+    if receiver[EFFECT] == Effect.MELON:
+        damage = max(damage - 20, 0)
+    elif receiver[EFFECT] == Effect.GARLIC:
+        damage = max(damage - 2, 1)
+    return damage
+
+
+def get_num_hits_to_faint(attacker: list, receiver: list, damage: int) -> float:
+    if damage == 0:
+        return math.inf
+    if attacker[EFFECT] == Effect.PEANUT:
+        return 1
+    return max(math.ceil(receiver[HEALTH] / damage), 1)
+
+
+def battle_closed_form(my_team: Team, team2: Team) -> BattleResult:
+    """
+    Returns the same result as battle(). Only call this if can_battle_in_closed_form() is True
+    """
+    return battle_closed_form_pets(
+        get_closed_form_pets(my_team), get_closed_form_pets(team2)
+    )
+
+
+def battle_closed_form_pets(pets1: list[list], pets2: list[list]) -> BattleResult:
+    # the pets are from get_closed_form_pets(). They're modified (and popped as they faint)
+    if not fight_closed_form_pets(pets1, pets2):
+        # neither pet can hurt the other. battle() would loop forever, so call it a tie (like battle_batch())
+        return BattleResult.TIE
+
+    if len(pets1) == 0 and len(pets2) == 0:
+        return BattleResult.TIE
+    elif len(pets1) > 0:
+        return BattleResult.WON_BATTLE
+    else:
+        return BattleResult.LOST_BATTLE
+
+
+def fight_closed_form_pets(pets1: list[list], pets2: list[list]) -> bool:
+    """
+    The front pets fight until one of the teams has no pets left. Only the front pets matter, so this can be called with
+    part of a team (e.g. just its front pet) and continued later with the pets behind it.
+    Returns False if the front pets can't hurt each other (which would be a stalemate)
+    """
+    while len(pets1) > 0 and len(pets2) > 0:
+        pet1 = pets1[-1]
+        pet2 = pets2[-1]
+        damage1 = get_damage(pet1, pet2)
+        damage2 = get_damage(pet2, pet1)
+
+        # the steak and melon are used up on the first hit. So we play that hit out by itself
+        if (
+            pet1[EFFECT] == Effect.STEAK
+            or pet1[EFFECT] == Effect.MELON
+            or pet2[EFFECT] == Effect.STEAK
+            or pet2[EFFECT] == Effect.MELON
+        ):
+            num_hits = 1
+        else:
+            num_hits = min(
+                get_num_hits_to_faint(pet1, pet2, damage1),
+                get_num_hits_to_faint(pet2, pet1, damage2),
+            )
+            if num_hits == math.inf:
+                return False
+
+        pet1[HEALTH] -= num_hits * damage2
+        pet2[HEALTH] -= num_hits * damage1
+        is_pet1_fainted = damage2 > 0 and (
+            pet1[HEALTH] <= 0 or pet2[EFFECT] == Effect.PEANUT
+        )
+        is_pet2_fainted = damage1 > 0 and (
+            pet2[HEALTH] <= 0 or pet1[EFFECT] == Effect.PEANUT
+        )
+        for pet in (pet1, pet2):
+            if pet[EFFECT] == Effect.STEAK or pet[EFFECT] == Effect.MELON:
+                pet[EFFECT] = Effect.NONE
+        if is_pet1_fainted:
+            pets1.pop()
+        if is_pet2_fainted:
+            pets2.pop()
+    return True
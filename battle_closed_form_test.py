@@ -0,0 +1,47 @@
+import random
+
+from all_types_and_consts import MAX_TEAM_SIZE, BattleResult, Effect, Species, Trigger
+from battle import _battle_loop
+from battle_closed_form import battle_closed_form, can_battle_in_closed_form
+from pet_data import get_base_pet
+from pet_triggers import on_faint_cricket
+from team import Team
+from testing_utils import random_team
+
+
+def test_battle_closed_form_matches_the_battle_loop():
+    # battle() would take the closed form itself. So compare against the loop that plays every attack
+    rng = random.Random(0)
+    teams_a = [random_team(rng) for _ in range(500)]
+    teams_b = [random_team(rng) for _ in range(500)]
+    assert all(
+        can_battle_in_closed_form((team_a, team_b))
+        for team_a, team_b in zip(teams_a, teams_b)
+    )
+    assert [
+        battle_closed_form(team_a, team_b) for team_a, team_b in zip(teams_a, teams_b)
+    ] == [_battle_loop(team_a, team_b) for team_a, team_b in zip(teams_a, teams_b)]
+
+
+def test_battle_closed_form_doesnt_modify_teams():
+    pig = (
+        get_base_pet(Species.PIG).set_stats(attack=3, health=3).set_effect(Effect.MELON)
+    )
+    team1 = Team([get_base_pet(Species.NONE)] * (MAX_TEAM_SIZE - 1) + [pig])
+    team2 = team1.clone()
+    assert battle_closed_form(team1, team2) == BattleResult.TIE
+    assert (pig.health, pig.effect) == (3, Effect.MELON)
+
+
+def test_can_battle_in_closed_form():
+    pig_team = Team([get_base_pet(Species.PIG)] * MAX_TEAM_SIZE)
+    cricket = get_base_pet(Species.CRICKET)
+    cricket.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    cricket_team = Team([get_base_pet(Species.NONE)] * (MAX_TEAM_SIZE - 1) + [cricket])
+    chilli_team = Team(
+        [get_base_pet(Species.NONE)] * (MAX_TEAM_SIZE - 1)
+        + [get_base_pet(Species.PIG).set_effect(Effect.CHILLI)]
+    )
+    assert can_battle_in_closed_form((pig_team, pig_team))
+    assert not can_battle_in_closed_form((pig_team, cricket_team))
+    assert not can_battle_in_closed_form((chilli_team, pig_team))
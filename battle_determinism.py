@@ -0,0 +1,71 @@
+from all_types_and_consts import MAX_ATTACK, Species, Trigger, in_battle_triggers
+from pet import Pet
+from pet_data import species_to_pet_map
+from pet_triggers import (
+    on_battle_start_leopard,
+    on_battle_start_mosquito,
+    on_faint_ant,
+    on_faint_spider,
+    on_friend_ahead_attacks_snake,
+    on_hurt_blowfish,
+)
+from team import Team
+
+# in-battle triggers that call random (directly or via Team.get_random_pets_from_list).
+# Remember to add new triggers here if they use random! Otherwise cached/sampled battle results will be wrong
+random_in_battle_trigger_fns = {
+    on_faint_ant,
+    on_battle_start_mosquito,
+    on_faint_spider,
+    on_hurt_blowfish,
+    on_battle_start_leopard,
+    on_friend_ahead_attacks_snake,
+}
+
+
+def has_random_triggers(pet: Pet) -> bool:
+    for trigger, trigger_fns in pet._triggers.items():
+        if trigger not in in_battle_triggers:
+            continue
+        for trigger_fn in trigger_fns:
+            if trigger_fn in random_in_battle_trigger_fns:
+                return True
+    return False
+
+
+def has_on_battle_start_attack_ties(teams: tuple[Team, Team]) -> bool:
+    # trigger_on_battle_start() orders the pets by attack (after temp buffs). In the real game, ties are broken randomly.
+    # Our sort is stable so ties are currently deterministic, but we don't want to rely on that
+    seen_attacks = set()
+    for team in teams:
+        for pet in team.pets:
+            if pet.species == Species.NONE or not pet._triggers.get(
+                Trigger.ON_BATTLE_START
+            ):
+                continue
+            attack = min(MAX_ATTACK, pet.attack + pet.attack_boost)
+            if attack in seen_attacks:
+                return True
+            seen_attacks.add(attack)
+    return False
+
+
+def is_battle_deterministic(team1: Team, team2: Team) -> bool:
+    """
+    Returns True if battle(team1, team2) can't depend on random (so it always returns the same result)
+    """
+    # pets spawned mid-battle (mushrooms, crickets, bees, whales etc.) are clones of the base pets
+    spawnable_species = {Species.PET_SPAWN}
+    for team in (team1, team2):
+        for pet in team.pets:
+            if pet.species == Species.NONE:
+                continue
+            # check the pet itself since a parrot may have copied another pet's triggers
+            if has_random_triggers(pet):
+                return False
+            spawnable_species.add(pet.species)
+
+    for species in spawnable_species:
+        if has_random_triggers(species_to_pet_map[species]):
+            return False
+    return not has_on_battle_start_attack_ties((team1, team2))
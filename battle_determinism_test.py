@@ -0,0 +1,43 @@
+from all_types_and_consts import MAX_TEAM_SIZE, Species, Trigger
+from battle_determinism import is_battle_deterministic
+from pet_data import get_base_pet
+from pet_triggers import (
+    on_battle_start_dolphin,
+    on_battle_start_mosquito,
+    on_faint_cricket,
+)
+from team import Team
+
+
+def team_of(*pets) -> Team:
+    return Team(
+        [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE - len(pets))]
+        + list(pets)
+    )
+
+
+def test_vanilla_battles_are_deterministic():
+    cricket = get_base_pet(Species.CRICKET)
+    cricket.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    team1 = team_of(get_base_pet(Species.PIG), cricket)
+    team2 = team_of(get_base_pet(Species.HORSE))
+    assert is_battle_deterministic(team1, team2)
+
+
+def test_random_triggers_are_not_deterministic():
+    # e.g. a parrot that copied a mosquito
+    parrot = get_base_pet(Species.PARROT)
+    parrot.set_trigger(Trigger.ON_BATTLE_START, on_battle_start_mosquito)
+    assert not is_battle_deterministic(
+        team_of(parrot), team_of(get_base_pet(Species.PIG))
+    )
+
+
+def test_battle_start_attack_ties_are_not_deterministic():
+    dolphin1 = get_base_pet(Species.DOLPHIN).set_stats(attack=4, health=3)
+    dolphin1.set_trigger(Trigger.ON_BATTLE_START, on_battle_start_dolphin)
+    dolphin2 = get_base_pet(Species.DOLPHIN).set_stats(attack=4, health=3)
+    dolphin2.set_trigger(Trigger.ON_BATTLE_START, on_battle_start_dolphin)
+    assert not is_battle_deterministic(team_of(dolphin1), team_of(dolphin2))
+    dolphin2.set_stats(attack=5, health=3)
+    assert is_battle_deterministic(team_of(dolphin1), team_of(dolphin2))
@@ -0,0 +1,79 @@
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum, auto
+from typing import Callable
+
+from pet import Pet
+
+
+# an IntEnum so the kind can index lists (e.g. the event handlers) without hashing the enum
+class BattleEventKind(IntEnum):
+    HURT = 0  # ON_HURT, then ON_FRIEND_HURT for the pet's friends
+    # removes the pet. then ON_FAINT, ON_FRIEND_FAINTS, ON_FRIEND_AHEAD_FAINTS, and the mushroom/bee spawn
+    FAINT = auto()
+    KNOCK_OUT = auto()  # ON_KNOCK_OUT for the pet that dealt the final blow
+    FRIEND_SUMMONED = auto()  # ON_FRIEND_SUMMONED for the summoned pet's friends
+
+
+@dataclass(slots=True)
+class BattleEvent:
+    kind: BattleEventKind
+    # the pet that was hurt/fainted/summoned. For knock outs, it's the pet that knocked out the other pet
+    pet: Pet
+    my_pets: list[Pet]
+    enemy_pets: list[Pet] | None
+    is_in_battle: bool
+
+
+class BattleEventQueue:
+    """
+    Damage is applied immediately, but the reactions to it (triggers, fainting, spawning) are queued and handled in
+    FIFO order. So a trigger that deals damage while we're handling an event just adds more events to the queue (instead
+    of recursing into receive_damage -> make_pet_faint -> trigger -> receive_damage ...).
+    """
+
+    def __init__(self):
+        self.events: deque[BattleEvent] = deque()
+        self.is_running = False
+        # for measuring how expensive cascades are
+        self.num_events_handled = [0] * len(BattleEventKind)
+        self.max_queue_len = 0
+
+    def push(self, event: BattleEvent):
+        self.events.append(event)
+        if len(self.events) > self.max_queue_len:
+            self.max_queue_len = len(self.events)
+
+    def run(self, event_handlers: list[Callable[[BattleEvent], None]]):
+        """
+        event_handlers is indexed by the event's kind
+        """
+        # only the outermost caller handles the events. Nested calls (from triggers that run while we're handling an
+        # event) leave their events in the queue, and we'll get to them in this loop
+        if self.is_running or not self.events:
+            return
+        self.is_running = True
+        try:
+            while self.events:
+                event = self.events.popleft()
+                self.num_events_handled[event.kind] += 1
+                event_handlers[event.kind](event)
+        finally:
+            # if a trigger raised, don't leave its events around for the next battle
+            self.events.clear()
+            self.is_running = False
+
+    def get_stats(self) -> dict[str, int]:
+        stats = {
+            f"num_{kind.name.lower()}_events": self.num_events_handled[kind]
+            for kind in BattleEventKind
+        }
+        stats["max_queue_len"] = self.max_queue_len
+        return stats
+
+    def reset_stats(self):
+        self.num_events_handled = [0] * len(BattleEventKind)
+        self.max_queue_len = 0
+
+
+battle_event_queue = BattleEventQueue()
@@ -0,0 +1,153 @@
+import random
+
+import pytest
+
+from all_types_and_consts import MAX_TEAM_SIZE, BattleResult, Effect, Species, Trigger
+from battle import battle, make_pet_faint, receive_damage
+from battle_events import BattleEventKind, battle_event_queue
+from pet_data import get_base_pet
+from pet_triggers import (
+    on_faint_hedgehog,
+    on_faint_mammoth,
+    on_friend_faints_fly,
+    on_hurt_blowfish,
+    set_pet_triggers,
+)
+from team import Team
+
+
+def get_blowfish(health: int):
+    blowfish = get_base_pet(Species.BLOWFISH).set_stats(attack=1, health=health)
+    blowfish.set_trigger(Trigger.ON_HURT, on_hurt_blowfish)
+    return blowfish
+
+
+def test_fainting_pet_still_triggers_on_hurt():
+    blowfish = get_blowfish(health=1)
+    pig = get_base_pet(Species.PIG).set_stats(attack=1, health=10)
+    my_pets, enemy_pets = [blowfish], [pig]
+    receive_damage(
+        receiving_pet=blowfish,
+        attacking_pet=pig,
+        damage=5,
+        receiving_team=my_pets,
+        opposing_team=enemy_pets,
+        is_in_battle=True,
+    )
+    assert my_pets == []
+    assert not blowfish.is_alive
+    assert pig.health == 7
+
+
+def test_hurt_cascades_are_queued():
+    # the blowfish keep hurting each other until they faint (blowfish2's last hurt trigger runs while it's fainting)
+    blowfish1 = get_blowfish(health=50)
+    blowfish2 = get_blowfish(health=48)
+    pets1, pets2 = [blowfish1], [blowfish2]
+    battle_event_queue.reset_stats()
+    receive_damage(
+        receiving_pet=blowfish1,
+        attacking_pet=blowfish2,
+        damage=3,
+        receiving_team=pets1,
+        opposing_team=pets2,
+        is_in_battle=True,
+    )
+    assert pets1 == [] and pets2 == []
+    assert battle_event_queue.num_events_handled[BattleEventKind.HURT.value] == 33
+    assert battle_event_queue.num_events_handled[BattleEventKind.FAINT.value] == 2
+    assert len(battle_event_queue.events) == 0
+
+
+def test_hits_from_one_trigger_land_before_their_reactions():
+    # the intended difference from resolving the reactions recursively: a trigger that runs while an event is handled
+    # (here, the hedgehog's faint) hits every pet before any of them react. Recursively, the mammoth's faint would buff
+    # the pig to 3/4 before the hedgehog hits it, and the pig would survive
+    hedgehog = get_base_pet(Species.HEDGEHOG).set_stats(attack=1, health=1)
+    hedgehog.set_trigger(Trigger.ON_FAINT, on_faint_hedgehog)
+    mammoth = get_base_pet(Species.MAMMOTH).set_stats(attack=1, health=1)
+    mammoth.set_trigger(Trigger.ON_FAINT, on_faint_mammoth)
+    pig = get_base_pet(Species.PIG).set_stats(attack=1, health=2)
+    my_pets, enemy_pets = [hedgehog], [mammoth, pig]
+    make_pet_faint(hedgehog, my_pets=my_pets, enemy_pets=enemy_pets, is_in_battle=True)
+    assert my_pets == [] and enemy_pets == []
+    # the pig was already fainting when the mammoth's faint was handled, so it wasn't buffed
+    assert (pig.attack, pig.health) == (1, 0)
+
+
+def test_friends_are_notified_by_walking_the_live_team():
+    # like a for loop over the team: each zombie fly is spawned behind the fly, which pushes the fly back to the next
+    # index. So the fly is notified again (until it has spawned its 3 zombie flies)
+    fly = get_base_pet(Species.FLY)
+    fly.set_trigger(Trigger.ON_FRIEND_FAINTS, on_friend_faints_fly)
+    pig = get_base_pet(Species.PIG).set_stats(attack=1, health=1)
+    my_pets = [pig, fly]
+    make_pet_faint(pig, my_pets=my_pets, enemy_pets=[], is_in_battle=True)
+    assert [pet.species for pet in my_pets] == [Species.PET_SPAWN] * 3 + [Species.FLY]
+
+
+# the results of random teams with every pet's triggers, from resolving the reactions recursively (before the battle
+# events were queued). "-" is a battle the recursive version couldn't finish (e.g. it hit the recursion limit)
+RECURSIVE_RESULTS = (
+    "TLW-WLLLLLWWLL-LT-L-L-LL-WLLLLW--WWWWW-TWL-LLW--WWL-L-L-WLLL-L--WWWWL-WW-LWWLLWT"
+    "LWW-WLLLTLLL--WLLLLWWWLLLL-T-L--WLTLWLLL-WWLWTWWL-T-LW-WL-LLLWWL-LLWLLLWWW-WLL-L"
+    "L-L--LLWWWWLWW-T-TLW-LLLLWWWWWLWLWWW--LLWLTLLWLLWWWTLWWWLLWWLLLLLWW-WW-LWWLW--LL"
+    "WWLWWWLL-LLLWW-LLWWWW-WWWLLL-TWL-LLL-TLW-WLWLLLWLW-WLLWW-WLWWWWWLWLWWL--WWWW-WWT"
+    "LLL--WLLTLWLLWLWWLTWWLLLLL--WWL--TL--LLLL-LLTWWLLL-TWL-WLWLLLWLW-WWW-WWLWLTWLLLL"
+    "WLLWLWLWWWLLLWTLW-WWWWWW-WW-LW-WLTLLWW-LLL-W-WLW-LWLWWLWLTLW-WLWLLLWL-WLLW-TW-LL"
+    "L--WWLWLWTLTLLLLWTLWWWWT--WWLW-TLWWLLW-WLWWWLWLWLWWLLLWLLWLWW-LW-LLLLLLWWWLLTW-L"
+    "-WWW-WTWLWLWTWLWWWWWTWLWWLWWLWTTLWLL--T-LLW-LLW-LTTLLLWWWW--LLLLWWWL--WLWL--WWWW"
+    "-LWWTLWLWWTLLWWLWWTWLLWTL-LLLWTLLWLL-WWLWLW-WWWLWWTW-WWWLLWLL-WLLTLLWLWWTWLWLWWW"
+    "WLL--LLWLWWWLWLTWLL-WTWWLTLWWWWWWWLTLLWWLLWWW--WLLTW-LWWTTLWL-LWL-LWLTLLLWLWWWLL"
+    "WLW-LWLLWL-LLLWWWWL-WWWLWLLT-WL--WLLLLLLLWWLWLLLLLLWWLW-WWLLWL--TWLWLLL-WTLLWLL-"
+    "WLLWLWL-LWWLLWLLLWWWWLWLWWLLWL-WLWLT-LWLWLWLWLLWWLWL-WWWLLLLWW-WLWLLWW-TLL-WWWLL"
+    "-WLLWWLWLLWLWLWWWLLLLL-W-WTLL-W-L-LWLWTL"
+)
+# the battles where a fainting hedgehog or badger hits pets before they react (see
+# test_hits_from_one_trigger_land_before_their_reactions), which changes the result
+HIT_ORDER_RESULTS = {309: "T", 528: "T", 580: "L", 674: "T"}
+result_chars = {
+    BattleResult.WON_BATTLE: "W",
+    BattleResult.LOST_BATTLE: "L",
+    BattleResult.TIE: "T",
+}
+# the species whose triggers pick random targets are left out, so every battle has one result
+deterministic_species = [
+    species
+    for species in Species
+    if species
+    not in (
+        Species.NONE,
+        Species.PET_SPAWN,
+        Species.TIGER,
+        Species.ANT,
+        Species.MOSQUITO,
+        Species.SPIDER,
+        Species.BLOWFISH,
+        Species.LEOPARD,
+        Species.SNAKE,
+    )
+]
+
+
+def random_triggered_team(rng: random.Random) -> Team:
+    pets = [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE)]
+    for idx in rng.sample(range(MAX_TEAM_SIZE), rng.randint(3, MAX_TEAM_SIZE)):
+        pet = get_base_pet(rng.choice(deterministic_species))
+        pet.set_stats(attack=rng.randint(1, 6), health=rng.randint(1, 6))
+        pet.set_effect(rng.choice(list(Effect)))
+        pet.experience = rng.choice([1, 3, 6])
+        pets[idx] = pet
+    return Team(pets)
+
+
+@pytest.mark.usefixtures("restore_base_pet_triggers")
+def test_battle_matches_the_recursive_results():
+    set_pet_triggers()
+    for seed, expected in enumerate(RECURSIVE_RESULTS):
+        rng = random.Random(seed)
+        team1, team2 = random_triggered_team(rng), random_triggered_team(rng)
+        result = battle(team1, team2)
+        expected = HIT_ORDER_RESULTS.get(seed, expected)
+        if expected != "-":
+            assert result_chars[result] == expected, seed
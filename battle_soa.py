@@ -0,0 +1,537 @@
+from array import array
+from typing import Callable
+
+from all_types_and_consts import (
+    MAX_ATTACK,
+    MAX_HEALTH,
+    MAX_TEAM_SIZE,
+    BattleResult,
+    Effect,
+    Species,
+    Trigger,
+    in_battle_triggers,
+)
+from battle import battle
+from battle_closed_form import battle_closed_form, can_battle_in_closed_form
+from pet import Pet, TriggerTable
+from pet_data import species_to_pet_map
+from pet_triggers import (
+    on_before_attack_boar,
+    on_faint_cricket,
+    on_faint_flamingo,
+    on_faint_mammoth,
+    on_faint_sheep,
+    on_friend_ahead_attacks_kangaroo,
+    on_friend_faints_shark,
+    on_friend_summoned_dog,
+    on_friend_summoned_horse,
+    on_friend_summoned_turkey,
+    on_hurt_peacock,
+)
+from team import Team
+
+NativeTriggerFn = Callable[..., None]
+# species value -> {trigger value: native trigger}. for the species in one battle (see can_battle_natively())
+NativeTriggerTable = dict[int, dict[int, NativeTriggerFn]]
+
+# enum .value lookups show up in profiles of the battle loop, so the hot paths compare plain ints
+NO_EFFECT = Effect.NONE.value
+MEAT_BONE = Effect.MEAT_BONE.value
+STEAK = Effect.STEAK.value
+MELON = Effect.MELON.value
+GARLIC = Effect.GARLIC.value
+CHILLI = Effect.CHILLI.value
+PEANUT = Effect.PEANUT.value
+MUSHROOM = Effect.MUSHROOM.value
+BEE = Effect.BEE.value
+PET_SPAWN = Species.PET_SPAWN.value
+ON_BEFORE_ATTACK = Trigger.ON_BEFORE_ATTACK.value
+ON_FRIEND_AHEAD_ATTACKS = Trigger.ON_FRIEND_AHEAD_ATTACKS.value
+ON_HURT = Trigger.ON_HURT.value
+ON_FAINT = Trigger.ON_FAINT.value
+ON_FRIEND_FAINTS = Trigger.ON_FRIEND_FAINTS.value
+ON_FRIEND_SUMMONED = Trigger.ON_FRIEND_SUMMONED.value
+
+# This is a struct-of-arrays version of battle.battle(). Instead of cloning every Pet (and their trigger dicts), each side
+# of the battle is a handful of fixed-size arrays. Pets are identified by a per-battle uid (so identity checks like
+# "is this pet still alive?" don't need Pet objects).
+# Only species whose in-battle triggers have a native implementation below are simulated here. For every other team we
+# fall back to battle.battle(), so the returned BattleResult is always the same as the list-based engine.
+
+
+class BattleSide:
+    __slots__ = (
+        "size",
+        "uid",
+        "species",
+        "attack",
+        "health",
+        "effect",
+        "experience",
+        "idx_of_uid",
+    )
+
+    def __init__(self):
+        # like the list-based engine, the frontmost pet is at index size - 1
+        self.size = 0
+        self.uid = array("i", [0] * MAX_TEAM_SIZE)
+        self.species = array("h", [0] * MAX_TEAM_SIZE)
+        self.attack = array("h", [0] * MAX_TEAM_SIZE)
+        self.health = array("h", [0] * MAX_TEAM_SIZE)
+        self.effect = array("h", [0] * MAX_TEAM_SIZE)
+        self.experience = array("h", [0] * MAX_TEAM_SIZE)
+        # uid -> the pet's index. -1 if the pet isn't on this side (e.g. it fainted). kept up to date by insert() and pop()
+        self.idx_of_uid = array("b")
+
+    def index_of(self, uid: int) -> int:
+        if uid >= len(self.idx_of_uid):
+            return -1
+        return self.idx_of_uid[uid]
+
+    def level(self, idx: int) -> int:
+        experience = self.experience[idx]
+        if experience < 3:
+            return 1
+        elif experience < 6:
+            return 2
+        return 3
+
+    def insert(
+        self,
+        idx: int,
+        uid: int,
+        species: int,
+        attack: int,
+        health: int,
+        effect: int,
+        experience: int,
+    ):
+        size = self.size
+        for arr in (
+            self.uid,
+            self.species,
+            self.attack,
+            self.health,
+            self.effect,
+            self.experience,
+        ):
+            arr[idx + 1 : size + 1] = arr[idx:size]
+        self.uid[idx] = uid
+        self.species[idx] = species
+        self.attack[idx] = attack
+        self.health[idx] = health
+        self.effect[idx] = effect
+        self.experience[idx] = experience
+        self.size = size + 1
+
+        idx_of_uid = self.idx_of_uid
+        if uid >= len(idx_of_uid):
+            idx_of_uid.extend([-1] * (uid + 1 - len(idx_of_uid)))
+        # the pets behind the new one moved up by one
+        for moved_idx in range(idx, size + 1):
+            idx_of_uid[self.uid[moved_idx]] = moved_idx
+
+    def pop(self, idx: int):
+        size = self.size
+        self.idx_of_uid[self.uid[idx]] = -1
+        for arr in (
+            self.uid,
+            self.species,
+            self.attack,
+            self.health,
+            self.effect,
+            self.experience,
+        ):
+            arr[idx : size - 1] = arr[idx + 1 : size]
+        self.size = size - 1
+        for moved_idx in range(idx, size - 1):
+            self.idx_of_uid[self.uid[moved_idx]] = moved_idx
+
+    def add_stats(self, idx: int, *, attack: int = 0, health: int = 0):
+        self.attack[idx] = min(MAX_ATTACK, self.attack[idx] + attack)
+        self.health[idx] = min(MAX_HEALTH, self.health[idx] + health)
+
+
+class SoABattle:
+    __slots__ = ("sides", "next_uid", "fainted_stats", "native_triggers")
+
+    def __init__(self, native_triggers: NativeTriggerTable):
+        self.sides = (BattleSide(), BattleSide())
+        # from can_battle_natively(). so this battle isn't affected by checks for other teams
+        self.native_triggers = native_triggers
+        self.next_uid = 0
+        # a pet keeps attacking (and can knock out pets) on the turn it fainted. So remember the final attack/effect of fainted pets
+        self.fainted_stats: dict[int, tuple[int, int]] = {}
+
+    def load_team(self, side_idx: int, team: Team):
+        side = self.sides[side_idx]
+        for pet in team.pets:
+            if pet.species == Species.NONE:
+                continue
+            # same as Pet.apply_temp_buffs() (which clamps the stats even if there is no boost)
+            side.insert(
+                side.size,
+                self.new_uid(),
+                pet.species.value,
+                min(MAX_ATTACK, pet.attack + pet.attack_boost),
+                min(MAX_HEALTH, pet.health + pet.health_boost),
+                pet.effect.value,
+                pet.experience,
+            )
+
+    def new_uid(self) -> int:
+        self.next_uid += 1
+        return self.next_uid
+
+    def run(self) -> BattleResult:
+        side1, side2 = self.sides
+        # none of the natively supported species have ON_BATTLE_START triggers, so there is nothing to trigger before the fight
+        while side1.size > 0 and side2.size > 0:
+            attacker1 = side1.uid[side1.size - 1]
+            attacker2 = side2.uid[side2.size - 1]
+            friend_behind_attacker1 = (
+                side1.uid[side1.size - 2] if side1.size > 1 else -1
+            )
+            friend_behind_attacker2 = (
+                side2.uid[side2.size - 2] if side2.size > 1 else -1
+            )
+            self.attack_team(0, attacker1, friend_behind_attacker1)
+            if side1.size > 0:
+                self.attack_team(1, attacker2, friend_behind_attacker2)
+
+        if side1.size == 0 and side2.size == 0:
+            return BattleResult.TIE
+        elif side1.size > 0:
+            return BattleResult.WON_BATTLE
+        else:
+            return BattleResult.LOST_BATTLE
+
+    def attack_team(self, side_idx: int, attacker_uid: int, friend_behind_uid: int):
+        attacking_side = self.sides[side_idx]
+        receiving_side = self.sides[1 - side_idx]
+
+        attacker_idx = attacking_side.index_of(attacker_uid)
+        if attacker_idx >= 0:
+            damage = attacking_side.attack[attacker_idx]
+            attacker_effect = attacking_side.effect[attacker_idx]
+        else:
+            damage, attacker_effect = self.fainted_stats[attacker_uid]
+
+        if attacker_effect == MEAT_BONE:
+            damage += 3
+        elif attacker_effect == STEAK:
+            damage = max(damage + 20, MAX_ATTACK)
+            attacker_effect = NO_EFFECT  # steak is only used once
+            if attacker_idx >= 0:
+                attacking_side.effect[attacker_idx] = attacker_effect
+
+        if attacker_idx >= 0:
+            self.trigger(side_idx, attacker_idx, ON_BEFORE_ATTACK)
+
+        if friend_behind_uid >= 0:
+            friend_behind_idx = attacking_side.index_of(friend_behind_uid)
+            if friend_behind_idx >= 0:
+                self.trigger(side_idx, friend_behind_idx, ON_FRIEND_AHEAD_ATTACKS)
+
+        frontmost_uid = receiving_side.uid[receiving_side.size - 1]
+        second_uid = (
+            receiving_side.uid[receiving_side.size - 2]
+            if receiving_side.size > 1
+            else -1
+        )
+        self.receive_damage(1 - side_idx, frontmost_uid, damage, attacker_effect)
+
+        if (
+            attacker_effect == CHILLI
+            and second_uid >= 0
+            and receiving_side.index_of(second_uid) >= 0
+        ):
+            self.receive_damage(1 - side_idx, second_uid, 5, attacker_effect)
+        # no natively supported species has an ON_AFTER_ATTACK trigger
+
+    def receive_damage(
+        self, side_idx: int, receiving_uid: int, damage: int, attacker_effect: int
+    ):
+        side = self.sides[side_idx]
+        idx = side.index_of(receiving_uid)
+        if idx < 0:
+            # the pet is already dead
+            return
+
+        effect = side.effect[idx]
+        if effect == MELON:
+            damage = max(damage - 20, 0)
+            side.effect[idx] = NO_EFFECT  # melon is only used once
+        elif effect == GARLIC:
+            damage = max(damage - 2, 1)  # yes. Garlic does a minimum of 1 damage
+        side.health[idx] -= damage
+
+        if damage == 0:
+            return
+
+        self.trigger(side_idx, idx, ON_HURT)
+        # no natively supported species has an ON_FRIEND_HURT or ON_KNOCK_OUT trigger
+        idx = side.index_of(receiving_uid)
+        if side.health[idx] <= 0 or attacker_effect == PEANUT:
+            self.make_pet_faint(side_idx, idx)
+
+    def make_pet_faint(self, side_idx: int, idx: int):
+        side = self.sides[side_idx]
+        uid = side.uid[idx]
+        species = side.species[idx]
+        effect = side.effect[idx]
+        level = side.level(idx)
+        self.fainted_stats[uid] = (side.attack[idx], effect)
+        side.pop(idx)
+
+        on_faint = self.native_triggers[species].get(ON_FAINT)
+        if on_faint is not None:
+            on_faint(self, side_idx, idx, level)
+
+        # iterate by index since the team can change while friends are triggering (same as iterating over a list)
+        friend_idx = 0
+        while friend_idx < side.size:
+            self.trigger(side_idx, friend_idx, ON_FRIEND_FAINTS)
+            friend_idx += 1
+        # no natively supported species has an ON_FRIEND_AHEAD_FAINTS trigger
+
+        if effect == MUSHROOM:
+            base_pet = species_to_pet_map[Species(species)]
+            self.try_spawn_at_pos(
+                side_idx, idx, species, 1, 1, base_pet.effect.value, base_pet.experience
+            )
+        elif effect == BEE:
+            self.try_spawn_at_pos(side_idx, idx, PET_SPAWN, 1, 1, NO_EFFECT, 1)
+
+    def try_spawn_at_pos(
+        self,
+        side_idx: int,
+        idx: int,
+        species: int,
+        attack: int,
+        health: int,
+        effect: int,
+        experience: int,
+    ):
+        side = self.sides[side_idx]
+        if side.size >= MAX_TEAM_SIZE:
+            return
+        spawn_uid = self.new_uid()
+        # list.insert() clamps the index, so we do the same
+        side.insert(
+            min(idx, side.size), spawn_uid, species, attack, health, effect, experience
+        )
+
+        # battle() queues these reactions (see battle_events.py) instead of running them right away. None of the natively
+        # supported triggers deal damage (they only buff or spawn pets), so running them right away gives the same result
+        friend_idx = 0
+        while friend_idx < side.size:
+            if side.uid[friend_idx] != spawn_uid:
+                self.trigger(side_idx, friend_idx, ON_FRIEND_SUMMONED, spawn_uid)
+            friend_idx += 1
+
+    def trigger(self, side_idx: int, idx: int, trigger: int, *args):
+        side = self.sides[side_idx]
+        native_trigger_fn = self.native_triggers[side.species[idx]].get(trigger)
+        if native_trigger_fn is not None:
+            native_trigger_fn(self, side_idx, idx, side.level(idx), *args)
+
+
+def native_on_faint_cricket(
+    battle: SoABattle, side_idx: int, faint_idx: int, level: int
+):
+    battle.try_spawn_at_pos(side_idx, faint_idx, PET_SPAWN, level, level, NO_EFFECT, 1)
+
+
+def native_on_friend_summoned_horse(
+    battle: SoABattle, side_idx: int, idx: int, level: int, summoned_uid: int
+):
+    side = battle.sides[side_idx]
+    side.add_stats(side.index_of(summoned_uid), attack=level)
+
+
+def native_on_hurt_peacock(battle: SoABattle, side_idx: int, idx: int, level: int):
+    side = battle.sides[side_idx]
+    side.attack[idx] = min(side.attack[idx] + 3 * level, MAX_ATTACK)
+
+
+def native_on_faint_flamingo(
+    battle: SoABattle, side_idx: int, faint_idx: int, level: int
+):
+    side = battle.sides[side_idx]
+    # same as get_nearest_friends_behind_idx (there are no NONE pets in battle)
+    friend_idx = min(faint_idx - 1, side.size - 1)
+    num_buffed = 0
+    while num_buffed < 2 and friend_idx >= 0:
+        side.add_stats(friend_idx, attack=level, health=level)
+        num_buffed += 1
+        friend_idx -= 1
+
+
+def native_on_friend_ahead_attacks_kangaroo(
+    battle: SoABattle, side_idx: int, idx: int, level: int
+):
+    battle.sides[side_idx].add_stats(idx, attack=level, health=level)
+
+
+def native_on_friend_summoned_dog(
+    battle: SoABattle, side_idx: int, idx: int, level: int, summoned_uid: int
+):
+    battle.sides[side_idx].add_stats(idx, attack=2 * level, health=level)
+
+
+def native_on_faint_sheep(battle: SoABattle, side_idx: int, faint_idx: int, level: int):
+    for _ in range(2):
+        ram_stats = 2 * level
+        battle.try_spawn_at_pos(
+            side_idx,
+            faint_idx,
+            PET_SPAWN,
+            ram_stats,
+            ram_stats,
+            NO_EFFECT,
+            1,
+        )
+
+
+def native_on_friend_faints_shark(
+    battle: SoABattle, side_idx: int, idx: int, level: int
+):
+    battle.sides[side_idx].add_stats(idx, attack=2 * level, health=2 * level)
+
+
+def native_on_friend_summoned_turkey(
+    battle: SoABattle, side_idx: int, idx: int, level: int, summoned_uid: int
+):
+    battle.sides[side_idx].add_stats(idx, attack=3 * level, health=level)
+
+
+def native_on_before_attack_boar(
+    battle: SoABattle, side_idx: int, idx: int, level: int
+):
+    battle.sides[side_idx].add_stats(idx, attack=4 * level, health=2 * level)
+
+
+def native_on_faint_mammoth(
+    battle: SoABattle, side_idx: int, faint_idx: int, level: int
+):
+    side = battle.sides[side_idx]
+    for friend_idx in range(side.size):
+        side.add_stats(friend_idx, attack=2 * level, health=2 * level)
+
+
+# maps each supported species to {trigger: (trigger fn registered in pet_triggers, native implementation)}
+native_trigger_defs: dict[Species, dict[Trigger, tuple[Callable, NativeTriggerFn]]] = {
+    Species.CRICKET: {Trigger.ON_FAINT: (on_faint_cricket, native_on_faint_cricket)},
+    Species.HORSE: {
+        Trigger.ON_FRIEND_SUMMONED: (
+            on_friend_summoned_horse,
+            native_on_friend_summoned_horse,
+        )
+    },
+    Species.PEACOCK: {Trigger.ON_HURT: (on_hurt_peacock, native_on_hurt_peacock)},
+    Species.FLAMINGO: {Trigger.ON_FAINT: (on_faint_flamingo, native_on_faint_flamingo)},
+    Species.KANGAROO: {
+        Trigger.ON_FRIEND_AHEAD_ATTACKS: (
+            on_friend_ahead_attacks_kangaroo,
+            native_on_friend_ahead_attacks_kangaroo,
+        )
+    },
+    Species.DOG: {
+        Trigger.ON_FRIEND_SUMMONED: (
+            on_friend_summoned_dog,
+            native_on_friend_summoned_dog,
+        )
+    },
+    Species.SHEEP: {Trigger.ON_FAINT: (on_faint_sheep, native_on_faint_sheep)},
+    Species.SHARK: {
+        Trigger.ON_FRIEND_FAINTS: (
+            on_friend_faints_shark,
+            native_on_friend_faints_shark,
+        )
+    },
+    Species.TURKEY: {
+        Trigger.ON_FRIEND_SUMMONED: (
+            on_friend_summoned_turkey,
+            native_on_friend_summoned_turkey,
+        )
+    },
+    Species.BOAR: {
+        Trigger.ON_BEFORE_ATTACK: (on_before_attack_boar, native_on_before_attack_boar)
+    },
+    Species.MAMMOTH: {Trigger.ON_FAINT: (on_faint_mammoth, native_on_faint_mammoth)},
+}
+
+
+def get_in_battle_triggers(pet: Pet) -> TriggerTable:
+    return {
+        trigger: trigger_fns
+        for trigger, trigger_fns in pet._triggers.items()
+        if trigger in in_battle_triggers and len(trigger_fns) > 0
+    }
+
+
+def resolve_native_triggers(species: Species) -> dict[int, NativeTriggerFn] | None:
+    """
+    Returns the native triggers for the triggers currently registered on the species' base pet.
+    Returns None if one of them does not have a native implementation.
+    """
+    native_defs = native_trigger_defs.get(species, {})
+    native_triggers = {}
+    for trigger, trigger_fns in get_in_battle_triggers(
+        species_to_pet_map[species]
+    ).items():
+        if trigger not in native_defs or len(trigger_fns) != 1:
+            return None
+        registered_fn, native_fn = native_defs[trigger]
+        if trigger_fns[0] is not registered_fn:
+            return None
+        native_triggers[trigger.value] = native_fn
+    return native_triggers
+
+
+def can_battle_natively(teams: tuple[Team, Team]) -> NativeTriggerTable | None:
+    """
+    Returns the native triggers of the species in the teams. Returns None if the teams can't battle natively.
+    They are resolved for every battle, since the registered triggers can change (e.g. tests that run without
+    set_pet_triggers())
+    """
+    native_triggers: NativeTriggerTable = {}
+    for team in teams:
+        for pet in team.pets:
+            species = pet.species
+            if species == Species.NONE:
+                continue
+            # the tiger repeats the triggers of the pet ahead of it
+            if species == Species.TIGER:
+                return None
+            if species.value not in native_triggers:
+                species_native_triggers = resolve_native_triggers(species)
+                if species_native_triggers is None:
+                    return None
+                native_triggers[species.value] = species_native_triggers
+            # the pet's triggers must be the same as its species' (e.g. a parrot may have copied another pet's triggers)
+            base_pet = species_to_pet_map[species]
+            if pet._triggers is not base_pet._triggers and get_in_battle_triggers(
+                pet
+            ) != get_in_battle_triggers(base_pet):
+                return None
+    # pets that can be spawned mid-battle without a mushroom (cricket, sheep and bee spawns)
+    native_spawn_triggers = resolve_native_triggers(Species.PET_SPAWN)
+    if native_spawn_triggers is None:
+        return None
+    native_triggers[PET_SPAWN] = native_spawn_triggers
+    return native_triggers
+
+
+def battle_soa(my_team: Team, team2: Team) -> BattleResult:
+    if can_battle_in_closed_form((my_team, team2)):
+        return battle_closed_form(my_team, team2)
+    native_triggers = can_battle_natively((my_team, team2))
+    if native_triggers is None:
+        return battle(my_team, team2)
+
+    soa_battle = SoABattle(native_triggers)
+    soa_battle.load_team(0, my_team)
+    soa_battle.load_team(1, team2)
+    return soa_battle.run()
@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from all_types_and_consts import MAX_TEAM_SIZE, BattleResult, Effect, Species, Trigger
+from battle import _battle_loop, battle
+from battle_soa import (
+    BattleSide,
+    SoABattle,
+    battle_soa,
+    can_battle_natively,
+    native_trigger_defs,
+)
+from pet_data import get_base_pet, species_to_pet_map
+from pet_triggers import on_battle_start_mosquito, on_faint_cricket
+from team import Team
+
+
+@pytest.fixture
+def cricket_triggers():
+    species_to_pet_map[Species.CRICKET].set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    yield
+    species_to_pet_map[Species.CRICKET].clear_triggers()
+
+
+@pytest.fixture
+def native_triggers():
+    # register every trigger that battle_soa implements natively
+    for species, trigger_defs in native_trigger_defs.items():
+        for trigger, (trigger_fn, _) in trigger_defs.items():
+            species_to_pet_map[species].set_trigger(trigger, trigger_fn)
+    yield
+    for species in native_trigger_defs:
+        species_to_pet_map[species].clear_triggers()
+
+
+def team_of(*pets) -> Team:
+    return Team(
+        [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE - len(pets))]
+        + list(pets)
+    )
+
+
+# the species with native triggers, and a few without any in-battle triggers
+team_species = [Species.PIG, Species.SNAIL, Species.FISH, *native_trigger_defs]
+
+
+def random_team(rng: random.Random) -> Team:
+    pets = []
+    for _ in range(MAX_TEAM_SIZE):
+        if rng.random() < 0.2:
+            pets.append(get_base_pet(Species.NONE))
+            continue
+        pet = get_base_pet(rng.choice(team_species))
+        pet.set_stats(attack=rng.randint(1, 10), health=rng.randint(1, 10))
+        pet.set_effect(
+            rng.choice([Effect.NONE, Effect.MEAT_BONE, Effect.MELON, Effect.GARLIC])
+        )
+        pets.append(pet)
+    return Team(pets)
+
+
+def test_battle_soa_matches_the_battle_loop(native_triggers):
+    rng = random.Random(0)
+    for _ in range(500):
+        team1 = random_team(rng)
+        team2 = random_team(rng)
+        assert can_battle_natively((team1, team2))
+        assert battle_soa(team1, team2) == _battle_loop(team1, team2)
+
+
+def test_battle_soa_spawns_pets_on_faint(cricket_triggers):
+    # both pets faint on the first attack, but the cricket leaves a zombie cricket behind
+    team1 = team_of(get_base_pet(Species.CRICKET).set_stats(attack=1, health=1))
+    team2 = team_of(get_base_pet(Species.PIG).set_stats(attack=1, health=1))
+    assert can_battle_natively((team1, team2))
+    assert battle_soa(team1, team2) == BattleResult.WON_BATTLE
+    assert battle(team1, team2) == BattleResult.WON_BATTLE
+
+
+def test_battle_soa_falls_back_for_copied_triggers(cricket_triggers):
+    # e.g. a parrot that copied another pet's triggers
+    cricket = get_base_pet(Species.CRICKET).set_stats(attack=1, health=1)
+    cricket.set_trigger(Trigger.ON_BATTLE_START, on_battle_start_mosquito)
+    team1 = team_of(cricket)
+    team2 = team_of(get_base_pet(Species.PIG).set_stats(attack=1, health=2))
+    assert not can_battle_natively((team1, team2))
+
+
+def test_native_triggers_belong_to_the_battle(cricket_triggers):
+    team1 = team_of(get_base_pet(Species.CRICKET).set_stats(attack=1, health=1))
+    team2 = team_of(get_base_pet(Species.PIG).set_stats(attack=1, health=1))
+    native_triggers = can_battle_natively((team1, team2))
+    assert set(native_triggers) == {
+        Species.CRICKET.value,
+        Species.PIG.value,
+        Species.PET_SPAWN.value,
+    }
+    # checking other teams (without crickets) doesn't change the table the battle uses
+    fish_team = team_of(get_base_pet(Species.FISH).set_stats(attack=1, health=1))
+    assert can_battle_natively((fish_team, fish_team)) is not native_triggers
+    assert Trigger.ON_FAINT.value in native_triggers[Species.CRICKET.value]
+
+    soa_battle = SoABattle(native_triggers)
+    soa_battle.load_team(0, team1)
+    soa_battle.load_team(1, team2)
+    assert soa_battle.run() == BattleResult.WON_BATTLE
+
+
+def test_battle_side_index_of_tracks_inserts_and_pops():
+    rng = random.Random(0)
+    side = BattleSide()
+    next_uid = 0
+    for _ in range(1000):
+        if side.size < MAX_TEAM_SIZE and (side.size == 0 or rng.random() < 0.5):
+            next_uid += 1
+            side.insert(rng.randint(0, side.size), next_uid, 0, 1, 1, 0, 1)
+        else:
+            side.pop(rng.randrange(side.size))
+        uids = list(side.uid[: side.size])
+        for uid in range(next_uid + 2):
+            assert side.index_of(uid) == (uids.index(uid) if uid in uids else -1)
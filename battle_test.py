@@ -1,6 +1,17 @@
-from all_types_and_consts import BattleResult, Species
-from battle import battle
+from all_types_and_consts import MAX_TEAM_SIZE, BattleResult, Effect, Species, Trigger
+from battle import battle, try_spawn_at_pos
+from pet import Pet
 from pet_data import get_base_pet
+from pet_trigger_utils import get_nearest_friends_ahead, get_nearest_friends_behind_idx
+from pet_triggers import (
+    on_battle_start_crocodile,
+    on_battle_start_mosquito,
+    on_faint_badger,
+    on_faint_cricket,
+    on_faint_hedgehog,
+    on_faint_mammoth,
+    on_knock_out_rhino,
+)
 from team import Team
 
 
@@ -49,3 +60,117 @@ def test_pets_attack_in_proper_order():
         ]
     )
     assert battle(team1, team2) == BattleResult.TIE
+
+
+def test_battle_doesnt_modify_teams():
+    cricket = get_base_pet(Species.CRICKET).set_stats(attack=1, health=1)
+    cricket.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    cricket.set_effect(Effect.MELON).add_boost(attack=2, health=2)
+    team1 = Team([get_base_pet(Species.NONE)] * 4 + [cricket])
+    team2 = Team(
+        [get_base_pet(Species.NONE)] * 4
+        + [get_base_pet(Species.PIG).set_stats(attack=30, health=30)]
+    )
+    triggers = cricket._triggers
+    assert battle(team1, team2) == BattleResult.LOST_BATTLE
+    assert team1.pets[-1] is cricket
+    assert (cricket.attack, cricket.health, cricket.effect) == (1, 1, Effect.MELON)
+    assert (cricket.attack_boost, cricket.health_boost) == (2, 2)
+    assert cricket._triggers is triggers
+    assert team2.pets[-1].health == 30
+
+
+def test_random_targets_skip_fainting_pets():
+    # the fainting pet is still in the list (its faint event hasn't been handled yet), but it can't be targeted
+    for _ in range(20):
+        fainting_pet = get_base_pet(Species.PIG).set_stats(attack=1, health=0)
+        fainting_pet.is_alive = False
+        alive_pet = get_base_pet(Species.PIG).set_stats(attack=1, health=5)
+        enemy_pets = [alive_pet, fainting_pet]
+        mosquito = get_base_pet(Species.MOSQUITO)
+        on_battle_start_mosquito(mosquito, my_pets=[mosquito], enemy_pets=enemy_pets)
+        assert alive_pet.health == 4
+
+
+def test_hedgehog_hurts_every_alive_enemy():
+    # the enemies have the same stats, so they are equal (Pet.__eq__). Only the fainting one is skipped
+    fainting_pet = get_base_pet(Species.PIG).set_stats(attack=1, health=5)
+    fainting_pet.is_alive = False
+    enemy_pets = [
+        get_base_pet(Species.PIG).set_stats(attack=1, health=5) for _ in range(2)
+    ]
+    enemy_pets.insert(1, fainting_pet)
+    hedgehog = get_base_pet(Species.HEDGEHOG)
+    on_faint_hedgehog(
+        hedgehog, faint_pet_idx=0, my_pets=[], enemy_pets=enemy_pets, is_in_battle=True
+    )
+    assert [pet.health for pet in enemy_pets] == [3, 5, 3]
+
+
+def get_fainting_pig() -> Pet:
+    # still in its team, but its faint event hasn't been handled yet
+    pig = get_base_pet(Species.PIG).set_stats(attack=1, health=0)
+    pig.is_alive = False
+    return pig
+
+
+def test_triggers_skip_fainting_pets():
+    # the front enemy
+    alive_pig = get_base_pet(Species.PIG).set_stats(attack=1, health=10)
+    fainting_pig = get_fainting_pig()
+    rhino = get_base_pet(Species.RHINO)
+    on_knock_out_rhino(rhino, my_pets=[rhino], enemy_pets=[alive_pig, fainting_pig])
+    assert (alive_pig.health, fainting_pig.health) == (2, 0)
+
+    badger = get_base_pet(Species.BADGER).set_stats(attack=4, health=1)
+    on_faint_badger(
+        badger,
+        faint_pet_idx=0,
+        my_pets=[],
+        enemy_pets=[alive_pig, fainting_pig],
+        is_in_battle=True,
+    )
+    assert (alive_pig.health, fainting_pig.health) == (0, 0)
+
+    # the last enemy
+    alive_pig = get_base_pet(Species.PIG).set_stats(attack=1, health=10)
+    fainting_pig = get_fainting_pig()
+    crocodile = get_base_pet(Species.CROCODILE)
+    on_battle_start_crocodile(
+        crocodile, my_pets=[crocodile], enemy_pets=[fainting_pig, alive_pig]
+    )
+    assert (alive_pig.health, fainting_pig.health) == (2, 0)
+
+    # the nearest friends
+    pig = get_base_pet(Species.PIG)
+    fainting_pig = get_fainting_pig()
+    friend = get_base_pet(Species.PIG).set_stats(attack=5, health=5)
+    (friend_ahead,) = get_nearest_friends_ahead(pig, [pig, fainting_pig, friend], 1)
+    assert friend_ahead is friend
+    (friend_behind,) = get_nearest_friends_behind_idx(2, [friend, fainting_pig], 1)
+    assert friend_behind is friend
+
+    # buffs
+    mammoth = get_base_pet(Species.MAMMOTH)
+    on_faint_mammoth(
+        mammoth,
+        faint_pet_idx=0,
+        my_pets=[fainting_pig, friend],
+        enemy_pets=[],
+        is_in_battle=True,
+    )
+    assert (fainting_pig.attack, fainting_pig.health) == (1, 0)
+    assert (friend.attack, friend.health) == (7, 7)
+
+
+def test_fainting_pets_dont_take_up_room():
+    pets = [get_base_pet(Species.PIG) for _ in range(MAX_TEAM_SIZE - 1)]
+    pets.append(get_fainting_pig())
+    spawn = get_base_pet(Species.PET_SPAWN)
+    try_spawn_at_pos(spawn, 0, pets, is_in_battle=True)
+    assert pets[0] is spawn
+
+    # now the team is full
+    another_spawn = get_base_pet(Species.PET_SPAWN)
+    try_spawn_at_pos(another_spawn, 0, pets, is_in_battle=True)
+    assert all(pet is not another_spawn for pet in pets)
@@ -0,0 +1,107 @@
+from array import array
+from enum import IntEnum, auto
+
+from all_types_and_consts import BattleResult, Species, Trigger
+
+
+class BattleTraceKind(IntEnum):
+    # value: the number of pets in team 1, extra: the number of pets in team 2
+    BATTLE_START = 0
+    # species: the attacker, value: the damage, extra: the species that's attacked
+    ATTACK = auto()
+    # value: the damage, extra: the pet's health after the damage
+    HURT = auto()
+    # value: the pet's index in its team
+    FAINT = auto()
+    # value: the index the pet spawned at
+    SPAWN = auto()
+    # value: the trigger, extra: the number of times it ran (2 if there's a tiger behind the pet)
+    TRIGGER = auto()
+    # value: the BattleResult
+    BATTLE_END = auto()
+
+
+# every record is 4 ints: (kind, species, value, extra)
+NUM_RECORD_FIELDS = 4
+
+TraceRecord = tuple[BattleTraceKind, Species, int, int]
+
+
+class BattleTrace:
+    """
+    Records what happens in battle.battle() into a preallocated ring buffer. Once it's full, the oldest records are
+    overwritten. So it always has the last `capacity` records (e.g. the cascade that led up to a bug)
+
+    Only one trace is active at a time (see start_battle_trace()). When no trace is active, every place that records just
+    checks `active_trace is None`
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self.records = array("i", bytes(4 * NUM_RECORD_FIELDS * capacity))
+        # the total number of records (including the ones that were overwritten)
+        self.num_records = 0
+
+    def record(self, kind: BattleTraceKind, species: Species, value: int, extra: int):
+        idx = self.num_records % self.capacity * NUM_RECORD_FIELDS
+        records = self.records
+        records[idx] = kind
+        records[idx + 1] = species._value_
+        records[idx + 2] = value
+        records[idx + 3] = extra
+        self.num_records += 1
+
+    def __len__(self):
+        return min(self.num_records, self.capacity)
+
+    def clear(self):
+        self.num_records = 0
+
+    def get_records(self) -> list[TraceRecord]:
+        """
+        Returns the records (oldest first)
+        """
+        first_record = self.num_records - len(self)
+        res = []
+        for record_num in range(first_record, self.num_records):
+            idx = record_num % self.capacity * NUM_RECORD_FIELDS
+            kind, species, value, extra = self.records[idx : idx + NUM_RECORD_FIELDS]
+            res.append((BattleTraceKind(kind), Species(species), value, extra))
+        return res
+
+    def format_records(self) -> str:
+        lines = []
+        for kind, species, value, extra in self.get_records():
+            if kind == BattleTraceKind.BATTLE_START:
+                lines.append(f"battle start: {value} vs {extra} pets")
+            elif kind == BattleTraceKind.ATTACK:
+                lines.append(
+                    f"{species.name} attacks {Species(extra).name} for {value}"
+                )
+            elif kind == BattleTraceKind.HURT:
+                lines.append(f"{species.name} takes {value} damage ({extra} health)")
+            elif kind == BattleTraceKind.FAINT:
+                lines.append(f"{species.name} faints at {value}")
+            elif kind == BattleTraceKind.SPAWN:
+                lines.append(f"{species.name} spawns at {value}")
+            elif kind == BattleTraceKind.TRIGGER:
+                lines.append(f"{species.name} {Trigger(value).name} x{extra}")
+            else:
+                lines.append(f"battle end: {BattleResult(value).name}")
+        return "\n".join(lines)
+
+
+active_trace: BattleTrace | None = None
+
+
+def start_battle_trace(capacity: int = 100_000) -> BattleTrace:
+    global active_trace
+    active_trace = BattleTrace(capacity)
+    return active_trace
+
+
+def stop_battle_trace() -> BattleTrace | None:
+    global active_trace
+    trace = active_trace
+    active_trace = None
+    return trace
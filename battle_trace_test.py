@@ -0,0 +1,48 @@
+from all_types_and_consts import BattleResult, Species, Trigger
+from battle import battle
+from battle_trace import (
+    BattleTrace,
+    BattleTraceKind,
+    start_battle_trace,
+    stop_battle_trace,
+)
+from pet_data import get_base_pet
+from pet_triggers import on_faint_cricket
+from team import Team
+
+
+def test_battle_trace_records_cascades():
+    cricket = get_base_pet(Species.CRICKET).set_stats(attack=1, health=1)
+    cricket.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    team1 = Team([get_base_pet(Species.NONE)] * 4 + [cricket])
+    team2 = Team(
+        [get_base_pet(Species.NONE)] * 4
+        + [get_base_pet(Species.PIG).set_stats(attack=1, health=1)]
+    )
+    trace = start_battle_trace()
+    try:
+        assert battle(team1, team2) == BattleResult.WON_BATTLE
+    finally:
+        assert stop_battle_trace() is trace
+
+    kinds = [kind for kind, _, _, _ in trace.get_records()]
+    assert kinds[0] == BattleTraceKind.BATTLE_START
+    assert kinds[-1] == BattleTraceKind.BATTLE_END
+    assert (BattleTraceKind.TRIGGER, Species.CRICKET, Trigger.ON_FAINT.value, 1) in (
+        trace.get_records()
+    )
+    assert (BattleTraceKind.SPAWN, Species.PET_SPAWN, 0, 0) in trace.get_records()
+    assert "CRICKET ON_FAINT x1" in trace.format_records()
+
+    # battles aren't recorded once the trace is stopped
+    num_records = trace.num_records
+    battle(team1, team2)
+    assert trace.num_records == num_records
+
+
+def test_battle_trace_keeps_the_latest_records():
+    trace = BattleTrace(capacity=2)
+    for value in range(5):
+        trace.record(BattleTraceKind.FAINT, Species.PIG, value, 0)
+    assert len(trace) == 2
+    assert [value for _, _, value, _ in trace.get_records()] == [3, 4]
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+import duel_table
+from pet_data import species_to_pet_map
+
+
+@pytest.fixture
+def restore_base_pet_triggers():
+    # for tests that register (or change) the base pets' triggers, e.g. with set_pet_triggers() or by making a
+    # SuperAutoPetsEnv. The old triggers are put back after the test, so other tests aren't affected
+    # (trigger tables are never mutated, so keeping a reference is enough)
+    triggers = {species: pet._triggers for species, pet in species_to_pet_map.items()}
+    yield
+    for species, pet in species_to_pet_map.items():
+        pet._triggers = triggers[species]
+
+
+@pytest.fixture
+def tmp_duel_table_dir(monkeypatch, tmp_path):
+    # save the duel table to a temp dir instead of the real cache dir, and build it again for the test
+    monkeypatch.setattr(duel_table, "duel_table", None)
+    monkeypatch.setattr(duel_table, "DUEL_TABLE_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        duel_table, "DUEL_TABLE_PATH", os.path.join(tmp_path, "duel_table.npy")
+    )
+    return tmp_path
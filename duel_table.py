@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+
+from all_types_and_consts import MAX_ATTACK, MAX_HEALTH
+
+# A lookup table of duels between two front pets that don't have triggers (or effects that do more than change the damage).
+# duel_table[damage1, health1, damage2, health2] is the (health1, health2) that's left after the pets hit each other until
+# at least one of them faints. A pet faints if the health left is 0. Except: if both damages are 0 nobody faints, and the
+# health is unchanged. Only look up pets with at least 1 health (a pet with 0 health would still need to be hit to faint)
+#
+# it's indexed by the damage of each hit (not attack) so the meat bone and garlic can be applied before the lookup
+
+# the most damage a hit can do without the steak (which is only used once). i.e. MAX_ATTACK + the meat bone
+MAX_DUEL_DAMAGE = MAX_ATTACK + 3
+DUEL_TABLE_SHAPE = (
+    MAX_DUEL_DAMAGE + 1,
+    MAX_HEALTH + 1,
+    MAX_DUEL_DAMAGE + 1,
+    MAX_HEALTH + 1,
+    2,
+)
+# it's a generated file (~15MB), so it goes in the user's cache dir rather than next to the source
+DUEL_TABLE_DIR = os.environ.get(
+    "SAPENV_CACHE_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "sapenv"
+    ),
+)
+DUEL_TABLE_PATH = os.path.join(DUEL_TABLE_DIR, "duel_table.npy")
+
+duel_table: np.ndarray | None = None
+
+
+def build_duel_table() -> np.ndarray:
+    damage1, health1, damage2, health2 = np.meshgrid(
+        np.arange(MAX_DUEL_DAMAGE + 1),
+        np.arange(MAX_HEALTH + 1),
+        np.arange(MAX_DUEL_DAMAGE + 1),
+        np.arange(MAX_HEALTH + 1),
+        indexing="ij",
+        sparse=True,
+    )
+    # the number of hits each pet needs to make the other pet faint. a pet with 0 damage never makes the other pet faint
+    no_faint = MAX_HEALTH + 1
+    num_hits1 = np.where(damage1 > 0, -(-health2 // np.maximum(damage1, 1)), no_faint)
+    num_hits2 = np.where(damage2 > 0, -(-health1 // np.maximum(damage2, 1)), no_faint)
+    num_hits = np.minimum(num_hits1, num_hits2)
+    num_hits = np.where(num_hits == no_faint, 0, num_hits)
+
+    table = np.empty(DUEL_TABLE_SHAPE, dtype=np.int8)
+    table[..., 0] = np.maximum(health1 - num_hits * damage2, 0)
+    table[..., 1] = np.maximum(health2 - num_hits * damage1, 0)
+    return table
+
+
+def get_duel_table() -> np.ndarray:
+    """
+    Returns the duel table. It's built and saved to DUEL_TABLE_PATH the first time it's needed. After that, it's memory
+    mapped from the file (so processes share it, and it's only read from disk when it's used).
+    If the file can't be written (e.g. a read-only home dir), the table is just kept in memory
+    """
+    global duel_table
+    if duel_table is not None:
+        return duel_table
+
+    try:
+        table = np.load(DUEL_TABLE_PATH, mmap_mode="r")
+        if table.shape == DUEL_TABLE_SHAPE and table.dtype == np.int8:
+            duel_table = table
+            return duel_table
+    except (OSError, ValueError):
+        pass  # it doesn't exist yet (or it's corrupted). so build it
+
+    table = build_duel_table()
+    # save to a temp file first. So another process never loads a half written table
+    tmp_path = f"{DUEL_TABLE_PATH}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(DUEL_TABLE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp_path, DUEL_TABLE_PATH)
+        duel_table = np.load(DUEL_TABLE_PATH, mmap_mode="r")
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        duel_table = table
+    return duel_table
@@ -0,0 +1,49 @@
+import os
+import random
+
+import numpy as np
+
+import duel_table
+from duel_table import build_duel_table, get_duel_table
+
+
+def fight(damage1: int, health1: int, damage2: int, health2: int) -> tuple[int, int]:
+    while health1 > 0 and health2 > 0:
+        if damage1 == 0 and damage2 == 0:
+            break
+        health1 -= damage2
+        health2 -= damage1
+    return max(health1, 0), max(health2, 0)
+
+
+def test_duel_table_matches_fighting_hit_by_hit():
+    table = build_duel_table()
+    rng = random.Random(0)
+    for _ in range(2000):
+        damage1, damage2 = rng.randint(0, 53), rng.randint(0, 53)
+        health1, health2 = rng.randint(1, 50), rng.randint(1, 50)
+        assert tuple(table[damage1, health1, damage2, health2]) == fight(
+            damage1, health1, damage2, health2
+        )
+
+
+def test_get_duel_table_is_cached(tmp_duel_table_dir):
+    table = get_duel_table()
+    assert isinstance(table, np.memmap)
+    assert get_duel_table() is table
+    assert (tmp_duel_table_dir / "duel_table.npy").exists()
+
+
+def test_get_duel_table_falls_back_to_memory_if_it_cant_be_saved(
+    monkeypatch, tmp_duel_table_dir
+):
+    # a file where the cache dir should be, so the dir can't be created
+    blocked_dir = tmp_duel_table_dir / "blocked"
+    blocked_dir.write_text("")
+    monkeypatch.setattr(duel_table, "DUEL_TABLE_DIR", str(blocked_dir))
+    monkeypatch.setattr(
+        duel_table, "DUEL_TABLE_PATH", os.path.join(blocked_dir, "duel_table.npy")
+    )
+    table = get_duel_table()
+    assert isinstance(table, np.ndarray) and not isinstance(table, np.memmap)
+    assert np.array_equal(table, build_duel_table())
@@ -13,6 +13,22 @@ from all_types_and_consts import (
     foods_for_pet,
     MAX_SHOP_FOOD_SLOTS,
 )
+from action_masks import (
+    ActionMaskState,
+    buy_food_for_pet_mask,
+    buy_food_mask,
+    buy_linked_pet_mask,
+    buy_pet_mask,
+    combine_pets_mask,
+    end_turn_mask,
+    freeze_pet_at_linked_slot_mask,
+    reorder_team_mask,
+    roll_shop_mask,
+    sell_pet_mask,
+    stack_action_mask_values,
+    toggle_freeze_food_slot_mask,
+    toggle_freeze_slot_mask,
+)
 from player import Player
 
 # moves the pet from start_idx to end_idx
@@ -57,72 +73,114 @@ class ActionName(Enum):
 class Action:
     space: spaces.Space
     get_mask: Callable[[Player], np.ndarray]
+    # the masks of many players at once. (N, *space.shape)
+    get_batched_mask: Callable[[ActionMaskState], np.ndarray]
     perform_action: Callable[[Player, tuple[int, ...]], ActionResult]
 
 
 actions_dict: dict[ActionName, Action] = {
     ActionName.REORDER_TEAM: Action(
         space=reorder_team_space,
-        get_mask=lambda player: player.reorder_team_action_mask(),
+        get_mask=lambda player: player.get_action_mask(Player.reorder_team_action_mask),
+        get_batched_mask=lambda state: reorder_team_mask(state.team_species),
         perform_action=lambda player, params: player.reorder_team_action(*params),
     ),
     ActionName.COMBINE_PETS: Action(
         space=combine_pets_space,
-        get_mask=lambda player: player.combine_pets_action_mask(),
+        get_mask=lambda player: player.get_action_mask(Player.combine_pets_action_mask),
+        get_batched_mask=lambda state: combine_pets_mask(
+            state.team_species, state.team_levels
+        ),
         perform_action=lambda player, params: player.combine_pets_action(*params),
     ),
     ActionName.BUY_PET: Action(
         space=buy_pet_space,
-        get_mask=lambda player: player.buy_pet_action_mask(),
+        get_mask=lambda player: player.get_action_mask(Player.buy_pet_action_mask),
+        get_batched_mask=lambda state: buy_pet_mask(
+            state.team_species, state.shop_species, state.gold
+        ),
         perform_action=lambda player, params: player.buy_pet_action(*params),
     ),
     ActionName.BUY_LINKED_PET: Action(
         space=buy_linked_pet_space,
-        get_mask=lambda player: player.buy_linked_pet_action_mask(),
+        get_mask=lambda player: player.get_action_mask(
+            Player.buy_linked_pet_action_mask
+        ),
+        get_batched_mask=lambda state: buy_linked_pet_mask(
+            state.team_species, state.linked_shop_species, state.gold
+        ),
         perform_action=lambda player, params: player.buy_linked_pet_action(*params),
     ),
     ActionName.BUY_FOOD: Action(
         space=buy_food_space,
-        get_mask=lambda player: player.buy_food_action_mask(),
+        get_mask=lambda player: player.get_action_mask(Player.buy_food_action_mask),
+        get_batched_mask=lambda state: buy_food_mask(
+            state.food_types, state.food_costs, state.num_food_slots, state.gold
+        ),
         perform_action=lambda player, params: player.buy_food_action(*params),
     ),
     ActionName.BUY_FOOD_FOR_PET: Action(
         space=buy_food_for_pet_space,
-        get_mask=lambda player: player.buy_food_for_pet_action_mask(),
+        get_mask=lambda player: player.get_action_mask(
+            Player.buy_food_for_pet_action_mask
+        ),
+        get_batched_mask=lambda state: buy_food_for_pet_mask(
+            state.team_species,
+            state.food_types,
+            state.food_costs,
+            state.num_food_slots,
+            state.gold,
+        ),
         perform_action=lambda player, params: player.buy_food_for_pet_action(*params),
     ),
     ActionName.SELL_PET: Action(
         space=sell_pet_space,
-        get_mask=lambda player: player.sell_pet_action_mask(),
+        get_mask=lambda player: player.get_action_mask(Player.sell_pet_action_mask),
+        get_batched_mask=lambda state: sell_pet_mask(state.team_species),
         perform_action=lambda player, params: player.sell_pet_action(*params),
     ),
     ActionName.ROLL_SHOP: Action(
         space=roll_shop_space,
-        get_mask=lambda player: player.roll_shop_action_mask(),
+        get_mask=lambda player: player.get_action_mask(Player.roll_shop_action_mask),
+        get_batched_mask=lambda state: roll_shop_mask(state.gold),
         perform_action=lambda player, params: player.roll_shop_action(*params),
     ),
     ActionName.TOGGLE_FREEZE_SLOT: Action(
         space=toggle_freeze_slot_space,
-        get_mask=lambda player: player.toggle_freeze_slot_action_mask(),
+        get_mask=lambda player: player.get_action_mask(
+            Player.toggle_freeze_slot_action_mask
+        ),
+        get_batched_mask=lambda state: toggle_freeze_slot_mask(state.num_shop_slots),
         perform_action=lambda player, params: player.toggle_freeze_slot_action(*params),
     ),
     ActionName.FREEZE_PET_AT_LINKED_SLOT: Action(
         space=freeze_pet_at_linked_slot_space,
-        get_mask=lambda player: player.freeze_pet_at_linked_slot_action_mask(),
+        get_mask=lambda player: player.get_action_mask(
+            Player.freeze_pet_at_linked_slot_action_mask
+        ),
+        get_batched_mask=lambda state: freeze_pet_at_linked_slot_mask(
+            state.num_linked_shop_slots
+        ),
         perform_action=lambda player, params: player.freeze_pet_at_linked_slot_action(
             *params
         ),
     ),
     ActionName.TOGGLE_FREEZE_FOOD_SLOT: Action(
         space=toggle_freeze_food_slot_space,
-        get_mask=lambda player: player.toggle_freeze_food_slot_action_mask(),
+        get_mask=lambda player: player.get_action_mask(
+            Player.toggle_freeze_food_slot_action_mask
+        ),
+        get_batched_mask=lambda state: toggle_freeze_food_slot_mask(
+            state.num_food_slots
+        ),
         perform_action=lambda player, params: player.toggle_freeze_food_slot_action(
             *params
         ),
     ),
     ActionName.END_TURN: Action(
         space=end_turn_space,
-        get_mask=lambda player: player.end_turn_action_mask(),
+        get_mask=lambda player: player.get_action_mask(Player.end_turn_action_mask),
+        get_batched_mask=lambda state: end_turn_mask(state.gold),
         perform_action=lambda player, params: player.end_turn_action(*params),
     ),
 }
@@ -138,3 +196,15 @@ def get_action_masks(player: Player) -> dict[ActionName, np.ndarray]:
         action_name.value: action.get_mask(player)
         for action_name, action in actions_dict.items()
     }
+
+
+def get_batched_action_masks(players: list[Player]) -> dict[str, np.ndarray]:
+    # same as get_action_masks() for each player, but the masks are stacked (N, ...) and computed in one go. Only the
+    # players whose state changed are read again (see Player.get_action_mask_values())
+    state = stack_action_mask_values(
+        [player.get_action_mask_values() for player in players]
+    )
+    return {
+        action_name.value: action.get_batched_mask(state)
+        for action_name, action in actions_dict.items()
+    }
@@ -24,11 +24,8 @@ from opponent_db import OpponentDB
 # from opponent_db2 import OpponentDBInMemory
 from opponent_db2 import OpponentDBInMemory
 from opponent_db_eval import OpponentDBEval
-from pet_triggers import (
-    set_pet_triggers,
-    validate_can_trigger_in_shop_or_battle_triggers_have_is_in_battle_kwarg,
-    validate_trigger_protocols,
-)
+from pet_triggers import set_pet_triggers
+from battle_cache import BattleCache
 from player import Player
 
 
@@ -39,22 +36,27 @@ class SuperAutoPetsEnv(gym.Env):
         self,
         opponent_db: OpponentDB | OpponentDBInMemory | OpponentDBEval,
         metrics_tracker: MetricsTracker | MetricsTrackerEval,
+        battle_cache: BattleCache | None = None,
     ):
         self.observation_space = env_observation_space
         self.action_space = env_action_space
         if IS_TRIGGERS_ENABLED:
+            # this is a no-op after the first env registers the triggers. So making many envs is cheap
             set_pet_triggers()
-            validate_trigger_protocols()
-            validate_can_trigger_in_shop_or_battle_triggers_have_is_in_battle_kwarg()
         self.opponent_db = opponent_db
-        self.player = Player.init_starting_player(self.opponent_db)
+        # optional since it only helps when the same teams battle each other often (e.g. in the early rounds)
+        self.battle_cache = battle_cache
+        self.player = Player.init_starting_player(self.opponent_db, self.battle_cache)
         self.metrics_tracker = metrics_tracker
         self.step_num = 0
+        # the vec envs encode the observations straight from the player (see PlayerEncoder). So they turn this off, and
+        # step() and reset() return None instead of the observation
+        self.is_observation_built = True
 
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
-        self.player = Player.init_starting_player(self.opponent_db)
-        obs = get_observation(self.player)
+        self.player = Player.init_starting_player(self.opponent_db, self.battle_cache)
+        obs = get_observation(self.player) if self.is_observation_built else None
         return obs, {}
 
     def action_masks(self):
@@ -91,7 +93,9 @@ class SuperAutoPetsEnv(gym.Env):
                 self.player.hearts,
             )
         action_result = action.perform_action(self.player, selected_action.params)
-        observation = get_observation(self.player)
+        observation = (
+            get_observation(self.player) if self.is_observation_built else None
+        )
 
         if action_name == ActionName.END_TURN:
             game_result = action_result[ActionReturn.GAME_RESULT]
@@ -164,3 +168,6 @@ class SuperAutoPetsEnv(gym.Env):
         print(self.player)
         print(f"shop: {self.player.shop}")
         print("----------------------------------")
+
+    def close(self):
+        self.metrics_tracker.close()
@@ -27,9 +27,26 @@ class FlattenAction(gym.ActionWrapper):
         self.action_def_map: dict[str, FlattenActionDefinition] = {}
         num_actions = self.return_flattened_action_ranges(
             self.env.action_space, action_def_map=self.action_def_map
-        )  # TODO: binary search for which bucket you're in
+        )
         print(self.action_def_map)
         self.action_space: gym.spaces.Discrete = gym.spaces.Discrete(num_actions)
+        self.build_action_lookup_table()
+
+    def build_action_lookup_table(self):
+        # every flat action index -> the id of its action (an index into action_path_keys) and its params. So decoding an
+        # action is a lookup (instead of finding its bucket and unraveling it every step)
+        num_actions = self.action_space.n
+        self.action_path_keys: list[str] = list(self.action_def_map)
+        self.action_ids = np.empty((num_actions,), dtype=np.int64)
+        self.action_params: list[tuple[int, ...]] = [()] * num_actions
+        for action_id, action_def in enumerate(self.action_def_map.values()):
+            start_idx = action_def.start_idx
+            end_idx = start_idx + action_def.size
+            self.action_ids[start_idx:end_idx] = action_id
+            if action_def.size == 1:
+                continue
+            for idx, params in enumerate(np.ndindex(*action_def.shape)):
+                self.action_params[start_idx + idx] = params
 
     def readable_action_mask(self):
         action_mask_dict = self.env.env.action_masks()
@@ -99,18 +116,26 @@ class FlattenAction(gym.ActionWrapper):
         return start_idx
 
     def action(self, action: np.int64) -> SelectedAction:
-        action_idx = action.item()
-        for path_key, action_def in self.action_def_map.items():
-            start_idx = action_def.start_idx
-            end_idx = start_idx + action_def.size
-            if start_idx <= action_idx < end_idx:
-                if action_def.size == 1:
-                    return SelectedAction(path_key=path_key, params=[])
-                else:
-                    corresponding_indices = np.unravel_index(
-                        action_idx - start_idx, action_def.shape
-                    )
-                    return SelectedAction(
-                        path_key=path_key, params=corresponding_indices
-                    )
-        raise ValueError(f"Invalid action index {action_idx}")
+        action_idx = int(action)
+        if not 0 <= action_idx < self.action_space.n:
+            raise ValueError(f"Invalid action index {action_idx}")
+        return SelectedAction(
+            path_key=self.action_path_keys[self.action_ids[action_idx]],
+            params=self.action_params[action_idx],
+        )
+
+    def actions(self, actions: np.ndarray) -> list[SelectedAction]:
+        # decodes a batch of actions (e.g. one per env of a vec env)
+        action_idxs = np.asarray(actions, dtype=np.int64).ravel()
+        if action_idxs.size > 0 and not (
+            0 <= action_idxs.min() and action_idxs.max() < self.action_space.n
+        ):
+            raise ValueError(f"Invalid action indices {action_idxs}")
+        path_keys = self.action_path_keys
+        action_params = self.action_params
+        return [
+            SelectedAction(path_key=path_keys[action_id], params=action_params[idx])
+            for idx, action_id in zip(
+                action_idxs.tolist(), self.action_ids[action_idxs].tolist()
+            )
+        ]
@@ -32,6 +32,7 @@ class FlattenObservation(gym.ObservationWrapper):
         self.observation_space = gym.spaces.Box(
             low=0.0, high=1.0, shape=(self.observation_space_size,), dtype=np.float32
         )
+        self.compile_flatten_plan()
 
     # we need 2 functions: one to flatten the env into a box env to define the gym environment
     # and one to flatten dictionaries of the box env
@@ -77,39 +78,54 @@ class FlattenObservation(gym.ObservationWrapper):
                 start_idx += observation_size
         return observation_defs, start_idx
 
-    def observation(self, obs: Dict[str, Dict | np.ndarray]):
-        obs_arr = np.ndarray(self.observation_space.shape, dtype=np.float32)
-        obs_size = self._recursively_flatten_obs(obs, obs_arr)
-        assert obs_size == self.observation_space_size, (
-            "The defined observation size does not match the observation size the environment produces"
+    def compile_flatten_plan(self):
+        # the plan is the path of keys to each observation (in the observation dict) and where it goes in the flattened
+        # observation. So we don't need to build and look up the path strings on every step
+        self.flatten_plan: list[tuple[tuple[str, ...], int, int]] = []
+        self.normalization_shifts = np.zeros(
+            (self.observation_space_size,), dtype=np.float64
         )
-        return obs_arr
+        self.normalization_amounts = np.ones(
+            (self.observation_space_size,), dtype=np.float64
+        )
+        for path_key, observation_def in self.observation_normalization.items():
+            start_idx = observation_def.start_idx
+            end_idx = start_idx + observation_def.size
+            keys = tuple(path_key.split("|")[1:])
+            self.flatten_plan.append((keys, start_idx, end_idx))
+            self.normalization_shifts[start_idx:end_idx] = (
+                observation_def.normalization_shift
+            )
+            self.normalization_amounts[start_idx:end_idx] = (
+                observation_def.normalization_amount
+            )
+        # the observations before they're normalized
+        self.raw_obs = np.zeros((self.observation_space_size,), dtype=np.float64)
 
-    def _recursively_flatten_obs(
-        self,
-        obs: Dict[str, Dict | np.ndarray],
-        obs_arr: np.ndarray,
-        root_path: str = "",
-    ):
-        obs_size = 0
-        for key, value in obs.items():
-            path_key = root_path + "|" + key
-            if type(value) is dict:
-                obs_size += self._recursively_flatten_obs(
-                    value, obs_arr, root_path=path_key
-                )
-            else:
-                observation_def = self.observation_normalization[path_key]
-                start_idx = observation_def.start_idx
-                end_idx = observation_def.start_idx + observation_def.size
-                flattened_value = value.flatten()
-                assert end_idx - start_idx == flattened_value.size, (
-                    f"{path_key} observation has size issue. Trying to flatten observation of shape {value.shape} into the defined action size {end_idx - start_idx}"
-                )
+    def normalize(self, raw_obs: np.ndarray, out: np.ndarray) -> np.ndarray:
+        # float64 so (raw + shift) / amount is the same as it was when each observation was normalized by itself
+        # (the int arrays were divided in float64, then stored as float32)
+        np.add(raw_obs, self.normalization_shifts, out=raw_obs)
+        np.divide(raw_obs, self.normalization_amounts, out=out, casting="same_kind")
+        assert not np.isnan(out).any()
+        return out
 
-                obs_arr[start_idx:end_idx] = (
-                    flattened_value + observation_def.normalization_shift
-                ) / observation_def.normalization_amount
-                assert np.all(obs_arr[start_idx:end_idx] != np.nan)
-                obs_size += end_idx - start_idx
-        return obs_size
+    def observation(
+        self, obs: Dict[str, Dict | np.ndarray], out: np.ndarray | None = None
+    ):
+        """
+        Flattens and normalizes obs. Pass out (a float32 array of size observation_space_size) to write into it (e.g. a
+        row of a vec env's observations) instead of a new array
+        """
+        if out is None:
+            out = np.empty(self.observation_space.shape, dtype=np.float32)
+        raw_obs = self.raw_obs
+        for keys, start_idx, end_idx in self.flatten_plan:
+            value = obs
+            for key in keys:
+                value = value[key]
+            assert (
+                end_idx - start_idx == value.size
+            ), f"{'|'.join(keys)} observation has size issue. Trying to flatten observation of shape {value.shape} into the defined observation size {end_idx - start_idx}"
+            raw_obs[start_idx:end_idx] = value.ravel()
+        return self.normalize(raw_obs, out)
@@ -5,12 +5,34 @@ from environment.action_space import ActionName
 from wandb.sdk.wandb_run import Run
 
 from player import Player
+from trigger_profiler import start_trigger_profiler, stop_trigger_profiler
+
+
+class BufferedRun:
+    """
+    Stands in for the wandb run in the worker processes of SuperAutoPetsSubprocVecEnv (a wandb run can't be used from
+    forked processes). It keeps what was logged, so the worker can send it to the main process, which logs it to the run
+    """
+
+    def __init__(self):
+        self.logs: list[dict[str, Any]] = []
+
+    def log(self, data: dict[str, Any]):
+        # copy it, since the trackers clear their stats after logging them
+        self.logs.append(dict(data))
+
+    def pop_logs(self) -> list[dict[str, Any]]:
+        logs = self.logs
+        self.logs = []
+        return logs
 
 
 class MetricsTracker:
-    def __init__(self, wandb_run: Run):
+    def __init__(self, wandb_run: Run | BufferedRun, profile_triggers: bool = False):
         self.stats = defaultdict(int)
-        self.wandb_run: Run = wandb_run
+        self.wandb_run: Run | BufferedRun = wandb_run
+        # if True, we also log how long each pet's triggers took (this slows down Pet.trigger a bit)
+        self.trigger_profiler = start_trigger_profiler() if profile_triggers else None
 
     def add_step_metrics(
         self,
@@ -54,6 +76,9 @@ class MetricsTracker:
                 self.stats["buy_linked_pet"] += 1
 
     def log_episode_metrics(self, is_truncated: bool, player: Player = None):
+        if self.trigger_profiler is not None:
+            self.stats |= self.trigger_profiler.get_metrics()
+            self.trigger_profiler.reset()
         if is_truncated:
             self.wandb_run.log(
                 self.stats
@@ -71,3 +96,9 @@ class MetricsTracker:
                 }
             )
         self.stats.clear()
+
+    def close(self):
+        # otherwise Pet.trigger stays timed after the env is gone
+        if self.trigger_profiler is not None:
+            stop_trigger_profiler()
+            self.trigger_profiler = None
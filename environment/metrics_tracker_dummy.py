@@ -21,3 +21,6 @@ class MetricsTrackerDummy:
 
     def log_episode_metrics(self, is_truncated: bool, player: Player = None):
         pass
+
+    def close(self):
+        pass
@@ -34,3 +34,6 @@ class MetricsTrackerEval:
     def log_episode_metrics(self, is_truncated: bool, player: Player = None):
         self.wandb_run.log(self.stats)
         self.stats.clear()
+
+    def close(self):
+        pass
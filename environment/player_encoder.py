@@ -0,0 +1,219 @@
+import numpy as np
+
+from action_masks import stack_action_mask_values
+from all_types_and_consts import (
+    MAX_SHOP_LINKED_SLOTS,
+    MAX_SHOP_SLOTS,
+    MAX_TEAM_SIZE,
+    Food,
+    Species,
+)
+from environment.action_space import ActionName, actions_dict
+from environment.flatten_action import FlattenAction
+from environment.flatten_observation import FlattenObservation
+from player import Player
+
+NONE_SPECIES = Species.NONE.value
+NUM_FOODS = len(Food)
+
+# the observations the encoder writes. If the observation space changes, PlayerEncoder fails until this (and
+# encode_observation()) is updated
+encoded_observation_paths = {
+    "|team|species",
+    "|team|attacks",
+    "|team|healths",
+    "|team|experiences",
+    "|shop_animals|species",
+    "|shop_animals|attacks",
+    "|shop_animals|healths",
+    "|shop_animals|is_frozen",
+    "|shop_linked_animals|species1",
+    "|shop_linked_animals|species2",
+    "|shop_linked_animals|attacks1",
+    "|shop_linked_animals|attacks2",
+    "|shop_linked_animals|healths1",
+    "|shop_linked_animals|healths2",
+    "|shop_foods|kind",
+    "|shop_foods|cost",
+    "|shop_gold",
+    "|turn_number",
+    "|num_wins",
+    "|num_hearts",
+    "|shop_future_attack_addition",
+    "|shop_future_health_addition",
+}
+
+
+class PlayerEncoder:
+    """
+    Writes the same observation as FlattenObservation.observation(get_observation(player)) (bit for bit), and the same
+    action mask as FlattenAction.action_masks(), straight from the player into flat buffers. So we don't build the nested
+    dicts of arrays and walk them every step
+
+    The layout (and normalization) comes from the wrappers
+    """
+
+    def __init__(
+        self, flatten_observation: FlattenObservation, flatten_action: FlattenAction
+    ):
+        obs_defs = flatten_observation.observation_normalization
+        assert (
+            set(obs_defs) == encoded_observation_paths
+        ), "the observation space changed. Update PlayerEncoder.encode_observation()"
+        self.flatten_observation = flatten_observation
+        self.obs_size = flatten_observation.observation_space_size
+        self.start_idxs = {
+            path_key: obs_def.start_idx for path_key, obs_def in obs_defs.items()
+        }
+        # the raw values (before they're normalized by the wrapper)
+        self.raw_obs = np.zeros((self.obs_size,), dtype=np.float64)
+
+        self.num_actions = flatten_action.action_space.n
+        self.mask_slices = [
+            (
+                actions_dict[ActionName(path_key[1:])],
+                action_def.start_idx,
+                action_def.start_idx + action_def.size,
+            )
+            for path_key, action_def in flatten_action.action_def_map.items()
+        ]
+
+    def add_pets(
+        self,
+        idxs: list[int],
+        values: list[int],
+        pets: list,
+        num_slots: int,
+        species_path: str,
+        attacks_path: str,
+        healths_path: str,
+    ):
+        # same as Pet.get_base_stats_observation() (the missing slots are NONE pets)
+        species_start = self.start_idxs[species_path]
+        attacks_start = self.start_idxs[attacks_path]
+        healths_start = self.start_idxs[healths_path]
+        for idx in range(num_slots):
+            if idx < len(pets):
+                pet = pets[idx]
+                # species is (len(Species), num_slots)
+                idxs.append(species_start + pet.species._value_ * num_slots + idx)
+                values.append(1)
+                idxs.append(attacks_start + idx)
+                values.append(pet.attack)
+                idxs.append(healths_start + idx)
+                values.append(pet.health)
+            else:
+                # the base NONE pet has 0 attack and health
+                idxs.append(species_start + NONE_SPECIES * num_slots + idx)
+                values.append(1)
+
+    def encode_observation(self, player: Player, out: np.ndarray) -> np.ndarray:
+        """
+        Writes the normalized observation into out (a float32 array of size obs_size)
+        """
+        start_idxs = self.start_idxs
+        shop = player.shop
+        idxs: list[int] = []
+        values: list[int] = []
+
+        team_pets = player.team.pets
+        self.add_pets(
+            idxs,
+            values,
+            team_pets,
+            MAX_TEAM_SIZE,
+            "|team|species",
+            "|team|attacks",
+            "|team|healths",
+        )
+        experiences_start = start_idxs["|team|experiences"]
+        for idx, pet in enumerate(team_pets):
+            idxs.append(experiences_start + idx)
+            values.append(pet.experience)
+
+        slots = shop.slots
+        self.add_pets(
+            idxs,
+            values,
+            [slot.pet for slot in slots],
+            MAX_SHOP_SLOTS,
+            "|shop_animals|species",
+            "|shop_animals|attacks",
+            "|shop_animals|healths",
+        )
+        is_frozen_start = start_idxs["|shop_animals|is_frozen"]
+        for idx, slot in enumerate(slots):
+            idxs.append(is_frozen_start + idx)
+            values.append(slot.is_frozen)
+
+        linked_slots = shop.linked_slots
+        self.add_pets(
+            idxs,
+            values,
+            [linked_slot.pet1 for linked_slot in linked_slots],
+            MAX_SHOP_LINKED_SLOTS,
+            "|shop_linked_animals|species1",
+            "|shop_linked_animals|attacks1",
+            "|shop_linked_animals|healths1",
+        )
+        self.add_pets(
+            idxs,
+            values,
+            [linked_slot.pet2 for linked_slot in linked_slots],
+            MAX_SHOP_LINKED_SLOTS,
+            "|shop_linked_animals|species2",
+            "|shop_linked_animals|attacks2",
+            "|shop_linked_animals|healths2",
+        )
+
+        # kind is (MAX_SHOP_FOOD_SLOTS, len(Food))
+        kind_start = start_idxs["|shop_foods|kind"]
+        cost_start = start_idxs["|shop_foods|cost"]
+        for idx, food_slot in enumerate(shop.food_slots):
+            idxs.append(kind_start + idx * NUM_FOODS + food_slot.food_type._value_)
+            values.append(1)
+            # plus 1 since for NAN cost, it'll be 0 (see Shop.get_observation())
+            idxs.append(cost_start + idx)
+            values.append(food_slot.cost + 1)
+
+        idxs.append(start_idxs["|shop_gold"])
+        values.append(shop.gold)
+        idxs.append(start_idxs["|turn_number"])
+        values.append(player.turn_number)
+        idxs.append(start_idxs["|num_wins"])
+        values.append(player.num_wins)
+        idxs.append(start_idxs["|num_hearts"])
+        values.append(player.hearts)
+        idxs.append(start_idxs["|shop_future_attack_addition"])
+        values.append(shop.future_attack_addition)
+        idxs.append(start_idxs["|shop_future_health_addition"])
+        values.append(shop.future_health_addition)
+
+        raw_obs = self.raw_obs
+        raw_obs.fill(0)
+        raw_obs[idxs] = values
+        return self.flatten_observation.normalize(raw_obs, out)
+
+    def encode_action_masks(self, player: Player, out: np.ndarray) -> np.ndarray:
+        """
+        Writes the flattened action mask into out (a bool array of size num_actions)
+        """
+        for action, start_idx, end_idx in self.mask_slices:
+            out[start_idx:end_idx] = action.get_mask(player).ravel()
+        return out
+
+    def encode_batched_action_masks(
+        self, players: list[Player], out: np.ndarray
+    ) -> np.ndarray:
+        """
+        Writes the flattened action masks of the players into out (a bool array of shape (len(players), num_actions)).
+        The masks of all the players are computed at once (see get_batched_mask), from the players' cached mask values
+        """
+        state = stack_action_mask_values(
+            [player.get_action_mask_values() for player in players]
+        )
+        for action, start_idx, end_idx in self.mask_slices:
+            out[:, start_idx:end_idx] = action.get_batched_mask(state).reshape(
+                len(players), -1
+            )
+        return out
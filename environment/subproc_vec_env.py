@@ -0,0 +1,314 @@
+import multiprocessing as mp
+import os
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Sequence
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import (
+    CloudpickleWrapper,
+    VecEnvIndices,
+    VecEnvObs,
+    VecEnvStepReturn,
+)
+
+from environment.environment import SuperAutoPetsEnv
+from environment.vec_env import SuperAutoPetsVecEnv
+
+# the buffers that the workers write into. name -> dtype. Their shapes are (num_envs, ...) (see get_buffer_shapes())
+buffer_dtypes = {
+    "obs": np.float32,
+    "action_masks": np.bool_,
+    "rews": np.float32,
+    "dones": np.bool_,
+    "actions": np.int64,
+}
+
+
+def get_buffer_shapes(
+    num_envs: int, obs_size: int, num_actions: int
+) -> dict[str, tuple[int, ...]]:
+    return {
+        "obs": (num_envs, obs_size),
+        "action_masks": (num_envs, num_actions),
+        "rews": (num_envs,),
+        "dones": (num_envs,),
+        "actions": (num_envs,),
+    }
+
+
+def get_buffers(
+    shared_memories: dict[str, SharedMemory], shapes: dict[str, tuple[int, ...]]
+) -> dict[str, np.ndarray]:
+    return {
+        name: np.ndarray(shapes[name], dtype=dtype, buffer=shared_memories[name].buf)
+        for name, dtype in buffer_dtypes.items()
+    }
+
+
+def worker(
+    remote: Connection,
+    parent_remote: Connection,
+    env_fns_wrapper: CloudpickleWrapper,
+    start_idx: int,
+):
+    # each worker steps its envs with a SuperAutoPetsVecEnv, whose buffers are its rows of the shared buffers
+    parent_remote.close()
+    vec_env = SuperAutoPetsVecEnv(env_fns_wrapper.var)
+    end_idx = start_idx + vec_env.num_envs
+    remote.send((vec_env.observation_space, vec_env.action_space))
+
+    shared_memories: dict[str, SharedMemory] = {}
+    buffers: dict[str, np.ndarray] = {}
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "attach":
+                names, shapes = data
+                shared_memories = {
+                    name: SharedMemory(name=shm_name)
+                    for name, shm_name in names.items()
+                }
+                buffers = get_buffers(shared_memories, shapes)
+                vec_env.buf_obs = buffers["obs"][start_idx:end_idx]
+                vec_env.buf_action_masks = buffers["action_masks"][start_idx:end_idx]
+                vec_env.buf_rews = buffers["rews"][start_idx:end_idx]
+                vec_env.buf_dones = buffers["dones"][start_idx:end_idx]
+                remote.send(None)
+            elif cmd == "step":
+                vec_env.step_async(buffers["actions"][start_idx:end_idx])
+                _, _, _, infos = vec_env.step_wait()
+                # MaskablePPO asks for the masks before every step. So compute them now (they're written to the shared buffer)
+                vec_env.action_masks()
+                remote.send((infos, vec_env.pop_metrics_logs()))
+            elif cmd == "reset":
+                vec_env._seeds, vec_env._options = data
+                vec_env.reset()
+                vec_env.action_masks()
+                remote.send(vec_env.reset_infos)
+            elif cmd == "get_attr":
+                remote.send(vec_env.get_attr(*data))
+            elif cmd == "set_attr":
+                remote.send(vec_env.set_attr(*data))
+            elif cmd == "env_method":
+                method_name, method_args, indices, method_kwargs = data
+                remote.send(
+                    vec_env.env_method(
+                        method_name, *method_args, indices=indices, **method_kwargs
+                    )
+                )
+            elif cmd == "env_is_wrapped":
+                remote.send(vec_env.env_is_wrapped(*data))
+            elif cmd == "close":
+                vec_env.close()
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    except KeyboardInterrupt:
+        print("SuperAutoPetsSubprocVecEnv worker: got KeyboardInterrupt")
+    finally:
+        # the arrays must be released before the shared memory can be closed
+        buffers.clear()
+        vec_env.buf_obs = vec_env.buf_action_masks = None
+        vec_env.buf_rews = vec_env.buf_dones = None
+        for shared_memory in shared_memories.values():
+            shared_memory.close()
+
+
+class SuperAutoPetsSubprocVecEnv(VecEnv):
+    """
+    Steps SuperAutoPetsEnvs in worker processes. Each worker steps a slice of the envs (with a SuperAutoPetsVecEnv), and
+    writes their observations, rewards, dones, and flattened action masks straight into shared memory. Only the commands
+    and the infos go through the pipes.
+
+    Like SuperAutoPetsVecEnv, env_method("action_masks") returns the flattened masks (so it works with MaskablePPO)
+
+    The envs' metrics trackers can't log to a wandb run from the workers. So give them a BufferedRun: the workers send
+    what was logged back with the infos, and it's passed to log_metrics (e.g. wandb_run.log) in this process
+    """
+
+    def __init__(
+        self,
+        env_fns: list[Callable[[], SuperAutoPetsEnv]],
+        num_workers: int | None = None,
+        start_method: str | None = None,
+        log_metrics: Callable[[dict[str, Any]], None] | None = None,
+    ):
+        num_envs = len(env_fns)
+        num_workers = min(num_workers or os.cpu_count() or 1, num_envs)
+        self.closed = False
+        self.waiting = False
+        self.log_metrics = log_metrics
+
+        # each worker gets a contiguous slice of the envs
+        self.worker_slices: list[range] = [
+            range(env_idxs[0], env_idxs[-1] + 1)
+            for env_idxs in np.array_split(np.arange(num_envs), num_workers)
+        ]
+        # the workers attach to the shared memory we create below. So they need to use our resource tracker (forked workers
+        # would start their own, which would unlink the shared memory when the worker exits)
+        resource_tracker.ensure_running()
+        ctx = mp.get_context(start_method)
+        self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(num_workers)])
+        self.processes = []
+        for work_remote, remote, worker_slice in zip(
+            work_remotes, self.remotes, self.worker_slices
+        ):
+            env_fns_wrapper = CloudpickleWrapper(
+                [env_fns[env_idx] for env_idx in worker_slice]
+            )
+            process = ctx.Process(
+                target=worker,
+                args=(work_remote, remote, env_fns_wrapper, worker_slice.start),
+                daemon=True,  # if the main process crashes, we should not cause things to hang
+            )
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        spaces = [remote.recv() for remote in self.remotes]
+        observation_space, action_space = spaces[0]
+
+        # the buffers only exist once. The workers write into their rows
+        shapes = get_buffer_shapes(num_envs, observation_space.shape[0], action_space.n)
+        self.shared_memories = {
+            name: SharedMemory(
+                create=True,
+                size=max(int(np.prod(shapes[name])) * np.dtype(dtype).itemsize, 1),
+            )
+            for name, dtype in buffer_dtypes.items()
+        }
+        self.buffers = get_buffers(self.shared_memories, shapes)
+        names = {
+            name: shared_memory.name
+            for name, shared_memory in self.shared_memories.items()
+        }
+        for remote in self.remotes:
+            remote.send(("attach", (names, shapes)))
+        for remote in self.remotes:
+            remote.recv()
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def reset(self) -> VecEnvObs:
+        for remote, worker_slice in zip(self.remotes, self.worker_slices):
+            seeds = [self._seeds[env_idx] for env_idx in worker_slice]
+            options = [self._options[env_idx] for env_idx in worker_slice]
+            remote.send(("reset", (seeds, options)))
+        self.reset_infos = []
+        for remote in self.remotes:
+            self.reset_infos.extend(remote.recv())
+        self._reset_seeds()
+        self._reset_options()
+        return self.buffers["obs"].copy()
+
+    def step_async(self, actions: np.ndarray):
+        self.buffers["actions"][:] = actions
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self) -> VecEnvStepReturn:
+        infos = []
+        for remote in self.remotes:
+            worker_infos, metrics_logs = remote.recv()
+            infos.extend(worker_infos)
+            if self.log_metrics is not None:
+                for metrics in metrics_logs:
+                    self.log_metrics(metrics)
+        self.waiting = False
+        # copy the buffers, since the workers overwrite them on the next step
+        return (
+            self.buffers["obs"].copy(),
+            self.buffers["rews"].copy(),
+            self.buffers["dones"].copy(),
+            infos,
+        )
+
+    def action_masks(self) -> np.ndarray:
+        # the workers compute the masks after every step and reset
+        return self.buffers["action_masks"].copy()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.buffers.clear()
+        for shared_memory in self.shared_memories.values():
+            shared_memory.close()
+            shared_memory.unlink()
+        self.closed = True
+
+    def get_images(self) -> Sequence[np.ndarray | None]:
+        return [None for _ in range(self.num_envs)]
+
+    def get_worker_indices(
+        self, indices: VecEnvIndices
+    ) -> list[tuple[Connection, list[int]]]:
+        # maps the envs to the workers that have them (and their index in the worker)
+        env_idxs = list(self._get_indices(indices))
+        res = []
+        for remote, worker_slice in zip(self.remotes, self.worker_slices):
+            local_idxs = [
+                env_idx - worker_slice.start
+                for env_idx in env_idxs
+                if env_idx in worker_slice
+            ]
+            if len(local_idxs) > 0:
+                res.append((remote, local_idxs))
+        return res
+
+    def call_workers(self, cmd: str, indices: VecEnvIndices, make_data) -> list[Any]:
+        # make_data(local_idxs) is the data sent to each worker
+        worker_indices = self.get_worker_indices(indices)
+        for remote, local_idxs in worker_indices:
+            remote.send((cmd, make_data(local_idxs)))
+        res = []
+        for remote, _ in worker_indices:
+            res.extend(remote.recv())
+        return res
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        return self.call_workers(
+            "get_attr", indices, lambda local_idxs: (attr_name, local_idxs)
+        )
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None):
+        worker_indices = self.get_worker_indices(indices)
+        for remote, local_idxs in worker_indices:
+            remote.send(("set_attr", (attr_name, value, local_idxs)))
+        for remote, _ in worker_indices:
+            remote.recv()
+
+    def env_method(
+        self,
+        method_name: str,
+        *method_args,
+        indices: VecEnvIndices = None,
+        **method_kwargs,
+    ) -> list[Any]:
+        if method_name == "action_masks":
+            # the masks are already in shared memory. So don't ask the workers for them
+            return list(self.action_masks()[self._get_indices(indices)])
+        return self.call_workers(
+            "env_method",
+            indices,
+            lambda local_idxs: (method_name, method_args, local_idxs, method_kwargs),
+        )
+
+    def env_is_wrapped(
+        self, wrapper_class: type[gym.Wrapper], indices: VecEnvIndices = None
+    ) -> list[bool]:
+        return self.call_workers(
+            "env_is_wrapped", indices, lambda local_idxs: (wrapper_class, local_idxs)
+        )
@@ -0,0 +1,155 @@
+from typing import Any, Callable, Sequence
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common import env_util
+from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import (
+    VecEnvIndices,
+    VecEnvObs,
+    VecEnvStepReturn,
+)
+
+from environment.environment import SuperAutoPetsEnv
+from environment.flatten_action import FlattenAction
+from environment.flatten_observation import FlattenObservation
+from environment.metrics_tracker import BufferedRun
+from environment.player_encoder import PlayerEncoder
+
+
+class SuperAutoPetsVecEnv(VecEnv):
+    """
+    Steps many SuperAutoPetsEnvs in this process. It's the same as wrapping each env in FlattenAction(FlattenObservation())
+    and using a DummyVecEnv. But the observations and action masks are encoded straight from the players into
+    preallocated (num_envs, obs_size) and (num_envs, num_actions) arrays (see PlayerEncoder). So the envs don't build
+    their dict observations.
+
+    MaskablePPO gets the action masks with env_method("action_masks"), so that returns the flattened masks (see
+    action_masks())
+    """
+
+    def __init__(self, env_fns: list[Callable[[], SuperAutoPetsEnv]]):
+        self.envs = [env_fn() for env_fn in env_fns]
+        for env in self.envs:
+            env.is_observation_built = False
+        # we only use the wrappers for their spaces (and to unflatten the actions). So one is enough
+        self.flatten_observation = FlattenObservation(self.envs[0])
+        self.flatten_action = FlattenAction(self.flatten_observation)
+        self.encoder = PlayerEncoder(self.flatten_observation, self.flatten_action)
+        super().__init__(
+            len(self.envs),
+            self.flatten_observation.observation_space,
+            self.flatten_action.action_space,
+        )
+
+        self.buf_obs = np.zeros(
+            (self.num_envs, self.flatten_observation.observation_space_size),
+            dtype=np.float32,
+        )
+        self.buf_action_masks = np.zeros(
+            (self.num_envs, self.flatten_action.action_space.n), dtype=bool
+        )
+        self.buf_rews = np.zeros((self.num_envs,), dtype=np.float32)
+        self.buf_dones = np.zeros((self.num_envs,), dtype=bool)
+        self.buf_infos: list[dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        self.actions: np.ndarray | None = None
+
+    def save_obs(self, env_idx: int):
+        self.encoder.encode_observation(
+            self.envs[env_idx].player, self.buf_obs[env_idx]
+        )
+
+    def reset(self) -> VecEnvObs:
+        for env_idx, env in enumerate(self.envs):
+            maybe_options = (
+                {"options": self._options[env_idx]} if self._options[env_idx] else {}
+            )
+            _, self.reset_infos[env_idx] = env.reset(
+                seed=self._seeds[env_idx], **maybe_options
+            )
+            self.save_obs(env_idx)
+        self._reset_seeds()
+        self._reset_options()
+        return self.buf_obs.copy()
+
+    def step_async(self, actions: np.ndarray):
+        self.actions = actions
+
+    def step_wait(self) -> VecEnvStepReturn:
+        selected_actions = self.flatten_action.actions(self.actions)
+        for env_idx, env in enumerate(self.envs):
+            _, reward, terminated, truncated, info = env.step(selected_actions[env_idx])
+            self.buf_rews[env_idx] = reward
+            self.buf_dones[env_idx] = terminated or truncated
+            info["TimeLimit.truncated"] = truncated and not terminated
+            self.save_obs(env_idx)
+            if self.buf_dones[env_idx]:
+                info["terminal_observation"] = self.buf_obs[env_idx].copy()
+                _, self.reset_infos[env_idx] = env.reset()
+                self.save_obs(env_idx)
+            self.buf_infos[env_idx] = info
+        # the buffers are reused on the next step. So the caller gets copies (SB3 keeps the last observation around)
+        return (
+            self.buf_obs.copy(),
+            self.buf_rews.copy(),
+            self.buf_dones.copy(),
+            list(self.buf_infos),
+        )
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Returns the flattened action masks of all the envs (num_envs, num_actions). The array is overwritten the next time
+        this is called
+        """
+        return self.encoder.encode_batched_action_masks(
+            [env.player for env in self.envs], self.buf_action_masks
+        )
+
+    def pop_metrics_logs(self) -> list[dict[str, Any]]:
+        # what the envs' metrics trackers logged to a BufferedRun since the last call (see SuperAutoPetsSubprocVecEnv)
+        logs = []
+        for env in self.envs:
+            wandb_run = getattr(env.metrics_tracker, "wandb_run", None)
+            if isinstance(wandb_run, BufferedRun):
+                logs.extend(wandb_run.pop_logs())
+        return logs
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+    def get_images(self) -> Sequence[np.ndarray | None]:
+        return [None for _ in self.envs]
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        return [getattr(env, attr_name) for env in self.get_target_envs(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None):
+        for env in self.get_target_envs(indices):
+            setattr(env, attr_name, value)
+
+    def env_method(
+        self,
+        method_name: str,
+        *method_args,
+        indices: VecEnvIndices = None,
+        **method_kwargs,
+    ) -> list[Any]:
+        if method_name == "action_masks":
+            # the envs' own masks are dicts. sb3_contrib wants the flattened ones
+            return list(self.action_masks()[self._get_indices(indices)])
+        return [
+            getattr(env, method_name)(*method_args, **method_kwargs)
+            for env in self.get_target_envs(indices)
+        ]
+
+    def env_is_wrapped(
+        self, wrapper_class: type[gym.Wrapper], indices: VecEnvIndices = None
+    ) -> list[bool]:
+        return [
+            env_util.is_wrapped(env, wrapper_class)
+            for env in self.get_target_envs(indices)
+        ]
+
+    def get_target_envs(self, indices: VecEnvIndices) -> list[SuperAutoPetsEnv]:
+        return [self.envs[idx] for idx in self._get_indices(indices)]
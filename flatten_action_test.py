@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from environment.flatten_action import FlattenAction
+from environment.flatten_observation import FlattenObservation
+from opponent_db2 import OpponentDBInMemory
+from player import Player
+from testing_utils import PlayerEnv
+
+
+def test_flatten_action_decodes_every_action_index():
+    player = Player.init_starting_player(OpponentDBInMemory(), None)
+    flatten_action = FlattenAction(FlattenObservation(PlayerEnv(player)))
+    num_actions = flatten_action.action_space.n
+
+    expected = []
+    for path_key, action_def in flatten_action.action_def_map.items():
+        for idx in range(action_def.size):
+            params = (
+                np.unravel_index(idx, action_def.shape) if action_def.size > 1 else ()
+            )
+            expected.append((path_key, tuple(int(param) for param in params)))
+    assert len(expected) == num_actions
+
+    for action_idx in range(num_actions):
+        selected_action = flatten_action.action(np.int64(action_idx))
+        assert (selected_action.path_key, selected_action.params) == expected[
+            action_idx
+        ]
+
+    action_idxs = np.random.default_rng(0).integers(0, num_actions, size=64)
+    selected_actions = flatten_action.actions(action_idxs)
+    assert [
+        (selected_action.path_key, selected_action.params)
+        for selected_action in selected_actions
+    ] == [expected[action_idx] for action_idx in action_idxs]
+
+    with pytest.raises(ValueError):
+        flatten_action.action(np.int64(num_actions))
+    with pytest.raises(ValueError):
+        flatten_action.actions(np.array([0, -1]))
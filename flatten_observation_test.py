@@ -0,0 +1,33 @@
+import numpy as np
+
+from environment.flatten_observation import FlattenObservation
+from environment.state_space import get_observation
+from opponent_db2 import OpponentDBInMemory
+from player import Player
+from testing_utils import PlayerEnv
+
+
+def test_flatten_observation_matches_normalizing_each_observation():
+    player = Player.init_starting_player(OpponentDBInMemory(), None)
+    flatten_observation = FlattenObservation(PlayerEnv(player))
+    obs = get_observation(player)
+
+    # how each observation was normalized by itself before the plan was compiled
+    expected = np.empty((flatten_observation.observation_space_size,), np.float32)
+    for team_key, team_obs in obs.items():
+        for key, value in team_obs.items() if type(team_obs) is dict else [("", None)]:
+            path_key = f"|{team_key}|{key}" if value is not None else f"|{team_key}"
+            value = value if value is not None else team_obs
+            obs_def = flatten_observation.observation_normalization[path_key]
+            expected[obs_def.start_idx : obs_def.start_idx + obs_def.size] = (
+                value.flatten() + obs_def.normalization_shift
+            ) / obs_def.normalization_amount
+
+    assert np.array_equal(
+        flatten_observation.observation(obs).view(np.uint32), expected.view(np.uint32)
+    )
+    # it can also write into a row of a bigger array
+    rows = np.zeros((2, flatten_observation.observation_space_size), np.float32)
+    flatten_observation.observation(obs, out=rows[1])
+    assert np.array_equal(rows[1], expected)
+    assert not rows[0].any()
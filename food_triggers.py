@@ -139,7 +139,7 @@ def get_num_times_to_apply_food_buff(team: Team):
 
 
 def trigger_on_friendly_ate_food(team: Team, pet_that_ate_food: Pet):
-    for friendly_pet in team.pets:
+    for friendly_pet in team.pets.get_listeners(Trigger.ON_FRIENDLY_ATE_FOOD):
         friendly_pet.trigger(
             Trigger.ON_FRIENDLY_ATE_FOOD, pet_that_ate_food=pet_that_ate_food, team=team
         )
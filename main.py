@@ -104,6 +104,22 @@ def main(virtual_screen=False):
         default=0.96,
         help="set which gamma to use for MaskablePPO training.",
     )
+    parser.add_argument(
+        "-ne",
+        "--num_envs",
+        type=int,
+        nargs="?",
+        default=1,
+        help="number of games to step at once when collecting rollouts.",
+    )
+    parser.add_argument(
+        "-nw",
+        "--num_workers",
+        type=int,
+        nargs="?",
+        default=0,
+        help="number of processes to step the games in (if num_envs > 1). 0 steps them in the main process.",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -9,10 +9,12 @@ from all_types_and_consts import (
     PetLevel,
     Species,
     Trigger,
-    in_battle_triggers,
+    can_trigger_in_shop_or_battle_mask,
+    in_battle_triggers_mask,
 )
 from typing import Any
-
+import battle_trace
+from battle_trace import BattleTraceKind
 
 TriggerFn = Any  # prevent circular import
 Shop = Any  # prevent circular import
@@ -20,8 +22,32 @@ Team = Any  # prevent circular import
 
 TIGER_LEVEL_TRIGGER_KEY = "tiger_level_trigger"
 
+# maps each trigger a pet has to its trigger fns (in the order they run). Trigger tables are shared between a pet and its clones
+# (so every pet of a species shares its base pet's table). So never mutate one. set_trigger() etc. replace the pet's table instead
+TriggerTable = dict[Trigger, tuple[TriggerFn, ...]]
+
+
+# bumped whenever any pet's triggers change. So cached trigger lookups (see PetList) know when to rebuild.
+# This is a module global (not a class attribute) since writing to a class attribute invalidates python's attribute cache for the class
+trigger_epoch = 0
+
 
 class Pet:
+    # we make a lot of pets (every clone, spawn and shop roll). slots make them smaller and faster to create
+    __slots__ = (
+        "species",
+        "attack",
+        "health",
+        "experience",
+        "effect",
+        "attack_boost",
+        "health_boost",
+        "_metadata",
+        "_triggers",
+        "team_idx",
+        "is_alive",
+    )
+
     def __init__(
         self,
         *,
@@ -41,13 +67,16 @@ class Pet:
         self.attack_boost = attack_boost
         self.health_boost = health_boost
 
-        # e.g. extra info for each pet. e.g. for a rabbit: the number of times a friendly ate food this turn
-        # the way to use metadata is this: whenever the cooldown refreshes, we clear the metadata (so all counts are reset to 0)
-        # This means: to implement a cooldown, just add 1 to the metadata counter and check if it's greater than the cooldown amount
-        self.metadata = defaultdict(int)
+        # most pets never use their metadata. So it's only created when it's first accessed (see the metadata property)
+        self._metadata: defaultdict[str, int] | None = None
 
-        self._triggers: dict[Trigger, list[TriggerFn]] = defaultdict(list)
-        # self.id = uuid.uuid4() # I don't think this is needed since each python object has a unique id. And we use .index() to get the right index of a pet in a list (or "is" to check for equality)
+        self._triggers: TriggerTable = {}
+        # self.id = uuid.uuid4() # I don't think this is needed since each python object has a unique id. And we use "is" to check for equality
+
+        # where the pet was last seen in its list of pets. This is just a hint (see get_idx_in) so it doesn't have to be exact
+        self.team_idx = -1
+        # set to False when the pet takes lethal damage or faints (see battle.py). So we don't need to search the team to see if it's alive
+        self.is_alive = True
 
     @staticmethod
     def define_base_stats(*, species: Species, attack: int, health: int):
@@ -58,8 +87,23 @@ class Pet:
             experience=1,
         )
 
+    @property
+    def metadata(self) -> defaultdict[str, int]:
+        # e.g. extra info for each pet. e.g. for a rabbit: the number of times a friendly ate food this turn
+        # the way to use metadata is this: whenever the cooldown refreshes, we clear the metadata (so all counts are reset to 0)
+        # This means: to implement a cooldown, just add 1 to the metadata counter and check if it's greater than the cooldown amount
+        if self._metadata is None:
+            self._metadata = defaultdict(int)
+        return self._metadata
+
     def set_trigger(self, trigger: Trigger, trigger_fn: TriggerFn):
-        self._triggers[trigger].append(trigger_fn)
+        global trigger_epoch
+        # copy on write, since the table may be shared with other pets
+        self._triggers = {
+            **self._triggers,
+            trigger: self._triggers.get(trigger, ()) + (trigger_fn,),
+        }
+        trigger_epoch += 1
 
     # call triggers that the pet has
     def trigger(self, trigger: Trigger, *args, **kwargs) -> None:
@@ -70,13 +114,21 @@ class Pet:
         if trigger in self._triggers:
             # a trigger may append MORE triggers of the same type. So we cannot just use a "for in" loop.
             ith_trigger = 0
-            while ith_trigger < len(self._triggers[trigger]):
+            while ith_trigger < len(self._triggers.get(trigger, ())):
                 # important: determine if the tiger buff makes this trigger run twice BEFORE the trigger happens (since onfaint can mess up pet indexes)
                 num_triggers, level_to_trigger_as = self.check_if_previous_pet_is_tiger(
-                    trigger, **kwargs
+                    trigger, kwargs
                 )
                 if num_triggers == 0:
-                    continue
+                    return  # the pet is no longer in the team
+                trace = battle_trace.active_trace
+                if trace is not None:
+                    trace.record(
+                        BattleTraceKind.TRIGGER,
+                        self.species,
+                        trigger._value_,
+                        num_triggers,
+                    )
                 # the first arg is always the pet that's triggering the event. So we put "self" as the first arg
                 self._triggers[trigger][ith_trigger](self, *args, **kwargs)
 
@@ -85,27 +137,37 @@ class Pet:
                     self._triggers[trigger][ith_trigger](self, *args, **kwargs)
                 ith_trigger += 1
 
-    def check_if_previous_pet_is_tiger(self, trigger: Trigger, **kwargs):
+    def check_if_previous_pet_is_tiger(self, trigger: Trigger, kwargs: dict[str, Any]):
+        """
+        Returns (the number of times to run the trigger, the level the 2nd run triggers as). kwargs are the trigger's kwargs
+        """
+        # kwargs is passed as a dict (rather than **kwargs) so we don't copy it on every trigger
         # ensure they are still in the team
-        if "my_pets" in kwargs:
-            my_pets: list[Pet] = kwargs["my_pets"]
-        else:
+        my_pets: list[Pet] | None = kwargs.get("my_pets")
+        if my_pets is None:
             my_pets = kwargs["team"].pets
 
         # for some reason, pets can be gone from the team and this trigger is still called (note: we have an exception for fainted triggers. but still)
         # e.g. on battle start, even though we have an explicit if guard to ensure the pets are not in the team (before calling the trigger), it still calls
         # it's as if the list in the battle start is NOT updated. even though we only do mutations on the original ref object in this entire project
         # basically, this if statement is a final catch all to prevent triggers from hapepning if the pets are not in the team
-        if "faint_pet_idx" not in kwargs and self not in my_pets:
-            # print("my_pets listed", my_pets, self, trigger, kwargs)
-            return 0, 0
+        if "faint_pet_idx" in kwargs:
+            # use this instead because for on_faint, we will NOT be able to find the index of the pet (after it's removed from the team)
+            pet_idx = kwargs["faint_pet_idx"]
+        else:
+            pet_idx = self.get_idx_in(my_pets)
+            # sold pets are removed from the team before their ON_SELL trigger runs
+            if pet_idx == -1 and trigger != Trigger.ON_SELL:
+                return 0, 0
 
         # 1) ensure that we are in a battle right now. the tiger only triggers in battle
-        is_not_a_battle_trigger = trigger not in in_battle_triggers
+        trigger_bit = 1 << trigger._value_
+        is_not_a_battle_trigger = not in_battle_triggers_mask & trigger_bit
 
         # I made sure that all triggers that can be in the shop or in battle will pass in a "is_in_battle" kwarg
         is_triggering_in_the_shop = (
-            "is_in_battle" in kwargs and not kwargs["is_in_battle"]
+            can_trigger_in_shop_or_battle_mask & trigger_bit
+            and not kwargs.get("is_in_battle", True)
         )
         if is_not_a_battle_trigger or is_triggering_in_the_shop:
             # the tiger can only trigger multiple times if it's in battle
@@ -113,13 +175,7 @@ class Pet:
 
         # 2) ensure that the pet behind this one is a tiger
 
-        # get idx of the pet to check if the preivous pet is a tiger
-        if "faint_pet_idx" in kwargs:
-            # use this instead because for on_faint, we will NOT be able to find the index of the pet (after it's removed from the team)
-            pet_idx = kwargs["faint_pet_idx"]
-        else:
-            pet_idx = my_pets.index(self)
-
+        # pet_idx (from above) is used to check if the preivous pet is a tiger
         if (
             pet_idx > 0 and len(my_pets) > pet_idx - 1
         ):  # I'm really not sure why len(my_pets) > pet_idx - 1 can fail since we immediately call on_faint after we get the pet_idx
@@ -127,17 +183,40 @@ class Pet:
             #     len(my_pets) > pet_idx - 1
             # ), f"my_pets is not big enough my_pets={my_pets}" # my_pets is [] when this fails :/
             prev_index_pet = my_pets[pet_idx - 1]
-            if prev_index_pet.species == Species.TIGER:
+            if prev_index_pet.species is Species.TIGER:
                 return 2, prev_index_pet.get_level()
         return 1, 0
 
+    def get_idx_in(self, pets: list["Pet"]) -> int:
+        """
+        Returns the index of this pet (by identity, not __eq__) in pets. Or -1 if it's not in pets
+        """
+        # most of the time the pet hasn't moved since we last saw it, so we don't need to search the list
+        team_idx = self.team_idx
+        if 0 <= team_idx < len(pets) and pets[team_idx] is self:
+            return team_idx
+        for idx, pet in enumerate(pets):
+            if pet is self:
+                self.team_idx = idx
+                return idx
+        return -1
+
     def clear_triggers(self):
-        self._triggers.clear()
+        global trigger_epoch
+        self._triggers = {}
+        trigger_epoch += 1
 
     def copy_triggers(self, other: "Pet"):
-        for trigger, trigger_fns in other._triggers.items():
-            for trigger_fn in trigger_fns:
-                self.set_trigger(trigger, trigger_fn)
+        global trigger_epoch
+        if not self._triggers:
+            # nothing to merge, so we can just share the other pet's table
+            self._triggers = other._triggers
+        else:
+            triggers = dict(self._triggers)
+            for trigger, trigger_fns in other._triggers.items():
+                triggers[trigger] = triggers.get(trigger, ()) + trigger_fns
+            self._triggers = triggers
+        trigger_epoch += 1
 
     def clone(self):
         pet = Pet(
@@ -149,8 +228,30 @@ class Pet:
             attack_boost=self.attack_boost,
             health_boost=self.health_boost,
         )
-        pet.copy_triggers(self)
+        # share the table (rather than using copy_triggers). The new pet isn't in any PetList yet, so there's no need to bump
+        # trigger_epoch
+        pet._triggers = self._triggers
+
+        return pet
 
+    def clone_for_battle(self) -> "Pet":
+        """
+        Same as clone().apply_temp_buffs(). The copy shares this pet's trigger table (which is copy on write), and its metadata
+        is only created if it's used. So only the stats are copied
+        """
+        # this runs for every pet in every battle. So we skip __init__ (and its kwargs) and set the slots directly
+        pet = Pet.__new__(Pet)
+        pet.species = self.species
+        pet.attack = min(MAX_ATTACK, self.attack + self.attack_boost)
+        pet.health = min(MAX_HEALTH, self.health + self.health_boost)
+        pet.experience = self.experience
+        pet.effect = self.effect
+        pet.attack_boost = self.attack_boost
+        pet.health_boost = self.health_boost
+        pet._metadata = None
+        pet._triggers = self._triggers
+        pet.team_idx = -1
+        pet.is_alive = True
         return pet
 
     def __eq__(self, other: "Pet"):
@@ -169,9 +270,11 @@ class Pet:
         return self
 
     def get_level(self) -> PetLevel:
-        if self.metadata[TIGER_LEVEL_TRIGGER_KEY] != 0:
-            level_to_trigger_as = self.metadata[TIGER_LEVEL_TRIGGER_KEY]
-            self.metadata[TIGER_LEVEL_TRIGGER_KEY] = 0
+        # use .get() so we don't create the metadata (or add the key to it) just to check for the tiger
+        metadata = self._metadata
+        if metadata is not None and metadata.get(TIGER_LEVEL_TRIGGER_KEY, 0) != 0:
+            level_to_trigger_as = metadata[TIGER_LEVEL_TRIGGER_KEY]
+            metadata[TIGER_LEVEL_TRIGGER_KEY] = 0
             return level_to_trigger_as
 
         if self.experience < 3:
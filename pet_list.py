@@ -0,0 +1,108 @@
+from typing import Iterable
+
+from all_types_and_consts import Trigger
+import pet as pet_module
+from pet import Pet
+
+
+class PetList(list):
+    """
+    A list of pets that also indexes which pets have each trigger. So when we notify friends about an event
+    (e.g. ON_FRIEND_FAINTS), we only call Pet.trigger on the pets that are actually listening.
+
+    The index is built lazily (one trigger at a time). It's thrown away whenever the list is mutated, or whenever any pet's triggers change
+    (e.g. when a parrot copies a pet's triggers). See pet.trigger_epoch
+    """
+
+    __slots__ = ("_listeners", "_listeners_epoch")
+
+    def __init__(self, pets: Iterable[Pet] = ()):
+        super().__init__(pets)
+        self._listeners: dict[Trigger, list[Pet]] | None = None
+        self._listeners_epoch = -1
+
+    def get_listeners(self, trigger: Trigger) -> list[Pet]:
+        """
+        Returns the pets (in list order) that have the trigger. Don't mutate the returned list
+        """
+        listeners = self._listeners
+        if listeners is None or self._listeners_epoch != pet_module.trigger_epoch:
+            listeners = self._listeners = {}
+            self._listeners_epoch = pet_module.trigger_epoch
+        # each trigger is indexed separately since most events only ever look up one or two triggers
+        pets = listeners.get(trigger)
+        if pets is None:
+            pets = listeners[trigger] = [
+                pet for pet in self if trigger in pet._triggers
+            ]
+        return pets
+
+    # every method that mutates the list needs to invalidate the index
+    def __setitem__(self, key, value):
+        self._listeners = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._listeners = None
+        super().__delitem__(key)
+
+    def __iadd__(self, other):
+        self._listeners = None
+        return super().__iadd__(other)
+
+    def __imul__(self, other):
+        self._listeners = None
+        return super().__imul__(other)
+
+    def append(self, pet: Pet):
+        self._listeners = None
+        super().append(pet)
+
+    def extend(self, pets: Iterable[Pet]):
+        self._listeners = None
+        super().extend(pets)
+
+    # pets faint (pop) and spawn (insert) all the time in battle. So we update the index rather than throwing it away
+    def insert(self, idx: int, pet: Pet):
+        super().insert(idx, pet)
+        listeners = self._listeners
+        if listeners:
+            for trigger, trigger_fns in pet._triggers.items():
+                if trigger_fns:
+                    # it'll be rebuilt in the right order the next time it's needed
+                    listeners.pop(trigger, None)
+
+    def pop(self, idx: int = -1) -> Pet:
+        pet = super().pop(idx)
+        listeners = self._listeners
+        if listeners:
+            for trigger, trigger_fns in pet._triggers.items():
+                pets = listeners.get(trigger)
+                if trigger_fns and pets is not None:
+                    # make a new list, since callers may be iterating over the old one
+                    listeners[trigger] = [
+                        listener for listener in pets if listener is not pet
+                    ]
+        return pet
+
+    def remove(self, pet: Pet):
+        self._listeners = None
+        super().remove(pet)
+
+    def clear(self):
+        self._listeners = None
+        super().clear()
+
+    def sort(self, *args, **kwargs):
+        self._listeners = None
+        super().sort(*args, **kwargs)
+
+    def reverse(self):
+        self._listeners = None
+        super().reverse()
+
+
+def get_pets_with_trigger(pets: list[Pet], trigger: Trigger) -> list[Pet]:
+    if isinstance(pets, PetList):
+        return pets.get_listeners(trigger)
+    return [pet for pet in pets if trigger in pet._triggers]
@@ -0,0 +1,42 @@
+from all_types_and_consts import Species, Trigger
+from pet_data import get_base_pet
+from pet_list import PetList
+from pet_triggers import on_faint_ant
+
+
+def get_pet(species: Species):
+    pet = get_base_pet(species)
+    pet.clear_triggers()
+    return pet
+
+
+def test_listeners_update_when_pets_spawn_and_faint():
+    ant1, pig, ant2 = get_pet(Species.ANT), get_pet(Species.PIG), get_pet(Species.ANT)
+    ant1.set_trigger(Trigger.ON_FAINT, on_faint_ant)
+    ant2.set_trigger(Trigger.ON_FAINT, on_faint_ant)
+    pets = PetList([ant1, pig])
+    assert pets.get_listeners(Trigger.ON_FAINT) == [ant1]
+
+    pets.insert(0, ant2)
+    assert pets.get_listeners(Trigger.ON_FAINT) == [ant2, ant1]
+
+    listeners = pets.get_listeners(Trigger.ON_FAINT)
+    pets.pop()  # pig
+    assert pets.get_listeners(Trigger.ON_FAINT) == [ant2, ant1]
+    pets.pop(1)  # ant1
+    assert pets.get_listeners(Trigger.ON_FAINT) == [ant2]
+    # callers may still be iterating over the old list
+    assert listeners == [ant2, ant1]
+
+    pets[0] = pig
+    assert pets.get_listeners(Trigger.ON_FAINT) == []
+
+
+def test_listeners_update_when_triggers_are_copied():
+    ant, parrot = get_pet(Species.ANT), get_pet(Species.PARROT)
+    ant.set_trigger(Trigger.ON_FAINT, on_faint_ant)
+    pets = PetList([parrot, ant])
+    assert pets.get_listeners(Trigger.ON_FAINT) == [ant]
+
+    parrot.copy_triggers(ant)
+    assert pets.get_listeners(Trigger.ON_FAINT) == [parrot, ant]
@@ -0,0 +1,68 @@
+import pytest
+
+from all_types_and_consts import Species, Trigger
+from pet_data import get_base_pet, species_to_pet_map
+import pet_triggers
+from pet_triggers import on_faint_ant, register_pet_triggers, set_pet_triggers
+
+
+# these tests register (and change) the base pets' triggers
+pytestmark = pytest.mark.usefixtures("restore_base_pet_triggers")
+
+
+def test_clones_copy_triggers_on_write():
+    set_pet_triggers()
+    base_parrot = get_base_pet(Species.PARROT)
+    parrot = base_parrot.clone()
+    assert parrot._triggers is base_parrot._triggers
+
+    parrot.copy_triggers(get_base_pet(Species.ANT))
+    assert Trigger.ON_FAINT in parrot._triggers
+    assert Trigger.ON_FAINT not in base_parrot._triggers
+    assert Trigger.ON_FAINT not in get_base_pet(Species.PARROT)._triggers
+
+
+def test_set_pet_triggers_only_registers_once():
+    set_pet_triggers()
+    version = pet_triggers.pet_triggers_version
+    set_pet_triggers()
+    assert pet_triggers.pet_triggers_version == version
+    ant = species_to_pet_map[Species.ANT]
+    assert ant._triggers[Trigger.ON_FAINT] == (on_faint_ant,)
+
+    # if a base pet's triggers change, they're registered from scratch
+    ant.set_trigger(Trigger.ON_FAINT, on_faint_ant)
+    set_pet_triggers()
+    assert pet_triggers.pet_triggers_version == version + 1
+    assert ant._triggers[Trigger.ON_FAINT] == (on_faint_ant,)
+
+
+
+def test_registered_pet_triggers_are_frozen():
+    set_pet_triggers()
+    with pytest.raises(TypeError):
+        pet_triggers.registered_pet_triggers[Species.ANT] = {}
+    # registering again (without clearing the triggers first) would make every trigger run twice
+    with pytest.raises(AssertionError):
+        register_pet_triggers()
+
+
+def test_tiger_repeats_the_trigger_of_the_pet_ahead_in_battle():
+    levels = []
+
+    def record_level(pet, *args, **kwargs):
+        levels.append(pet.get_level())
+
+    tiger = get_base_pet(Species.TIGER)
+    tiger.experience = 3  # level 2
+    pig = get_base_pet(Species.PIG)
+    pig.set_trigger(Trigger.ON_BEFORE_ATTACK, record_level)
+    pig.set_trigger(Trigger.ON_HURT, record_level)
+
+    pig.trigger(Trigger.ON_BEFORE_ATTACK, my_pets=[tiger, pig], enemy_pets=[])
+    assert levels == [1, 2]
+
+    # the tiger only repeats triggers in battle
+    levels.clear()
+    pig.trigger(Trigger.ON_HURT, my_pets=[tiger, pig], is_in_battle=False)
+    assert levels == [1]
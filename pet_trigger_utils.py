@@ -2,16 +2,54 @@ from all_types_and_consts import MAX_HEALTH, PetExperience, PetLevel, Species
 from pet import Pet
 
 
+def get_pet_idx(pet: Pet, my_pets: list[Pet]) -> int:
+    pet_idx = pet.get_idx_in(my_pets)
+    if pet_idx == -1:
+        raise ValueError(f"pet is not in my_pets. pet={pet}")
+    return pet_idx
+
+
+# in battle, a pet that is about to faint stays in its team until its faint event is handled (see battle_events.py).
+# these functions skip those pets, like they were already removed from the team
+
+
+def get_frontmost_alive_pet(pets: list[Pet]) -> Pet | None:
+    for pet in reversed(pets):
+        if pet.is_alive:
+            return pet
+    return None
+
+
+def get_backmost_alive_pet(pets: list[Pet]) -> Pet | None:
+    for pet in pets:
+        if pet.is_alive:
+            return pet
+    return None
+
+
+def get_alive_team(
+    my_pets: list[Pet], idx: int, is_in_battle: bool
+) -> tuple[list[Pet], int]:
+    """
+    Returns (the pets that aren't about to faint, the index idx has in that list). Outside of battle, the pets aren't
+    removed (fainted pets become NONE pets) so my_pets and idx are returned as is
+    """
+    if not is_in_battle:
+        return my_pets, idx
+    alive_pets = [pet for pet in my_pets if pet.is_alive]
+    return alive_pets, idx - sum(not pet.is_alive for pet in my_pets[:idx])
+
+
 def get_nearest_friends_ahead(
     pet: Pet, my_pets: list[Pet], num_friends: int
 ) -> list[Pet]:
-    pet_idx = my_pets.index(pet)
+    pet_idx = get_pet_idx(pet, my_pets)
     friend_idx = pet_idx + 1
     friends_ahead = []
 
     while len(friends_ahead) < num_friends and friend_idx < len(my_pets):
         friend_pet = my_pets[friend_idx]
-        if friend_pet.species != Species.NONE:
+        if friend_pet.species != Species.NONE and friend_pet.is_alive:
             friends_ahead.append(friend_pet)
         friend_idx += 1
 
@@ -27,7 +65,7 @@ def get_nearest_friends_behind_idx(
 
     while len(friends_behind) < num_friends and friend_idx >= 0:
         friend_pet = my_pets[friend_idx]
-        if friend_pet.species != Species.NONE:
+        if friend_pet.species != Species.NONE and friend_pet.is_alive:
             friends_behind.append(friend_pet)
         friend_idx -= 1
 
@@ -37,7 +75,7 @@ def get_nearest_friends_behind_idx(
 def get_nearest_friends_behind(
     pet: Pet, my_pets: list[Pet], num_friends: int
 ) -> list[Pet]:
-    pet_idx = my_pets.index(pet)
+    pet_idx = get_pet_idx(pet, my_pets)
     return get_nearest_friends_behind_idx(
         behind_idx=pet_idx, my_pets=my_pets, num_friends=num_friends
     )
@@ -1,7 +1,8 @@
 import inspect
 import math
 import random
-from typing import Any, Protocol, Type, get_type_hints
+from types import MappingProxyType
+from typing import Any, Mapping, Protocol, Type, get_type_hints
 from all_types_and_consts import (
     MAX_ATTACK,
     MAX_HEALTH,
@@ -15,9 +16,13 @@ from all_types_and_consts import (
 from battle import make_pet_faint, receive_damage, try_spawn_at_pos
 from pet import (
     Pet,
+    TriggerTable,
 )
 from pet_trigger_utils import (
+    get_alive_team,
+    get_backmost_alive_pet,
     get_experience_for_level,
+    get_frontmost_alive_pet,
     get_nearest_friends_ahead,
     get_nearest_friends_behind,
     get_nearest_friends_behind_idx,
@@ -272,8 +277,11 @@ def on_faint_rat(
     for _ in range(num_spawns):
         rat_spawn = get_base_pet(Species.PET_SPAWN).set_stats(attack=1, health=1)
 
-        # the rat always try to spawn it up front for the opponent
+        # the rat always try to spawn it up front for the opponent. Skip the enemies that are about to faint (they are
+        # still at the front until their faint events are handled)
         front_idx = len(enemy_pets) - 1
+        while front_idx > 0 and not enemy_pets[front_idx].is_alive:
+            front_idx -= 1
 
         try_spawn_at_pos(
             rat_spawn, idx=front_idx, pets=enemy_pets, is_in_battle=is_in_battle
@@ -302,16 +310,16 @@ def on_faint_hedgehog(
     if enemy_pets is None:
         return
 
+    # receive_damage() skips the enemies that have already fainted
     for enemy_pet in enemy_pets.copy():
-        if enemy_pet in enemy_pets:
-            receive_damage(
-                receiving_pet=enemy_pet,
-                attacking_pet=pet,
-                damage=damage,
-                receiving_team=enemy_pets,
-                opposing_team=my_pets,
-                is_in_battle=is_in_battle,
-            )
+        receive_damage(
+            receiving_pet=enemy_pet,
+            attacking_pet=pet,
+            damage=damage,
+            receiving_team=enemy_pets,
+            opposing_team=my_pets,
+            is_in_battle=is_in_battle,
+        )
 
 
 def on_hurt_peacock(
@@ -411,9 +419,12 @@ def on_faint_badger(
     percentage_damage_to_deal = 0.5 * pet.get_level()
     damage_to_deal = math.ceil(percentage_damage_to_deal * pet.attack)
 
-    ahead_idx = faint_pet_idx + 1
-    if ahead_idx < len(my_pets):
-        pet_ahead = my_pets[ahead_idx]
+    team_pets, alive_faint_pet_idx = get_alive_team(
+        my_pets, faint_pet_idx, is_in_battle
+    )
+    ahead_idx = alive_faint_pet_idx + 1
+    if ahead_idx < len(team_pets):
+        pet_ahead = team_pets[ahead_idx]
         if pet_ahead.species != Species.NONE:
             receive_damage(
                 receiving_pet=pet_ahead,
@@ -424,8 +435,8 @@ def on_faint_badger(
                 is_in_battle=is_in_battle,
             )
     else:  # else: the badger is at the front of the team
-        if is_in_battle and len(enemy_pets) > 0:
-            pet_ahead = enemy_pets[-1]
+        pet_ahead = get_frontmost_alive_pet(enemy_pets) if is_in_battle else None
+        if pet_ahead is not None:
             receive_damage(
                 receiving_pet=pet_ahead,
                 attacking_pet=pet,
@@ -436,9 +447,12 @@ def on_faint_badger(
             )
         # else: there is no pet ahead to deal damage to
 
-    # now deal damage to the pet behind (you can only damage your own team)
-    if faint_pet_idx > 0 and len(my_pets) > faint_pet_idx - 1:
-        pet_behind = my_pets[faint_pet_idx - 1]
+    # now deal damage to the pet behind (you can only damage your own team). the team may have changed since
+    team_pets, alive_faint_pet_idx = get_alive_team(
+        my_pets, faint_pet_idx, is_in_battle
+    )
+    if alive_faint_pet_idx > 0 and len(team_pets) > alive_faint_pet_idx - 1:
+        pet_behind = team_pets[alive_faint_pet_idx - 1]
         receive_damage(
             receiving_pet=pet_behind,
             attacking_pet=pet,
@@ -487,7 +501,7 @@ def on_after_attack_elephant(
     my_pets: list[Pet],
     enemy_pets: list[Pet],
 ):
-    if friend_behind_attacker is None or friend_behind_attacker not in my_pets:
+    if friend_behind_attacker is None or not friend_behind_attacker.is_alive:
         return
     num_triggers = pet.get_level()
     for _ in range(num_triggers):
@@ -694,9 +708,9 @@ def on_battle_start_crocodile(pet: Pet, my_pets: list[Pet], enemy_pets: list[Pet
     # https://www.reddit.com/r/superautopets/comments/ut58i3/turns_out_new_crocodile_is_pretty_good/?rdt=43846
     num_triggers = pet.get_level()
     for _ in range(num_triggers):
-        if len(enemy_pets) == 0:
+        last_enemy = get_backmost_alive_pet(enemy_pets)
+        if last_enemy is None:
             return
-        last_enemy = enemy_pets[0]
         receive_damage(
             receiving_pet=last_enemy,
             attacking_pet=pet,
@@ -708,10 +722,11 @@ def on_battle_start_crocodile(pet: Pet, my_pets: list[Pet], enemy_pets: list[Pet
 
 
 def on_knock_out_rhino(pet: Pet, my_pets: list[Pet], enemy_pets: list[Pet]):
-    if len(enemy_pets) == 0:
+    # the knocked out pet (and others) may still be in the list until their faint events are handled
+    first_enemy = get_frontmost_alive_pet(enemy_pets)
+    if first_enemy is None:
         return
 
-    first_enemy = enemy_pets[-1]
     damage_to_deal = 4 * pet.get_level()
 
     if first_enemy.species in tier_1_pet_species:
@@ -873,7 +888,7 @@ def on_faint_mammoth(
 ):
     stat_buff = 2 * pet.get_level()
     for my_pet in my_pets:
-        if my_pet is not pet:
+        if my_pet is not pet and my_pet.is_alive:
             my_pet.add_stats(attack=stat_buff, health=stat_buff)
 
 
@@ -910,7 +925,50 @@ def on_friend_faints_fly(
         try_spawn_at_pos(fly_spawn, faint_pet_idx, my_pets, is_in_battle)
 
 
+# the base pets' trigger tables from the last time the triggers were registered (see set_pet_triggers()). It's read-only:
+# only set_pet_triggers() replaces it
+registered_pet_triggers: Mapping[Species, TriggerTable] = MappingProxyType({})
+# bumped every time the triggers are (re)registered. So things built from the old triggers (e.g. cached battle results)
+# can tell that they're stale
+pet_triggers_version = 0
+
+
+def are_pet_triggers_registered() -> bool:
+    # trigger tables are never mutated (see Pet.set_trigger). So if a base pet still has the exact table we registered,
+    # its triggers haven't changed
+    return len(registered_pet_triggers) > 0 and all(
+        species_to_pet_map[species]._triggers is triggers
+        for species, triggers in registered_pet_triggers.items()
+    )
+
+
 def set_pet_triggers():
+    """
+    Registers (and validates) the triggers of every base pet. This only does work once per process: calling it again is
+    a no-op, unless a base pet's triggers were changed since (e.g. by a test), in which case they're registered from scratch
+    """
+    global registered_pet_triggers, pet_triggers_version
+    if are_pet_triggers_registered():
+        return
+
+    # start from scratch, so calling this again never registers a trigger twice
+    for pet in species_to_pet_map.values():
+        pet.clear_triggers()
+    register_pet_triggers()
+    validate_trigger_protocols()
+    validate_can_trigger_in_shop_or_battle_triggers_have_is_in_battle_kwarg()
+
+    registered_pet_triggers = MappingProxyType(
+        {species: pet._triggers for species, pet in species_to_pet_map.items()}
+    )
+    pet_triggers_version += 1
+
+
+def register_pet_triggers():
+    # call set_pet_triggers() instead. Registering on top of the registered triggers would make every trigger run twice
+    assert not any(
+        pet._triggers for pet in species_to_pet_map.values()
+    ), "the pet triggers are already registered"
     # disable formatting so the trigger definitions are declared on one line
     # fmt: off
     # tier 1
@@ -1,11 +1,9 @@
-import itertools
+from typing import Callable
 from all_types_and_consts import (
     MAX_GAMES_LENGTH,
     MAX_SHOP_LINKED_SLOTS,
     MAX_TEAM_SIZE,
     NUM_WINS_TO_WIN,
-    PET_COST,
-    ROLL_COST,
     STARTING_HEARTS,
     TURN_AT_WHICH_THEY_GAIN_ONE_LOST_HEART,
     ActionReturn,
@@ -17,8 +15,27 @@ from all_types_and_consts import (
     foods_that_apply_globally,
     foods_for_pet,
     MAX_SHOP_FOOD_SLOTS,
+    PlayerState,
 )
-from battle import battle
+from action_masks import (
+    NONE_SPECIES,
+    ActionMaskState,
+    buy_food_for_pet_mask,
+    buy_food_mask,
+    buy_linked_pet_mask,
+    buy_pet_mask,
+    combine_pets_mask,
+    end_turn_mask,
+    freeze_pet_at_linked_slot_mask,
+    get_level,
+    reorder_team_mask,
+    roll_shop_mask,
+    sell_pet_mask,
+    toggle_freeze_food_slot_mask,
+    toggle_freeze_slot_mask,
+)
+from battle_cache import BattleCache
+from battle_soa import battle_soa
 from food_triggers import trigger_food_for_pet, trigger_food_globally
 from opponent_db import OpponentDB
 from pet import Pet
@@ -37,16 +54,113 @@ class Player:
         self.num_actions_taken_in_turn = 0
         self.hearts = STARTING_HEARTS
         self.opponent_db: OpponentDB = None
+        self.battle_cache: BattleCache | None = None
         self.last_battle_result = BattleResult.TIE  # on turn 1, the "last battle" will be considered a draw. https://superautopets.fandom.com/wiki/Snail
+        # the masks returned by get_action_mask() and the values returned by get_action_mask_values(), and the state that
+        # changed since they were computed
+        self.cached_action_masks: dict[Callable[[Player], np.ndarray], np.ndarray] = {}
+        self.cached_action_mask_values: tuple | None = None
+        self.dirty_state = PlayerState.ALL
 
     @staticmethod
-    def init_starting_player(opponent_db: OpponentDB):
+    def init_starting_player(
+        opponent_db: OpponentDB, battle_cache: BattleCache | None = None
+    ):
         player = Player(Team.init_starting_team())
         player.opponent_db = opponent_db
+        player.battle_cache = battle_cache
         player.shop.init_shop_for_round(round_number=1)
         return player
 
+    def mark_dirty(self, state: PlayerState = PlayerState.ALL):
+        # the actions call this. If you change the player without its actions (e.g. player.shop.gold = 10), call it yourself
+        self.dirty_state |= state
+
+    def get_action_mask(self, get_mask: Callable[["Player"], np.ndarray]) -> np.ndarray:
+        """
+        Returns get_mask(self) (e.g. Player.buy_pet_action_mask). It's only recomputed if the state it's computed from
+        changed (see action_mask_dependencies). The mask is shared between calls, so don't modify it
+        """
+        self.drop_stale_action_masks()
+        mask = self.cached_action_masks.get(get_mask)
+        if mask is None:
+            mask = self.cached_action_masks[get_mask] = get_mask(self)
+        return mask
+
+    def drop_stale_action_masks(self):
+        # drops the cached masks (and mask values) whose state changed since they were computed
+        # compare the flags' values (Flag's operators are slow)
+        dirty_state = self.dirty_state._value_
+        if dirty_state != 0:
+            self.cached_action_mask_values = None
+            for mask_fn, dependencies in action_mask_dependencies.items():
+                if dependencies._value_ & dirty_state:
+                    self.cached_action_masks.pop(mask_fn, None)
+            self.dirty_state = PlayerState.NONE
+
+    # the values that the action masks are computed from (see action_masks.py). The missing slots are NONE pets
+    def get_team_species(self) -> list[int]:
+        return [pet.species._value_ for pet in self.team.pets]
+
+    def get_team_levels(self) -> list[int]:
+        # from the experience, so we don't use up a tiger's level (see Pet.get_level())
+        return [get_level(pet.experience) for pet in self.team.pets]
+
+    def get_shop_species(self) -> list[int]:
+        slots = self.shop.slots[:MAX_SHOP_SLOTS]
+        return [slot.pet.species._value_ for slot in slots] + [NONE_SPECIES] * (
+            MAX_SHOP_SLOTS - len(slots)
+        )
+
+    def get_linked_shop_species(self) -> list[tuple[int, int]]:
+        linked_slots = self.shop.linked_slots[:MAX_SHOP_LINKED_SLOTS]
+        return [
+            (linked_slot.pet1.species._value_, linked_slot.pet2.species._value_)
+            for linked_slot in linked_slots
+        ] + [(NONE_SPECIES, NONE_SPECIES)] * (MAX_SHOP_LINKED_SLOTS - len(linked_slots))
+
+    def get_food_slots(self) -> tuple[list[int], list[int]]:
+        # the food types and costs
+        food_slots = self.shop.food_slots[:MAX_SHOP_FOOD_SLOTS]
+        num_missing_slots = MAX_SHOP_FOOD_SLOTS - len(food_slots)
+        return (
+            [food_slot.food_type._value_ for food_slot in food_slots]
+            + [0] * num_missing_slots,
+            [food_slot.cost for food_slot in food_slots] + [0] * num_missing_slots,
+        )
+
+    def get_action_mask_values(self) -> tuple:
+        # the ActionMaskState fields (in order). They're lists (not arrays), so the values of many players can be turned
+        # into arrays at once (see stack_action_mask_values()). They're cached like the masks, so the batched masks only
+        # read the state of the players that changed. Don't modify them
+        self.drop_stale_action_masks()
+        if self.cached_action_mask_values is None:
+            self.cached_action_mask_values = self.compute_action_mask_values()
+        return self.cached_action_mask_values
+
+    def compute_action_mask_values(self) -> tuple:
+        shop = self.shop
+        food_types, food_costs = self.get_food_slots()
+        return (
+            self.get_team_species(),
+            self.get_team_levels(),
+            self.get_shop_species(),
+            min(len(shop.slots), MAX_SHOP_SLOTS),
+            self.get_linked_shop_species(),
+            min(len(shop.linked_slots), MAX_SHOP_LINKED_SLOTS),
+            food_types,
+            food_costs,
+            min(len(shop.food_slots), MAX_SHOP_FOOD_SLOTS),
+            shop.gold,
+        )
+
+    def get_action_mask_state(self) -> ActionMaskState:
+        return ActionMaskState(
+            *(np.array(values) for values in self.get_action_mask_values())
+        )
+
     def reorder_team_action(self, start_idx: int, end_idx: int):
+        self.mark_dirty(PlayerState.TEAM)
         pets = self.team.pets
         assert pets[start_idx].species != Species.NONE
         assert start_idx != end_idx
@@ -61,24 +175,11 @@ class Player:
 
     def reorder_team_action_mask(self) -> np.ndarray:
         # return np.zeros( (MAX_TEAM_SIZE, MAX_TEAM_SIZE), dtype=bool)  # comment this out to disable toggle freeze slot
-        mask = np.ones((MAX_TEAM_SIZE, MAX_TEAM_SIZE), dtype=bool)
-
-        # cannot use itertools.combinations since reordering does NOT commute (who is the first pet matters)
-        for pet_start_idx in range(MAX_TEAM_SIZE):
-            for pet_end_idx in range(MAX_TEAM_SIZE):
-                # you cannot move a pet to the same spot
-                if pet_start_idx == pet_end_idx:
-                    mask[pet_start_idx, pet_end_idx] = False
-                    continue
-
-                # you cannot move an empty pet
-                pet = self.team.pets[pet_start_idx]
-                if pet.species == Species.NONE:
-                    mask[pet_start_idx, pet_end_idx] = False
-        return mask
+        return reorder_team_mask(np.array(self.get_team_species()))
 
     # Note: if a pet is level 3, you cannot combine it AT ALL
     def combine_pets_action(self, pet1_idx: int, pet2_idx: int):
+        self.mark_dirty()
         assert pet1_idx != pet2_idx
 
         pet1 = self.team.pets[pet1_idx]
@@ -95,36 +196,13 @@ class Player:
 
     def combine_pets_action_mask(self) -> np.ndarray:
         # the mask is NOT of size n choose 2 since the order of the merged pet matters (dictates who we're merging ONTO).
-        mask = np.ones((MAX_TEAM_SIZE, MAX_TEAM_SIZE), dtype=bool)
-
-        for i in range(MAX_TEAM_SIZE):
-            # this must be done outside the itertools.combinations loop since this index is outside the cases for n choose 2
-            # you cannot combine a pet with itself
-            mask[i, i] = False
-
-        # we can use itertools since combine_pets validity commutes
-        for pet1_idx, pet2_idx in itertools.combinations(range(MAX_TEAM_SIZE), 2):
-            # you cannot combine pets of different species
-            pet1 = self.team.pets[pet1_idx]
-            pet2 = self.team.pets[pet2_idx]
-            if pet1.species != pet2.species:
-                mask[pet1_idx, pet2_idx] = False
-                mask[pet2_idx, pet1_idx] = False
-                continue
-
-            # you cannot combine an empty pet
-            if pet1.species == Species.NONE:
-                mask[pet1_idx, pet2_idx] = False
-                mask[pet2_idx, pet1_idx] = False
-                continue
-
-            if pet1.get_level() == 3 or pet2.get_level() == 3:
-                mask[pet1_idx, pet2_idx] = False
-                mask[pet2_idx, pet1_idx] = False
-        return mask
+        return combine_pets_mask(
+            np.array(self.get_team_species()), np.array(self.get_team_levels())
+        )
 
     # Note: if a pet is level 3, you cannot buy a pet and combine to the level 3 pet
     def buy_pet_action(self, slot_idx: int, target_team_idx: int):
+        self.mark_dirty()
         shop_pet_species = self.shop.pet_at_slot(slot_idx).species
         pet_at_team_idx = self.team.pets[target_team_idx]
 
@@ -140,31 +218,16 @@ class Player:
         )
 
     def buy_pet_action_mask(self) -> np.ndarray:
-        # prevent buying if the player does not have enough gold
-        if self.shop.gold < PET_COST:
-            return np.zeros((MAX_SHOP_SLOTS, MAX_TEAM_SIZE), dtype=bool)
-
-        mask = np.ones((MAX_SHOP_SLOTS, MAX_TEAM_SIZE), dtype=bool)
-        for slot_idx in range(MAX_SHOP_SLOTS):
-            # prevent buying a none pet
-            shop_pet = self.shop.pet_at_slot(slot_idx)
-            if shop_pet.species == Species.NONE:
-                mask[slot_idx, :] = False
-                continue
-
-            for target_team_idx in range(MAX_TEAM_SIZE):
-                target_team_pet = self.team.pets[target_team_idx]
-
-                # you can only buy if you are combining or placing the pet into an empty position
-                is_target_position_occupied = target_team_pet.species != Species.NONE
-                is_player_combining_pets = shop_pet.species == target_team_pet.species
-                if is_target_position_occupied and not is_player_combining_pets:
-                    mask[slot_idx, target_team_idx] = False
-        return mask
+        return buy_pet_mask(
+            np.array(self.get_team_species()),
+            np.array(self.get_shop_species()),
+            self.shop.gold,
+        )
 
     def buy_linked_pet_action(
         self, linked_slot_idx: int, is_pet1_bought: bool, target_team_idx: int
     ):
+        self.mark_dirty()
         shop_pet_species = self.shop.pet_at_linked_slot(
             linked_slot_idx, is_pet1_bought
         ).species
@@ -183,34 +246,11 @@ class Player:
         )
 
     def buy_linked_pet_action_mask(self) -> np.ndarray:
-        # prevent buying if the player does not have enough gold
-        if self.shop.gold < PET_COST:
-            return np.zeros((MAX_SHOP_LINKED_SLOTS, 2, MAX_TEAM_SIZE), dtype=bool)
-
-        mask = np.ones((MAX_SHOP_LINKED_SLOTS, 2, MAX_TEAM_SIZE), dtype=bool)
-        for linked_slot_idx in range(MAX_SHOP_LINKED_SLOTS):
-            for buy_pet1 in [True, False]:
-                buy_pet_idx = 0 if buy_pet1 else 1
-
-                # prevent buying a none pet
-                shop_pet = self.shop.pet_at_linked_slot(linked_slot_idx, buy_pet1)
-                if shop_pet.species == Species.NONE:
-                    mask[linked_slot_idx, buy_pet_idx, :] = False
-                    continue
-
-                for target_team_idx in range(MAX_TEAM_SIZE):
-                    target_team_pet = self.team.pets[target_team_idx]
-
-                    # you can only buy if you are combining or placing the pet into an empty position
-                    is_target_position_occupied = (
-                        target_team_pet.species != Species.NONE
-                    )
-                    is_player_combining_pets = (
-                        shop_pet.species == target_team_pet.species
-                    )
-                    if is_target_position_occupied and not is_player_combining_pets:
-                        mask[linked_slot_idx, buy_pet_idx, target_team_idx] = False
-        return mask
+        return buy_linked_pet_mask(
+            np.array(self.get_team_species()),
+            np.array(self.get_linked_shop_species()),
+            self.shop.gold,
+        )
 
     def put_bought_pet_to_team(
         self,
@@ -230,65 +270,65 @@ class Player:
 
         # trigger on_buy AFTER the pet is added to the team (so the proper level is considered)
         bought_pet.trigger(Trigger.ON_BUY, team=self.team, shop=self.shop)
-        for pet in self.team.pets:
-            if pet is not bought_pet:
-                pet.trigger(
-                    Trigger.ON_FRIEND_SUMMONED,
-                    summoned_friend=bought_pet,
-                    my_pets=self.team.pets,
-                    is_in_battle=False,
-                )
-                pet.trigger(
-                    Trigger.ON_FRIEND_BOUGHT,
-                    bought_pet=bought_pet,
-                    team=self.team,
-                )
+        # each pet reacts to the summon, then to the buy, before the next pet does. So only skip the loop if no one listens
+        if self.team.pets.get_listeners(
+            Trigger.ON_FRIEND_SUMMONED
+        ) or self.team.pets.get_listeners(Trigger.ON_FRIEND_BOUGHT):
+            for pet in self.team.pets:
+                if pet is not bought_pet:
+                    pet.trigger(
+                        Trigger.ON_FRIEND_SUMMONED,
+                        summoned_friend=bought_pet,
+                        my_pets=self.team.pets,
+                        is_in_battle=False,
+                    )
+                    pet.trigger(
+                        Trigger.ON_FRIEND_BOUGHT,
+                        bought_pet=bought_pet,
+                        team=self.team,
+                    )
         return {ActionReturn.BOUGHT_PET_SPECIES: bought_pet.species}
 
     def buy_food_action(self, food_idx: int):
+        self.mark_dirty()
         food_type = self.shop.buy_food(food_idx)
         assert food_type in foods_that_apply_globally
         trigger_food_globally(food_type, self.team, self.shop)
 
     def buy_food_action_mask(self) -> np.ndarray:
-        mask = np.zeros((MAX_SHOP_FOOD_SLOTS), dtype=bool)
-        for i, food_slot in enumerate(self.shop.food_slots):
-            if (
-                food_slot.cost <= self.shop.gold
-                and food_slot.food_type in foods_that_apply_globally
-            ):
-                mask[i] = True
-        return mask
+        food_types, food_costs = self.get_food_slots()
+        return buy_food_mask(
+            np.array(food_types),
+            np.array(food_costs),
+            len(self.shop.food_slots),
+            self.shop.gold,
+        )
 
     def buy_food_for_pet_action(self, food_idx: int, pet_idx: int):
+        self.mark_dirty()
         assert self.team.pets[pet_idx].species != Species.NONE
         food_type = self.shop.buy_food(food_idx)
         assert food_type in foods_for_pet
         trigger_food_for_pet(food_type, self.team, pet_idx, self.shop)
 
     def buy_food_for_pet_action_mask(self) -> np.ndarray:
-        mask = np.zeros((MAX_SHOP_FOOD_SLOTS, MAX_TEAM_SIZE), dtype=bool)
-        for slot_idx, food_slot in enumerate(self.shop.food_slots):
-            if (
-                food_slot.cost > self.shop.gold
-                or food_slot.food_type not in foods_for_pet
-            ):
-                continue
-            for team_idx, pet in enumerate(self.team.pets):
-                if pet.species != Species.NONE:
-                    mask[slot_idx, team_idx] = True
-        return mask
+        food_types, food_costs = self.get_food_slots()
+        return buy_food_for_pet_mask(
+            np.array(self.get_team_species()),
+            np.array(food_types),
+            np.array(food_costs),
+            len(self.shop.food_slots),
+            self.shop.gold,
+        )
 
     def toggle_freeze_food_slot_action(self, food_slot_idx: int):
         self.shop.toggle_freeze_food_slot(food_slot_idx)
 
     def toggle_freeze_food_slot_action_mask(self) -> np.ndarray:
-        mask = np.zeros((MAX_SHOP_FOOD_SLOTS), dtype=bool)
-        for idx in range(len(self.shop.food_slots)):
-            mask[idx] = True
-        return mask
+        return toggle_freeze_food_slot_mask(len(self.shop.food_slots))
 
     def sell_pet_action(self, idx: int):
+        self.mark_dirty()
         pet = self.team.pets[idx]
         pet_species = pet.species
         assert pet_species != Species.NONE
@@ -299,46 +339,38 @@ class Player:
         return {ActionReturn.SOLD_PET_SPECIES: pet_species}
 
     def sell_pet_action_mask(self) -> np.ndarray:
-        mask = np.ones((MAX_TEAM_SIZE), dtype=bool)
-        for slot_idx in range(MAX_TEAM_SIZE):
-            pet = self.team.pets[slot_idx]
-            # you cannot sell an empty pet
-            if pet.species == Species.NONE:
-                mask[slot_idx] = False
-        return mask
+        return sell_pet_mask(np.array(self.get_team_species()))
 
     def roll_shop_action(self):
+        # the team doesn't change (the shop is rerolled)
+        self.mark_dirty(
+            PlayerState.SHOP_SLOTS
+            | PlayerState.LINKED_SLOTS
+            | PlayerState.FOOD_SLOTS
+            | PlayerState.GOLD
+        )
         self.shop.roll_shop()
 
     def roll_shop_action_mask(self) -> np.ndarray:
-        if self.shop.gold < ROLL_COST:
-            return np.zeros((1), dtype=bool)
-        else:
-            return np.ones((1), dtype=bool)
+        return roll_shop_mask(self.shop.gold)
 
     def toggle_freeze_slot_action(self, slot_idx: int):
         self.shop.toggle_freeze_slot(slot_idx)
 
     def toggle_freeze_slot_action_mask(self) -> np.ndarray:
         # return np.zeros( (MAX_SHOP_SLOTS), dtype=bool)  # comment this out to disable toggle freeze slot
-        mask = np.zeros((MAX_SHOP_SLOTS), dtype=bool)
-
-        # ensure the slots we freeze/unfreeze are available
-        for slot_idx in range(len(self.shop.slots)):
-            mask[slot_idx] = True
-        return mask
+        return toggle_freeze_slot_mask(len(self.shop.slots))
 
     def freeze_pet_at_linked_slot_action(self, slot_idx: int, is_freezing_pet1: bool):
+        # the frozen pet moves from the linked slots to the shop slots. (toggling a freeze doesn't change any mask)
+        self.mark_dirty(PlayerState.SHOP_SLOTS | PlayerState.LINKED_SLOTS)
         self.shop.freeze_pet_at_linked_slot(slot_idx, is_freezing_pet1)
 
     def freeze_pet_at_linked_slot_action_mask(self) -> np.ndarray:
-        mask = np.zeros((MAX_SHOP_LINKED_SLOTS, 2), dtype=bool)
-        for slot_idx in range(len(self.shop.linked_slots)):
-            for is_freezing_pet1 in [0, 1]:
-                mask[slot_idx, is_freezing_pet1] = True
-        return mask
+        return freeze_pet_at_linked_slot_mask(len(self.shop.linked_slots))
 
     def end_turn_action(self) -> GameResult:
+        self.mark_dirty()
         # trigger the parrot first, so it can copy end of turn effects and run them
         for pet in self.team.get_pets(species_to_list_first=[Species.PARROT]):
             pet.trigger(
@@ -346,7 +378,8 @@ class Player:
                 team=self.team,
                 last_battle_result=self.last_battle_result,
             )
-        battle_result = battle(
+        battle_fn = self.battle_cache.battle if self.battle_cache else battle_soa
+        battle_result = battle_fn(
             self.team,
             self.opponent_db.get_opponent_similar_in_stregth(
                 team=self.team,
@@ -379,7 +412,7 @@ class Player:
         # since we moved onto the next round, we need to init it for the current round
         self.shop.init_shop_for_round(self.turn_number)
 
-        for pet in self.team.pets:
+        for pet in self.team.pets.get_listeners(Trigger.ON_TURN_START):
             pet.trigger(Trigger.ON_TURN_START, team=self.team, shop=self.shop)
 
         if self.turn_number >= MAX_GAMES_LENGTH:
@@ -400,13 +433,34 @@ class Player:
     # to help the model, you can only end turn if you have no gold
     # we can remove this restriction in the future?
     def end_turn_action_mask(self) -> np.ndarray:
-        if self.shop.gold > 0:
-            return np.zeros((1), dtype=bool)
-        else:
-            return np.ones((1), dtype=bool)
+        return end_turn_mask(self.shop.gold)
 
     def __repr__(self):
         stats = f"turn: {self.turn_number}, lives: {self.hearts}\u2764\ufe0f, num_actions_made: {self.num_actions_taken_in_turn}, wins: {self.num_wins}, team:\n"
         for pet in self.team.pets:
             stats += f"{pet}\n"
         return stats
+
+
+# the state that each action mask is computed from. Combining, buying, selling and ending the turn can trigger pets (which
+# can change anything), so those actions mark all of the state as dirty
+action_mask_dependencies: dict[Callable[[Player], np.ndarray], PlayerState] = {
+    Player.reorder_team_action_mask: PlayerState.TEAM,
+    Player.combine_pets_action_mask: PlayerState.TEAM,
+    Player.buy_pet_action_mask: PlayerState.TEAM
+    | PlayerState.SHOP_SLOTS
+    | PlayerState.GOLD,
+    Player.buy_linked_pet_action_mask: PlayerState.TEAM
+    | PlayerState.LINKED_SLOTS
+    | PlayerState.GOLD,
+    Player.buy_food_action_mask: PlayerState.FOOD_SLOTS | PlayerState.GOLD,
+    Player.buy_food_for_pet_action_mask: PlayerState.TEAM
+    | PlayerState.FOOD_SLOTS
+    | PlayerState.GOLD,
+    Player.toggle_freeze_food_slot_action_mask: PlayerState.FOOD_SLOTS,
+    Player.sell_pet_action_mask: PlayerState.TEAM,
+    Player.roll_shop_action_mask: PlayerState.GOLD,
+    Player.toggle_freeze_slot_action_mask: PlayerState.SHOP_SLOTS,
+    Player.freeze_pet_at_linked_slot_action_mask: PlayerState.LINKED_SLOTS,
+    Player.end_turn_action_mask: PlayerState.GOLD,
+}
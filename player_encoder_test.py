@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+
+from environment.action_space import ActionName, actions_dict
+from environment.flatten_action import FlattenAction
+from environment.flatten_observation import FlattenObservation
+from environment.player_encoder import PlayerEncoder
+from environment.state_space import get_observation
+from opponent_db2 import OpponentDBInMemory
+from player import Player
+from testing_utils import PlayerEnv
+
+
+def test_player_encoder_matches_the_wrappers():
+    random.seed(0)
+    player = Player.init_starting_player(OpponentDBInMemory(), None)
+    env = PlayerEnv(player)
+    flatten_observation = FlattenObservation(env)
+    flatten_action = FlattenAction(flatten_observation)
+    encoder = PlayerEncoder(flatten_observation, flatten_action)
+    obs = np.empty((flatten_observation.observation_space_size,), dtype=np.float32)
+    masks = np.empty((flatten_action.action_space.n,), dtype=bool)
+
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        expected_obs = flatten_observation.observation(get_observation(player))
+        encoder.encode_observation(player, obs)
+        # compare the bits (so -0.0 != 0.0)
+        assert np.array_equal(obs.view(np.uint32), expected_obs.view(np.uint32))
+
+        expected_masks = flatten_action.action_masks()
+        encoder.encode_action_masks(player, masks)
+        assert np.array_equal(masks, expected_masks)
+        batched_masks = np.empty((2, masks.size), dtype=bool)
+        encoder.encode_batched_action_masks([player, player], batched_masks)
+        assert (batched_masks == expected_masks).all()
+
+        selected_action = flatten_action.action(rng.choice(np.flatnonzero(masks)))
+        action = actions_dict[ActionName(selected_action.path_key[1:])]
+        action.perform_action(player, selected_action.params)
+        if player.turn_number >= 5:
+            player = Player.init_starting_player(OpponentDBInMemory(), None)
+            env.player = player
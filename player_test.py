@@ -1,7 +1,13 @@
+import random
+
+import numpy as np
 import pytest
-from all_types_and_consts import Species
+from all_types_and_consts import Species, Trigger
+from environment.action_space import ActionName, actions_dict
+from opponent_db2 import OpponentDBInMemory
 from pet_data import get_base_pet
-from player import Player
+from player import Player, action_mask_dependencies
+from pet_triggers import on_sell_duck
 from team import Team
 
 
@@ -113,3 +119,69 @@ def test_buy_pet(player: Player):
     player.shop.init_shop_for_round(3)
     player.buy_pet_action(slot_idx=2, target_team_idx=2)
     assert player.team.pets[2].species != Species.NONE
+
+
+def test_buy_pet_runs_friend_summoned_then_friend_bought_per_pet(player: Player):
+    player.shop.init_shop_for_round(1)
+    calls = []
+
+    def on_friend_summoned(pet, **kwargs):
+        calls.append((pet.species, Trigger.ON_FRIEND_SUMMONED))
+
+    def on_friend_bought(pet, **kwargs):
+        calls.append((pet.species, Trigger.ON_FRIEND_BOUGHT))
+
+    duck, _, _, beaver, pigeon = player.team.pets
+    duck.set_trigger(Trigger.ON_FRIEND_BOUGHT, on_friend_bought)
+    beaver.set_trigger(Trigger.ON_FRIEND_SUMMONED, on_friend_summoned)
+    beaver.set_trigger(Trigger.ON_FRIEND_BOUGHT, on_friend_bought)
+    pigeon.set_trigger(Trigger.ON_FRIEND_SUMMONED, on_friend_summoned)
+    player.buy_pet_action(slot_idx=0, target_team_idx=2)
+    # the pets react in team order
+    assert calls == [
+        (Species.DUCK, Trigger.ON_FRIEND_BOUGHT),
+        (Species.BEAVER, Trigger.ON_FRIEND_SUMMONED),
+        (Species.BEAVER, Trigger.ON_FRIEND_BOUGHT),
+        (Species.PIGEON, Trigger.ON_FRIEND_SUMMONED),
+    ]
+
+
+def test_sell_pet_runs_sell_trigger(player: Player):
+    player.shop.init_shop_for_round(1)
+    duck = player.team.pets[0]
+    duck.set_trigger(Trigger.ON_SELL, on_sell_duck)
+    shop_healths = [slot.pet.health for slot in player.shop.slots]
+    player.sell_pet_action(idx=0)
+    # the duck is no longer in the team when its sell trigger runs
+    assert [slot.pet.health for slot in player.shop.slots] == [
+        health + 1 for health in shop_healths
+    ]
+
+
+def test_get_pets_keeps_pets_with_the_same_stats(player: Player):
+    player.team.pets[1] = get_base_pet(Species.PIGEON)
+    pets = player.team.get_pets(species_to_list_first=[Species.PIGEON])
+    assert len(pets) == len(player.team.pets)
+    assert pets[0] is player.team.pets[1]
+    assert pets[1] is player.team.pets[4]
+
+
+def test_cached_action_masks_match_the_recomputed_masks():
+    random.seed(0)
+    player = Player.init_starting_player(OpponentDBInMemory(), None)
+    for _ in range(2000):
+        for get_mask in action_mask_dependencies:
+            assert np.array_equal(player.get_action_mask(get_mask), get_mask(player))
+
+        # (the actions with one option, like roll_shop, don't take params)
+        action_name, params = random.choice(
+            [
+                (action_name, tuple(params) if mask.size > 1 else ())
+                for action_name, action in actions_dict.items()
+                for mask in [action.get_mask(player)]
+                for params in np.argwhere(mask).tolist()
+            ]
+        )
+        actions_dict[action_name].perform_action(player, params)
+        if action_name == ActionName.END_TURN and player.turn_number >= 8:
+            player = Player.init_starting_player(OpponentDBInMemory(), None)
@@ -0,0 +1,53 @@
+import random
+from functools import partial
+
+import numpy as np
+import pytest
+
+pytest.importorskip("stable_baselines3")
+pytest.importorskip("wandb")
+
+# making a SuperAutoPetsEnv registers the pets' triggers
+pytestmark = pytest.mark.usefixtures("restore_base_pet_triggers")
+
+from environment.environment import SuperAutoPetsEnv
+from environment.metrics_tracker import BufferedRun, MetricsTracker
+from environment.subproc_vec_env import SuperAutoPetsSubprocVecEnv
+from opponent_db2 import OpponentDBInMemory
+from vec_env_testing_utils import play_single_envs, play_vec_env
+
+
+def make_env(seed: int) -> SuperAutoPetsEnv:
+    # the workers don't share our random state (it's reseeded after a fork). So each env seeds it when it's made. The
+    # single envs are made in the same order, so they make the same random choices
+    random.seed(seed)
+    return SuperAutoPetsEnv(
+        OpponentDBInMemory(), MetricsTracker(wandb_run=BufferedRun())
+    )
+
+
+def test_subproc_vec_env_matches_single_envs():
+    env_fns = [partial(make_env, seed) for seed in range(4)]
+    logged_metrics = []
+    vec_env = SuperAutoPetsSubprocVecEnv(
+        env_fns, num_workers=2, log_metrics=logged_metrics.append
+    )
+    try:
+        played = play_vec_env(vec_env, num_steps=300, rng=np.random.default_rng(0))
+    finally:
+        vec_env.close()
+    assert played["dones"].any()  # so the resets are checked too
+
+    # the first worker has envs 0 and 1, the second has envs 2 and 3
+    for worker_envs in [slice(0, 2), slice(2, 4)]:
+        expected = play_single_envs(
+            env_fns[worker_envs], played["actions"][:, worker_envs]
+        )
+        for key, value in expected.items():
+            assert np.array_equal(played[key][:, worker_envs], value), key
+
+    # the workers' metrics are logged in this process. (one reward per step, and the stats at the end of each episode)
+    assert sum("reward" in metrics for metrics in logged_metrics) == played["rews"].size
+    assert sum("is_truncated" in metrics for metrics in logged_metrics) == (
+        played["dones"].sum()
+    )
@@ -2,13 +2,14 @@ from collections import defaultdict
 from all_types_and_consts import MAX_TEAM_SIZE, Species
 from pet import Pet
 from pet_data import get_base_pet
+from pet_list import PetList
 import numpy as np
 import random
 
 
 class Team:
     def __init__(self, pets: list[Pet]):
-        self.pets = pets
+        self.pets = PetList(pets)
         assert len(pets) == MAX_TEAM_SIZE
 
     @staticmethod
@@ -31,11 +32,18 @@ class Team:
         return Team([pet.clone() for pet in self.pets])
 
     def get_pets_for_battle(self) -> list[Pet]:
+        """
+        Returns copies of the team's pets (with their temp buffs applied) for a battle. The team itself isn't modified, so
+        there's no need to clone it first
+        """
+        # a plain list: it only lives for one battle, so building a PetList's trigger index costs more than it saves
         res = []
         for pet in self.pets:
             if pet.species == Species.NONE:
                 continue
-            res.append(pet.apply_temp_buffs())
+            battle_pet = pet.clone_for_battle()
+            battle_pet.team_idx = len(res)
+            res.append(battle_pet)
         return res
 
     def get_no_none_pets(self) -> list[Pet]:
@@ -55,7 +63,8 @@ class Team:
         pets_without_none: list[Pet] = []
         for pet in pets_list:
             is_not_excluded_pet = exclude_pet is None or pet is not exclude_pet
-            if pet.species != Species.NONE and is_not_excluded_pet:
+            # in battle, a pet that is about to faint stays in the list until its faint event is handled. Don't target it
+            if pet.species != Species.NONE and pet.is_alive and is_not_excluded_pet:
                 pets_without_none.append(pet)
 
         n = len(pets_without_none)
@@ -77,7 +86,9 @@ class Team:
         for species in species_to_list_first:
             res += species_to_pets[species]
 
+        # compare by identity since different pets can have the same stats (Pet.__eq__)
+        listed_pet_ids = {id(pet) for pet in res}
         for pet in self.pets:
-            if pet not in res:
+            if id(pet) not in listed_pet_ids:
                 res.append(pet)
         return res
@@ -0,0 +1,199 @@
+import itertools
+from dataclasses import dataclass
+
+from all_types_and_consts import MAX_ATTACK, MAX_HEALTH, BattleResult, Species
+from battle import battle
+from battle_cache import BattleFn
+from battle_closed_form import (
+    can_battle_in_closed_form,
+    fight_closed_form_pets,
+    get_closed_form_pet,
+    get_closed_form_pets,
+)
+from pet import Pet
+from team import Team
+
+# Only the order of the non-NONE pets matters in battle (get_pets_for_battle() drops the NONE slots). So there are at most
+# 5! = 120 orders to try. Pets that battle the same way (e.g. two base ants) are interchangeable, so orders that only
+# swap them are only tried once.
+
+
+@dataclass
+class TeamOrderEstimate:
+    # the best team. its pets are in the same slots as the NONE and non-NONE pets of the original team
+    team: Team
+    win_rate: float
+    tie_rate: float
+
+
+def get_battle_key(pet: Pet) -> tuple:
+    # pets with the same key battle the same way. battle() starts from clone_for_battle() (which drops the metadata)
+    return (
+        pet.species,
+        min(MAX_ATTACK, pet.attack + pet.attack_boost),
+        min(MAX_HEALTH, pet.health + pet.health_boost),
+        pet.effect,
+        pet.experience,
+        id(pet._triggers),
+    )
+
+
+def get_distinct_orders(pets: list[Pet]) -> list[list[Pet]]:
+    keys = [get_battle_key(pet) for pet in pets]
+    orders = []
+    seen_orders = set()
+    for order in itertools.permutations(range(len(pets))):
+        order_keys = tuple(keys[idx] for idx in order)
+        if order_keys in seen_orders:
+            continue
+        seen_orders.add(order_keys)
+        orders.append([pets[idx] for idx in order])
+    return orders
+
+
+def get_ordered_team(team: Team, pets: list[Pet]) -> Team:
+    # the pets go into the team's non-NONE slots (in order). The NONE slots stay where they are
+    pets_iter = iter(pets)
+    return Team(
+        [pet if pet.species == Species.NONE else next(pets_iter) for pet in team.pets]
+    )
+
+
+def search_closed_form_orders(
+    pets: list[Pet], opponents: list[Team]
+) -> tuple[list[Pet], tuple[int, int]]:
+    # Builds the order from the front pet back. Only the front pets fight, so each opponent's battle is played one of our
+    # pets at a time, and the orders that start with the same front pets share those fights. Once a battle is decided
+    # (e.g. the opponent has no pets left) the pets behind don't matter
+    rows = [get_closed_form_pet(pet) for pet in pets]
+    best_score = (-1, -1)
+    best_order: list[int] = []
+
+    def search(
+        remaining: list[int],
+        front_to_back: list[int],
+        opponent_pets: list[list[list]],
+        num_wins: int,
+        num_ties: int,
+    ):
+        nonlocal best_score, best_order
+        seen_rows = set()
+        # try the current front pet first, so the current order is the first one that's scored
+        for idx in reversed(remaining):
+            # pets with the same stats and effect fight the same way (the closed form doesn't look at the species)
+            row_key = tuple(rows[idx])
+            if row_key in seen_rows:
+                continue
+            seen_rows.add(row_key)
+            rest = [i for i in remaining if i != idx]
+            order = front_to_back + [idx]
+
+            wins, ties = num_wins, num_ties
+            undecided_opponent_pets = []
+            for opponent_rows in opponent_pets:
+                pets1 = [rows[idx].copy()]
+                pets2 = [row.copy() for row in opponent_rows]
+                if not fight_closed_form_pets(pets1, pets2):
+                    ties += 1
+                elif len(pets2) == 0:
+                    if len(pets1) > 0 or len(rest) > 0:
+                        wins += 1
+                    else:
+                        ties += 1
+                elif len(rest) > 0:
+                    undecided_opponent_pets.append(pets2)
+                # otherwise, we lost
+
+            if len(undecided_opponent_pets) == 0:
+                if (wins, ties) > best_score:
+                    best_score = (wins, ties)
+                    best_order = order + rest[::-1]
+            elif wins + len(undecided_opponent_pets) >= best_score[0]:
+                search(rest, order, undecided_opponent_pets, wins, ties)
+            # otherwise, even if we win every undecided battle, this can't beat the best order
+
+    search(
+        list(range(len(pets))),
+        [],
+        [get_closed_form_pets(opponent) for opponent in opponents],
+        0,
+        0,
+    )
+    return [pets[idx] for idx in reversed(best_order)], best_score
+
+
+def search_orders(
+    team: Team, pets: list[Pet], opponents: list[Team], battle_fn: BattleFn
+) -> tuple[list[Pet], tuple[int, int]]:
+    num_opponents = len(opponents)
+    best_score = (-1, -1)
+    best_order = pets
+    # the first order is the team's current order
+    for order in get_distinct_orders(pets):
+        ordered_team = get_ordered_team(team, order)
+        num_wins, num_ties = 0, 0
+        for opponent_idx, opponent in enumerate(opponents):
+            if num_wins + num_opponents - opponent_idx < best_score[0]:
+                break  # even if it wins every battle left, it can't beat the best order
+            result = battle_fn(ordered_team, opponent)
+            if result == BattleResult.WON_BATTLE:
+                num_wins += 1
+            elif result == BattleResult.TIE:
+                num_ties += 1
+        else:
+            if (num_wins, num_ties) > best_score:
+                best_score = (num_wins, num_ties)
+                best_order = order
+    return best_order, best_score
+
+
+def find_best_team_order(
+    team: Team, opponents: list[Team], battle_fn: BattleFn = battle
+) -> TeamOrderEstimate:
+    """
+    Finds the order of the team's pets with the highest win rate against the opponents (ties are broken by the tie rate).
+    The opponents are the distribution to optimize for (e.g. the decompressed teams of an OpponentDB bucket). Repeat an
+    opponent to weigh it more. Random battles are only sampled once per (order, opponent).
+    If several orders are the best, the team's current order is preferred (so it's only changed if it helps)
+
+    Orders stop battling as soon as they can't beat the best order so far. If no pet has an in-battle trigger, the battles
+    are played one pet at a time with the closed form (and battle_fn isn't used)
+    """
+    assert len(opponents) > 0
+    pets = [pet for pet in team.pets if pet.species != Species.NONE]
+    if can_battle_in_closed_form((team, *opponents)):
+        best_order, (num_wins, num_ties) = search_closed_form_orders(pets, opponents)
+    else:
+        best_order, (num_wins, num_ties) = search_orders(
+            team, pets, opponents, battle_fn
+        )
+    return TeamOrderEstimate(
+        team=get_ordered_team(team, best_order),
+        win_rate=num_wins / len(opponents),
+        tie_rate=num_ties / len(opponents),
+    )
+
+
+def get_reorder_actions(team: Team, ordered_team: Team) -> list[tuple[int, int]]:
+    """
+    Returns the (start_idx, end_idx) moves that turn team into ordered_team with Player.reorder_team_action() (which
+    can't move NONE pets). ordered_team must have the same pets as team (e.g. find_best_team_order().team)
+    """
+    pets = list(team.pets)
+    actions = []
+    for target_idx, target_pet in enumerate(ordered_team.pets):
+        if target_pet.species == Species.NONE:
+            # push the pets out of the way until a NONE pet moves into this slot
+            while pets[target_idx].species != Species.NONE:
+                actions.append((target_idx, len(pets) - 1))
+                pets.append(pets.pop(target_idx))
+            continue
+        # the pets before target_idx are already in place. Find the pet by identity, since different pets can be equal
+        # (e.g. two base pigs) and moving the wrong one would mix up their metadata
+        start_idx = next(
+            idx for idx in range(target_idx, len(pets)) if pets[idx] is target_pet
+        )
+        if start_idx != target_idx:
+            actions.append((start_idx, target_idx))
+            pets.insert(target_idx, pets.pop(start_idx))
+    return actions
@@ -0,0 +1,108 @@
+import itertools
+import random
+
+from all_types_and_consts import MAX_TEAM_SIZE, BattleResult, Species, Trigger
+from battle import battle
+from pet_data import get_base_pet
+from pet_triggers import on_faint_cricket
+from player import Player
+from team import Team
+from team_order_optimizer import (
+    find_best_team_order,
+    get_distinct_orders,
+    get_ordered_team,
+    get_reorder_actions,
+)
+from testing_utils import random_team
+
+
+def get_score(team: Team, opponents: list[Team]) -> tuple[int, int]:
+    results = [battle(team, opponent) for opponent in opponents]
+    return results.count(BattleResult.WON_BATTLE), results.count(BattleResult.TIE)
+
+
+def get_best_score_by_brute_force(team: Team, opponents: list[Team]):
+    pets = [pet for pet in team.pets if pet.species != Species.NONE]
+    return max(
+        get_score(get_ordered_team(team, list(order)), opponents)
+        for order in itertools.permutations(pets)
+    )
+
+
+def test_find_best_team_order_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(20):
+        team = random_team(rng)
+        opponents = [random_team(rng) for _ in range(rng.randint(1, 5))]
+        estimate = find_best_team_order(team, opponents)
+        num_wins, num_ties = get_score(estimate.team, opponents)
+        assert (num_wins, num_ties) == get_best_score_by_brute_force(team, opponents)
+        assert estimate.win_rate == num_wins / len(opponents)
+        assert estimate.tie_rate == num_ties / len(opponents)
+
+
+def test_find_best_team_order_with_triggers():
+    def pet(species: Species, attack: int, health: int):
+        return get_base_pet(species).set_stats(attack=attack, health=health)
+
+    cricket = pet(Species.CRICKET, 1, 1)
+    cricket.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    # the cricket should go behind the fish, so its zombie cricket gets to fight the pig last
+    team = Team([get_base_pet(Species.NONE)] * 3 + [pet(Species.FISH, 2, 2), cricket])
+    opponent = Team([get_base_pet(Species.NONE)] * 4 + [pet(Species.PIG, 2, 3)])
+    assert battle(team, opponent) == BattleResult.TIE
+    estimate = find_best_team_order(team, [opponent])
+    assert estimate.win_rate == 1
+    assert [pet.species for pet in estimate.team.pets][-2:] == [
+        Species.CRICKET,
+        Species.FISH,
+    ]
+
+    # the current order is kept when it's already the best
+    best_team = find_best_team_order(estimate.team, [opponent]).team
+    assert list(best_team.pets) == list(estimate.team.pets)
+
+
+def test_get_distinct_orders_skips_identical_pets():
+    pig = get_base_pet(Species.PIG)
+    fish = get_base_pet(Species.FISH)
+    assert len(get_distinct_orders([pig, pig.clone(), fish])) == 3
+
+
+def test_get_reorder_actions():
+    rng = random.Random(1)
+    for _ in range(20):
+        team = random_team(rng)
+        pets = [pet for pet in team.pets if pet.species != Species.NONE]
+        rng.shuffle(pets)
+        none_slots = rng.sample(range(MAX_TEAM_SIZE), MAX_TEAM_SIZE - len(pets))
+        pets_iter = iter(pets)
+        ordered_team = Team(
+            [
+                get_base_pet(Species.NONE) if idx in none_slots else next(pets_iter)
+                for idx in range(MAX_TEAM_SIZE)
+            ]
+        )
+
+        player = Player(team)
+        for start_idx, end_idx in get_reorder_actions(team, ordered_team):
+            player.reorder_team_action(start_idx, end_idx)
+        assert [pet.species for pet in player.team.pets] == [
+            pet.species for pet in ordered_team.pets
+        ]
+        assert player.team == ordered_team
+
+
+def test_get_reorder_actions_moves_the_right_pet_when_pets_are_equal():
+    pig1 = get_base_pet(Species.PIG)
+    pig2 = get_base_pet(Species.PIG)
+    assert pig1 == pig2
+    none_pets = [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE - 2)]
+    team = Team(none_pets + [pig1, pig2])
+    ordered_team = Team(none_pets + [pig2, pig1])
+
+    player = Player(team)
+    for start_idx, end_idx in get_reorder_actions(team, ordered_team):
+        player.reorder_team_action(start_idx, end_idx)
+    assert player.team.pets[-2] is pig2
+    assert player.team.pets[-1] is pig1
@@ -0,0 +1,45 @@
+# helpers shared by the tests. (this isn't a test module, so pytest doesn't collect it)
+import random
+
+import gymnasium as gym
+
+from all_types_and_consts import MAX_TEAM_SIZE, Effect, Species
+from environment.action_space import env_action_space, get_action_masks
+from environment.state_space import env_observation_space
+from pet_data import get_base_pet
+from player import Player
+from team import Team
+
+effects = [Effect.NONE] * 4 + [
+    Effect.MEAT_BONE,
+    Effect.STEAK,
+    Effect.MELON,
+    Effect.GARLIC,
+    Effect.PEANUT,
+]
+
+
+def random_team(rng: random.Random) -> Team:
+    pets = []
+    for _ in range(MAX_TEAM_SIZE):
+        if rng.random() < 0.2:
+            pets.append(get_base_pet(Species.NONE))
+            continue
+        pet = get_base_pet(rng.choice([Species.PIG, Species.SNAIL, Species.FISH]))
+        pet.set_stats(attack=rng.randint(0, 30), health=rng.randint(1, 30))
+        pet.set_effect(rng.choice(effects))
+        pet.add_boost(attack=rng.randint(0, 3), health=rng.randint(0, 3))
+        pets.append(pet)
+    return Team(pets)
+
+
+class PlayerEnv(gym.Env):
+    # the wrappers only need the spaces (and the action masks)
+    observation_space = env_observation_space
+    action_space = env_action_space
+
+    def __init__(self, player: Player):
+        self.player = player
+
+    def action_masks(self):
+        return get_action_masks(self.player)
@@ -0,0 +1,150 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from all_types_and_consts import BattleResult
+from battle import battle
+from battle_cache import BattleCache, BattleFn
+from battle_determinism import is_battle_deterministic
+from team import Team
+from win_probability import PetTriggerSnapshot, get_pet_trigger_snapshot, init_worker
+
+# results[i, j, result] is the number of battles of teams[i] vs teams[j] that ended in that BattleResult. So
+# results[i, j] is (wins, losses, ties) from team i's point of view
+NUM_BATTLE_RESULTS = len(BattleResult)
+
+# the worker's view of the tournament (set by init_tournament_worker())
+worker_teams: list[Team] = []
+worker_results: np.ndarray | None = None
+worker_shared_memory: SharedMemory | None = None
+worker_battle_fn: BattleFn = battle
+worker_num_battles = 1
+
+
+def get_pairs(num_teams: int) -> tuple[np.ndarray, np.ndarray]:
+    # every team battles every other team (team i vs team j, with i != j). Both orders are played, since a battle isn't
+    # symmetric once triggers are on (e.g. which on battle start triggers go first when attacks are tied)
+    return np.nonzero(~np.eye(num_teams, dtype=bool))
+
+
+def init_tournament_worker(
+    pet_triggers: PetTriggerSnapshot,
+    teams: list[Team],
+    shared_memory_name: str,
+    battle_cache: BattleCache | None,
+    battle_fn: BattleFn,
+    num_battles: int,
+):
+    global worker_teams, worker_results, worker_shared_memory
+    global worker_battle_fn, worker_num_battles
+    init_worker(pet_triggers)
+    worker_teams = teams
+    # keep a reference to the shared memory. Otherwise it's closed (and the results array is freed) when this returns
+    worker_shared_memory = SharedMemory(name=shared_memory_name)
+    worker_results = np.ndarray(
+        (len(teams), len(teams), NUM_BATTLE_RESULTS),
+        dtype=np.int32,
+        buffer=worker_shared_memory.buf,
+    )
+    worker_battle_fn = battle_fn if battle_cache is None else battle_cache.battle
+    worker_num_battles = num_battles
+
+
+def play_pairs(
+    teams: list[Team],
+    results: np.ndarray,
+    pairs: tuple[np.ndarray, np.ndarray],
+    battle_fn: BattleFn,
+    num_battles: int,
+):
+    for i, j in zip(pairs[0].tolist(), pairs[1].tolist()):
+        team1 = teams[i]
+        team2 = teams[j]
+        if num_battles > 1 and is_battle_deterministic(team1, team2):
+            # every battle would have the same result
+            results[i, j, battle_fn(team1, team2).value] = num_battles
+        else:
+            for _ in range(num_battles):
+                results[i, j, battle_fn(team1, team2).value] += 1
+
+
+def play_pairs_in_worker(start: int, end: int):
+    # each worker writes to different cells of the shared results, so they don't need a lock
+    pairs_i, pairs_j = get_pairs(len(worker_teams))
+    play_pairs(
+        worker_teams,
+        worker_results,
+        (pairs_i[start:end], pairs_j[start:end]),
+        worker_battle_fn,
+        worker_num_battles,
+    )
+
+
+def run_tournament(
+    teams: list[Team],
+    *,
+    num_battles: int = 1,
+    battle_cache: BattleCache | None = None,
+    battle_fn: BattleFn = battle,
+    max_workers: int | None = None,
+    chunk_size: int = 1_000,
+) -> np.ndarray:
+    """
+    Battles every pair of teams (num_battles times each) and returns the (len(teams), len(teams), 3) results (see
+    NUM_BATTLE_RESULTS). The pairs are split between worker processes, which write straight into a shared memory array
+    (so the results aren't pickled back).
+
+    If battle_cache is given, it's used instead of battle_fn (each worker gets a copy of it)
+    """
+    num_teams = len(teams)
+    num_pairs = num_teams * (num_teams - 1)
+    num_workers = min(
+        max_workers or os.cpu_count() or 1, math.ceil(num_pairs / chunk_size)
+    )
+    shape = (num_teams, num_teams, NUM_BATTLE_RESULTS)
+
+    if num_workers <= 1:
+        # not worth starting processes for
+        results = np.zeros(shape, dtype=np.int32)
+        play_pairs(
+            teams,
+            results,
+            get_pairs(num_teams),
+            battle_fn if battle_cache is None else battle_cache.battle,
+            num_battles,
+        )
+        return results
+
+    shared_memory = SharedMemory(create=True, size=math.prod(shape) * 4)
+    try:
+        shared_results = np.ndarray(shape, dtype=np.int32, buffer=shared_memory.buf)
+        shared_results.fill(0)
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=init_tournament_worker,
+            initargs=(
+                get_pet_trigger_snapshot(),
+                teams,
+                shared_memory.name,
+                battle_cache,
+                battle_fn,
+                num_battles,
+            ),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    play_pairs_in_worker, start, min(start + chunk_size, num_pairs)
+                )
+                for start in range(0, num_pairs, chunk_size)
+            ]
+            for future in futures:
+                future.result()  # raises the worker's exception (if there was one)
+        results = shared_results.copy()
+        del shared_results  # the shared memory can't be closed while an array uses its buffer
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+    return results
@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+
+from all_types_and_consts import MAX_TEAM_SIZE, Species, Trigger
+from battle import battle
+from battle_cache import BattleCache
+from pet_data import get_base_pet
+from pet_triggers import on_faint_cricket, set_pet_triggers
+from team import Team
+from tournament import run_tournament
+
+
+def random_team(rng: random.Random) -> Team:
+    pets = [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE)]
+    for idx in range(rng.randint(1, MAX_TEAM_SIZE)):
+        pet = get_base_pet(rng.choice([Species.PIG, Species.CRICKET]))
+        if pet.species == Species.CRICKET:
+            pet.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+        pets[idx] = pet.set_stats(attack=rng.randint(1, 5), health=rng.randint(1, 5))
+    return Team(pets)
+
+
+@pytest.fixture
+def pet_triggers(restore_base_pet_triggers):
+    set_pet_triggers()
+
+
+def test_run_tournament_matches_battle():
+    rng = random.Random(0)
+    teams = [random_team(rng) for _ in range(20)]
+    results = run_tournament(teams, max_workers=2, chunk_size=50)
+    assert results.shape == (20, 20, 3)
+    for i, team1 in enumerate(teams):
+        assert results[i, i].sum() == 0
+        for j, team2 in enumerate(teams):
+            if i != j:
+                assert results[i, j, battle(team1, team2).value] == 1
+                assert results[i, j].sum() == 1
+
+
+def test_run_tournament_uses_the_battle_cache():
+    rng = random.Random(1)
+    teams = [random_team(rng) for _ in range(10)]
+    battle_cache = BattleCache(battle_fn=battle)
+    results = run_tournament(teams, num_battles=3, battle_cache=battle_cache)
+    assert battle_cache.get_stats()["misses"] == 10 * 9
+    assert (results.sum(axis=2) == 3 * (1 - np.eye(10))).all()
+
+
+def test_run_tournament_plays_both_orders_with_triggers(pet_triggers):
+    # species whose triggers don't use random. So the battles can be replayed
+    species = [
+        Species.PIG,
+        Species.CRICKET,
+        Species.FLAMINGO,
+        Species.SHEEP,
+        Species.HEDGEHOG,
+        Species.DODO,
+    ]
+    rng = random.Random(2)
+    teams = []
+    for _ in range(12):
+        pets = [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE)]
+        for idx in range(rng.randint(1, MAX_TEAM_SIZE)):
+            pets[idx] = get_base_pet(rng.choice(species)).set_stats(
+                attack=rng.randint(1, 5), health=rng.randint(1, 5)
+            )
+        teams.append(Team(pets))
+    results = run_tournament(teams, max_workers=2, chunk_size=50)
+    for i in range(len(teams)):
+        for j in range(len(teams)):
+            if i != j:
+                assert results[j, i, battle(teams[j], teams[i]).value] == 1
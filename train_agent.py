@@ -15,10 +15,12 @@ from environment.flatten_action import FlattenAction
 
 from environment.environment import SuperAutoPetsEnv
 from environment.flatten_observation import FlattenObservation
+from environment.subproc_vec_env import SuperAutoPetsSubprocVecEnv
+from environment.vec_env import SuperAutoPetsVecEnv
 import wandb
 from wandb.integration.sb3 import WandbCallback
 from torch import nn
-from environment.metrics_tracker import MetricsTracker
+from environment.metrics_tracker import BufferedRun, MetricsTracker
 from environment.metrics_tracker_dummy import MetricsTrackerDummy
 from environment.metrics_tracker_eval import MetricsTrackerEval
 from opponent_db import OpponentDB
@@ -43,14 +45,33 @@ def train_with_masks(ret):
 
     # initialize environment
     # env = FlattenAction(FlattenObservation(SuperAutoPetsEnv()))
-    env = FlattenAction(
-        FlattenObservation(
-            SuperAutoPetsEnv(
-                opponent_db=OpponentDB("opponents.sqlite"),
-                metrics_tracker=MetricsTracker(wandb_run=run),
-            )
+    opponent_db = OpponentDB("opponents.sqlite")
+
+    def make_env():
+        return SuperAutoPetsEnv(
+            opponent_db=opponent_db,
+            metrics_tracker=MetricsTracker(wandb_run=run),
         )
-    )
+
+    def make_worker_env():
+        # the wandb run can't be used from the worker processes. So the metrics are sent back and logged here
+        return SuperAutoPetsEnv(
+            opponent_db=opponent_db,
+            metrics_tracker=MetricsTracker(wandb_run=BufferedRun()),
+        )
+
+    if ret.num_envs > 1 and ret.num_workers > 0:
+        # the workers write the observations and masks into shared memory
+        env = SuperAutoPetsSubprocVecEnv(
+            [make_worker_env] * ret.num_envs,
+            num_workers=ret.num_workers,
+            log_metrics=run.log,
+        )
+    elif ret.num_envs > 1:
+        # steps all the games in this process, and flattens their observations and masks in one place
+        env = SuperAutoPetsVecEnv([make_env] * ret.num_envs)
+    else:
+        env = FlattenAction(FlattenObservation(make_env()))
 
     # create folder to save log
     history_path = "./history/history_" + ret.model_name + "/"
@@ -120,7 +141,7 @@ def train_with_masks(ret):
     log.info("Starting training...")
     for episode in range(ret.nb_games):
         # reset environment before starting to train (useful when retrying)
-        obs, info = env.reset()
+        env.reset()
 
         # setup trainer and start learning
         model.set_logger(logger)
@@ -137,7 +158,8 @@ def train_with_masks(ret):
                 ),
             ],
         )
-        env.env.render()
+        if ret.num_envs == 1:
+            env.env.render()
         eval_model(model, run)
         # evaluate_policy(model, env, n_eval_episodes=100, reward_threshold=0, warn=False)
 
@@ -0,0 +1,100 @@
+import time
+from dataclasses import dataclass
+
+from all_types_and_consts import Species, Trigger
+from pet import Pet
+
+NUM_TRIGGERS = len(Trigger)
+
+
+@dataclass
+class TriggerTiming:
+    num_calls: int
+    total_time_s: float
+
+
+class TriggerProfiler:
+    """
+    Counts how many times each (species, trigger) ran and how long it took. The time includes everything the trigger
+    fns do directly (e.g. the damage a hedgehog deals), but not the events they queue (see BattleEventQueue)
+    """
+
+    def __init__(self):
+        # indexed by species * NUM_TRIGGERS + trigger. (so we don't hash the enums on every trigger)
+        self.num_calls = [0] * (len(Species) * NUM_TRIGGERS)
+        self.total_time_ns = [0] * (len(Species) * NUM_TRIGGERS)
+
+    def record(self, species: Species, trigger: Trigger, elapsed_ns: int):
+        idx = species._value_ * NUM_TRIGGERS + trigger._value_
+        self.num_calls[idx] += 1
+        self.total_time_ns[idx] += elapsed_ns
+
+    def reset(self):
+        self.num_calls = [0] * len(self.num_calls)
+        self.total_time_ns = [0] * len(self.total_time_ns)
+
+    def get_snapshot(self) -> dict[tuple[Species, Trigger], TriggerTiming]:
+        """
+        Returns the timings of the (species, trigger) pairs that ran (slowest first)
+        """
+        snapshot = {}
+        for idx, num_calls in enumerate(self.num_calls):
+            if num_calls == 0:
+                continue
+            species, trigger = divmod(idx, NUM_TRIGGERS)
+            snapshot[(Species(species), Trigger(trigger))] = TriggerTiming(
+                num_calls=num_calls, total_time_s=self.total_time_ns[idx] / 1e9
+            )
+        return dict(
+            sorted(
+                snapshot.items(), key=lambda item: item[1].total_time_s, reverse=True
+            )
+        )
+
+    def get_metrics(self) -> dict[str, float]:
+        # flattened, so they can be logged (e.g. to wandb)
+        metrics = {}
+        for (species, trigger), timing in self.get_snapshot().items():
+            key = f"{species.name}/{trigger.name}"
+            metrics[f"trigger_calls/{key}"] = timing.num_calls
+            metrics[f"trigger_time_s/{key}"] = timing.total_time_s
+        return metrics
+
+
+active_profiler: TriggerProfiler | None = None
+untimed_trigger = Pet.trigger
+
+
+def timed_trigger(self: Pet, trigger: Trigger, *args, **kwargs) -> None:
+    if trigger not in self._triggers:
+        untimed_trigger(self, trigger, *args, **kwargs)
+        return
+    # read these first, since a trigger may change the pet (or stop the profiler)
+    profiler = active_profiler
+    species = self.species
+    start = time.perf_counter_ns()
+    try:
+        untimed_trigger(self, trigger, *args, **kwargs)
+    finally:
+        profiler.record(species, trigger, time.perf_counter_ns() - start)
+
+
+def start_trigger_profiler() -> TriggerProfiler:
+    """
+    Starts timing Pet.trigger. We swap Pet.trigger for a timed version (rather than checking a flag in Pet.trigger), so when
+    the profiler is off, Pet.trigger costs exactly what it did before
+    """
+    global active_profiler
+    # there's only one Pet.trigger to swap. So a second profiler would stop (and steal the timings of) the first one
+    assert active_profiler is None, "the trigger profiler is already running"
+    active_profiler = TriggerProfiler()
+    Pet.trigger = timed_trigger
+    return active_profiler
+
+
+def stop_trigger_profiler() -> TriggerProfiler | None:
+    global active_profiler
+    profiler = active_profiler
+    active_profiler = None
+    Pet.trigger = untimed_trigger
+    return profiler
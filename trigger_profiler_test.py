@@ -0,0 +1,58 @@
+import pytest
+
+from all_types_and_consts import BattleResult, Species, Trigger
+from battle import battle
+from pet import Pet
+from pet_data import get_base_pet
+from pet_triggers import on_faint_cricket
+from team import Team
+from trigger_profiler import (
+    start_trigger_profiler,
+    stop_trigger_profiler,
+    untimed_trigger,
+)
+
+
+def test_trigger_profiler_times_triggers():
+    cricket = get_base_pet(Species.CRICKET).set_stats(attack=1, health=1)
+    cricket.set_trigger(Trigger.ON_FAINT, on_faint_cricket)
+    team1 = Team([get_base_pet(Species.NONE)] * 4 + [cricket])
+    team2 = Team(
+        [get_base_pet(Species.NONE)] * 4
+        + [get_base_pet(Species.PIG).set_stats(attack=1, health=1)]
+    )
+    profiler = start_trigger_profiler()
+    try:
+        assert battle(team1, team2) == BattleResult.WON_BATTLE
+    finally:
+        assert stop_trigger_profiler() is profiler
+    assert Pet.trigger is untimed_trigger
+
+    # only the pets with the trigger are timed (the pig has no triggers)
+    snapshot = profiler.get_snapshot()
+    assert list(snapshot) == [(Species.CRICKET, Trigger.ON_FAINT)]
+    assert snapshot[(Species.CRICKET, Trigger.ON_FAINT)].num_calls == 1
+    assert profiler.get_metrics()["trigger_calls/CRICKET/ON_FAINT"] == 1
+
+    profiler.reset()
+    assert profiler.get_snapshot() == {}
+
+
+def test_trigger_profiler_cant_be_started_twice():
+    profiler = start_trigger_profiler()
+    try:
+        with pytest.raises(AssertionError):
+            start_trigger_profiler()
+    finally:
+        assert stop_trigger_profiler() is profiler
+    assert Pet.trigger is untimed_trigger
+
+
+def test_metrics_tracker_stops_its_profiler_on_close():
+    pytest.importorskip("wandb")
+    from environment.metrics_tracker import MetricsTracker
+
+    metrics_tracker = MetricsTracker(wandb_run=None, profile_triggers=True)
+    assert Pet.trigger is not untimed_trigger
+    metrics_tracker.close()
+    assert Pet.trigger is untimed_trigger
@@ -0,0 +1,27 @@
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("stable_baselines3")
+pytest.importorskip("wandb")
+
+# making a SuperAutoPetsEnv registers the pets' triggers
+pytestmark = pytest.mark.usefixtures("restore_base_pet_triggers")
+
+from environment.vec_env import SuperAutoPetsVecEnv
+from vec_env_testing_utils import make_env, play_single_envs, play_vec_env
+
+
+def test_vec_env_matches_single_envs():
+    num_envs = 4
+    random.seed(0)
+    vec_env = SuperAutoPetsVecEnv([make_env] * num_envs)
+    played = play_vec_env(vec_env, num_steps=300, rng=np.random.default_rng(0))
+    vec_env.close()
+    assert played["dones"].any()  # so the resets are checked too
+
+    random.seed(0)
+    expected = play_single_envs([make_env] * num_envs, played["actions"])
+    for key, value in expected.items():
+        assert np.array_equal(played[key], value), key
@@ -0,0 +1,77 @@
+# helpers shared by the vec env tests. The envs need stable_baselines3 and wandb, so only import this after
+# pytest.importorskip() (this isn't a test module, so pytest doesn't collect it)
+from typing import Callable
+
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from environment.environment import SuperAutoPetsEnv
+from environment.flatten_action import FlattenAction
+from environment.flatten_observation import FlattenObservation
+from environment.metrics_tracker_dummy import MetricsTrackerDummy
+from opponent_db2 import OpponentDBInMemory
+
+
+def make_env() -> SuperAutoPetsEnv:
+    return SuperAutoPetsEnv(OpponentDBInMemory(), MetricsTrackerDummy())
+
+
+def play_vec_env(
+    vec_env: VecEnv, num_steps: int, rng: np.random.Generator
+) -> dict[str, np.ndarray]:
+    """
+    Plays random valid actions. Returns the actions, and the observations, rewards, dones and action masks after each
+    step (the first observations and masks are from the reset)
+    """
+    obs = [vec_env.reset()]
+    masks = [vec_env.action_masks().copy()]
+    actions, rews, dones = [], [], []
+    for _ in range(num_steps):
+        step_actions = np.array(
+            [rng.choice(np.flatnonzero(env_masks)) for env_masks in masks[-1]]
+        )
+        step_obs, step_rews, step_dones, _ = vec_env.step(step_actions)
+        actions.append(step_actions)
+        obs.append(step_obs)
+        rews.append(step_rews)
+        dones.append(step_dones)
+        masks.append(vec_env.action_masks().copy())
+    return {
+        "actions": np.array(actions),
+        "obs": np.array(obs),
+        "rews": np.array(rews),
+        "dones": np.array(dones),
+        "masks": np.array(masks),
+    }
+
+
+def play_single_envs(
+    env_fns: list[Callable[[], SuperAutoPetsEnv]], actions: np.ndarray
+) -> dict[str, np.ndarray]:
+    """
+    Plays the (num_steps, num_envs) actions of play_vec_env() with FlattenAction(FlattenObservation(env))s. The envs are
+    made, reset, and stepped in the same order as in the vec envs. So they make the same random choices
+    """
+    envs = [FlattenAction(FlattenObservation(env_fn())) for env_fn in env_fns]
+    obs = [[env.reset()[0] for env in envs]]
+    masks = [[env.action_masks() for env in envs]]
+    rews, dones = [], []
+    for step_actions in actions:
+        step_obs, step_rews, step_dones = [], [], []
+        for env, action in zip(envs, step_actions):
+            env_obs, reward, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                env_obs, _ = env.reset()
+            step_obs.append(env_obs)
+            step_rews.append(reward)
+            step_dones.append(terminated or truncated)
+        obs.append(step_obs)
+        rews.append(step_rews)
+        dones.append(step_dones)
+        masks.append([env.action_masks() for env in envs])
+    return {
+        "obs": np.array(obs, dtype=np.float32),
+        "rews": np.array(rews, dtype=np.float32),
+        "dones": np.array(dones),
+        "masks": np.array(masks),
+    }
@@ -0,0 +1,160 @@
+import math
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+from all_types_and_consts import BattleResult, Species, Trigger
+from battle import battle
+from battle_determinism import is_battle_deterministic
+from pet import TriggerFn
+from pet_data import species_to_pet_map
+from team import Team
+
+# z-score for a 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+PetTriggerSnapshot = dict[Species, dict[Trigger, list[TriggerFn]]]
+
+
+@dataclass
+class WinProbabilityEstimate:
+    win_prob: float
+    tie_prob: float
+    loss_prob: float
+    num_samples: int
+    # the widest 95% confidence interval of the three probabilities
+    ci_width: float
+
+
+def get_pet_trigger_snapshot() -> PetTriggerSnapshot:
+    return {
+        species: {
+            trigger: list(trigger_fns) for trigger, trigger_fns in pet._triggers.items()
+        }
+        for species, pet in species_to_pet_map.items()
+    }
+
+
+def init_worker(pet_triggers: PetTriggerSnapshot):
+    # spawned pets (e.g. zombie crickets) are cloned from the base pets. so the workers need the same triggers as us.
+    # We copy them over (rather than calling set_pet_triggers()) since forked workers already have them
+    for species, triggers in pet_triggers.items():
+        base_pet = species_to_pet_map[species]
+        base_pet.clear_triggers()
+        for trigger, trigger_fns in triggers.items():
+            for trigger_fn in trigger_fns:
+                base_pet.set_trigger(trigger, trigger_fn)
+
+
+def simulate_battles(
+    team1: Team, team2: Team, num_battles: int, seed: int
+) -> tuple[int, int, int]:
+    # forked workers start with the same random state, so every chunk needs its own seed
+    random.seed(seed)
+    num_wins, num_ties, num_losses = 0, 0, 0
+    for _ in range(num_battles):
+        result = battle(team1, team2)
+        if result == BattleResult.WON_BATTLE:
+            num_wins += 1
+        elif result == BattleResult.TIE:
+            num_ties += 1
+        else:
+            num_losses += 1
+    return num_wins, num_ties, num_losses
+
+
+def get_wilson_ci_width(num_successes: int, num_samples: int) -> float:
+    # unlike the normal approximation, the wilson interval doesn't collapse to 0 when p is 0 or 1
+    p = num_successes / num_samples
+    z2 = CONFIDENCE_Z**2
+    half_width = (
+        CONFIDENCE_Z
+        * math.sqrt(p * (1 - p) / num_samples + z2 / (4 * num_samples**2))
+        / (1 + z2 / num_samples)
+    )
+    return 2 * half_width
+
+
+def build_estimate(num_wins: int, num_ties: int, num_losses: int):
+    num_samples = num_wins + num_ties + num_losses
+    return WinProbabilityEstimate(
+        win_prob=num_wins / num_samples,
+        tie_prob=num_ties / num_samples,
+        loss_prob=num_losses / num_samples,
+        num_samples=num_samples,
+        ci_width=max(
+            get_wilson_ci_width(count, num_samples)
+            for count in (num_wins, num_ties, num_losses)
+        ),
+    )
+
+
+def estimate_win_probability(
+    team1: Team,
+    team2: Team,
+    max_samples: int = 10_000,
+    ci_width: float = 0.02,
+    *,
+    chunk_size: int = 200,
+    max_workers: int | None = None,
+    seed: int | None = None,
+) -> WinProbabilityEstimate:
+    """
+    Samples battle(team1, team2) on a process pool until the 95% confidence interval of the win, tie, and loss
+    probabilities are all narrower than ci_width (or until max_samples battles have been run)
+    """
+    if is_battle_deterministic(team1, team2):
+        # every sample would be the same, so one battle is enough
+        result = battle(team1, team2)
+        estimate = build_estimate(
+            int(result == BattleResult.WON_BATTLE),
+            int(result == BattleResult.TIE),
+            int(result == BattleResult.LOST_BATTLE),
+        )
+        estimate.ci_width = 0.0
+        return estimate
+
+    if seed is None:
+        seed = random.randrange(2**32)
+    num_workers = max_workers or os.cpu_count() or 1
+    num_chunks = math.ceil(max_samples / chunk_size)
+    num_wins, num_ties, num_losses = 0, 0, 0
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=init_worker,
+        initargs=(get_pet_trigger_snapshot(),),
+    ) as executor:
+        pending: set[Future] = set()
+        chunk_idx = 0
+
+        def submit_chunks():
+            nonlocal chunk_idx
+            # keep a couple of chunks queued per worker, so we don't simulate many battles we may not need
+            while chunk_idx < num_chunks and len(pending) < 2 * num_workers:
+                num_battles = min(chunk_size, max_samples - chunk_idx * chunk_size)
+                pending.add(
+                    executor.submit(
+                        simulate_battles, team1, team2, num_battles, seed + chunk_idx
+                    )
+                )
+                chunk_idx += 1
+
+        submit_chunks()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                chunk_wins, chunk_ties, chunk_losses = future.result()
+                num_wins += chunk_wins
+                num_ties += chunk_ties
+                num_losses += chunk_losses
+
+            if build_estimate(num_wins, num_ties, num_losses).ci_width <= ci_width:
+                for future in pending:
+                    future.cancel()
+                break
+            submit_chunks()
+
+    return build_estimate(num_wins, num_ties, num_losses)
@@ -0,0 +1,35 @@
+from all_types_and_consts import MAX_TEAM_SIZE, Species, Trigger
+from pet_data import get_base_pet
+from pet_triggers import on_battle_start_mosquito
+from team import Team
+from win_probability import estimate_win_probability
+
+
+def team_of(*pets) -> Team:
+    return Team(
+        [get_base_pet(Species.NONE) for _ in range(MAX_TEAM_SIZE - len(pets))]
+        + list(pets)
+    )
+
+
+def test_estimate_stops_early_for_one_sided_matchups():
+    # the mosquito makes the battle random (even though it always wins)
+    mosquito = get_base_pet(Species.MOSQUITO).set_stats(attack=10, health=10)
+    mosquito.set_trigger(Trigger.ON_BATTLE_START, on_battle_start_mosquito)
+    team1 = team_of(mosquito)
+    team2 = team_of(get_base_pet(Species.PIG).set_stats(attack=1, health=1))
+    estimate = estimate_win_probability(
+        team1, team2, max_samples=100_000, ci_width=0.05, chunk_size=100, max_workers=2
+    )
+    assert estimate.win_prob == 1
+    assert 1 < estimate.num_samples < 100_000
+    assert estimate.ci_width <= 0.05
+
+
+def test_estimate_runs_deterministic_matchups_once():
+    team1 = team_of(get_base_pet(Species.PIG).set_stats(attack=1, health=1))
+    team2 = team_of(get_base_pet(Species.PIG).set_stats(attack=10, health=10))
+    estimate = estimate_win_probability(team1, team2)
+    assert estimate.loss_prob == 1
+    assert estimate.num_samples == 1
+    assert estimate.ci_width == 0